@@ -8,7 +8,7 @@ echo "🚀 Running data load step..."
 python3 src/load_to_postgres.py
 
 echo "🧠 Running embedding step..."
-python3 src/embed_batch_to_pgvector.py
+python3 src/embed_batch_to_pgvector.py --streaming
 
 echo "🧪 Running tests..."
 pytest -s tests/
@@ -10,6 +10,16 @@ CREATE TABLE IF NOT EXISTS products (
     primary_color  TEXT
 );
 
+-- Full-text search document for the lexical side of hybrid search. Generated, so it
+-- stays in sync with every insert/update of the source columns.
+ALTER TABLE products ADD COLUMN IF NOT EXISTS search_tsv tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(product_name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(product_brand, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED;
+CREATE INDEX IF NOT EXISTS products_search_tsv_idx ON products USING GIN (search_tsv);
+
 -- Enable the pgvector extension
 CREATE EXTENSION IF NOT EXISTS vector;
 
@@ -18,3 +28,42 @@ CREATE TABLE IF NOT EXISTS product_embeddings (
     product_id INTEGER PRIMARY KEY REFERENCES products(product_id), -- adds a foreign key constraint to link embeddings back to products
     embedding vector(384)
 );
+
+-- Provenance used by the incremental embedding step: md5(description) and the model
+-- that produced the vector. Rows are re-embedded only when either changes.
+ALTER TABLE product_embeddings ADD COLUMN IF NOT EXISTS content_hash TEXT;
+ALTER TABLE product_embeddings ADD COLUMN IF NOT EXISTS model_id TEXT;
+ALTER TABLE product_embeddings ADD COLUMN IF NOT EXISTS embedded_at TIMESTAMPTZ;
+
+-- Cosine HNSW index so ORDER BY embedding <=> query can use an index scan.
+-- The pipeline (src/ann_index.py) can swap this for IVFFlat via ANN_INDEX_METHOD.
+-- An index scan yields at most hnsw.ef_search candidates (default 40) before any WHERE
+-- filter runs, so a selective filter can leave fewer than LIMIT rows. search() re-runs
+-- such an underfilled filtered query as an exact scan (or plans it up front with
+-- adaptive_filtering); search_many(), the async engine and the facet candidates do not.
+CREATE INDEX IF NOT EXISTS product_embeddings_embedding_hnsw_idx
+    ON product_embeddings USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
+
+-- Single-row catalog/embedding version, bumped by the pipeline whenever products or
+-- embeddings are written. Search result caches are keyed on it.
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id          BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version     BIGINT NOT NULL DEFAULT 0,
+    updated_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+INSERT INTO catalog_version (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING;
+
+-- Shard plan and progress for sharded embedding runs (src/sharded_embedding.py).
+-- A shard's embeddings and its completed_at are committed together, so a rerun
+-- with the same run_id skips finished shards.
+CREATE TABLE IF NOT EXISTS embedding_checkpoints (
+    run_id         TEXT NOT NULL,
+    shard_id       INTEGER NOT NULL,
+    lo             INTEGER NOT NULL,  -- inclusive product_id lower bound
+    hi             INTEGER NOT NULL,  -- exclusive product_id upper bound
+    rows_embedded  INTEGER,
+    worker         TEXT,
+    completed_at   TIMESTAMPTZ,
+    PRIMARY KEY (run_id, shard_id)
+);
@@ -0,0 +1,169 @@
+"""
+Approximate nearest neighbour (ANN) index management for product_embeddings.
+
+pgvector only uses a vector index when the query orders by the raw distance
+operator (`embedding <=> %s`), so the search engine and this module agree on
+cosine distance (`vector_cosine_ops`).
+
+Two index types are supported:
+    - hnsw:    good recall/latency trade-off, can be built on an empty table
+    - ivfflat: cheaper to build, but the list count must follow the row count,
+               so it is (re)built after embeddings are written
+
+Quantized HNSW expression indexes (half-precision or binary-quantized copies of
+each embedding, pgvector >= 0.7) replace the full-precision index for
+ProductSearchEngine(quantization=...), which retrieves candidates from the compact
+index and reranks them against the stored full-precision vectors.
+"""
+
+import math
+
+from product_search_engine import EMBEDDING_DIMENSIONS
+
+HNSW_INDEX_NAME = "product_embeddings_embedding_hnsw_idx"
+IVFFLAT_INDEX_NAME = "product_embeddings_embedding_ivfflat_idx"
+
+# quantization -> (index name, indexed expression and operator class)
+QUANTIZED_INDEXES = {
+    "halfvec": (
+        "product_embeddings_embedding_halfvec_hnsw_idx",
+        f"(embedding::halfvec({EMBEDDING_DIMENSIONS})) halfvec_cosine_ops",
+    ),
+    "binary": (
+        "product_embeddings_embedding_binary_hnsw_idx",
+        f"(binary_quantize(embedding)::bit({EMBEDDING_DIMENSIONS})) bit_hamming_ops",
+    ),
+}
+
+HNSW_DEFAULT_M = 16
+HNSW_DEFAULT_EF_CONSTRUCTION = 64
+
+
+def ivfflat_lists_for_rows(row_count: int) -> int:
+    """
+    Derive the IVFFlat list count from the number of embedded rows.
+
+    Follows the pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) above that.
+    """
+    if row_count <= 1_000_000:
+        return max(1, row_count // 1000)
+    return int(math.sqrt(row_count))
+
+
+def ivfflat_probes_for_lists(lists: int) -> int:
+    """Suggested starting value for ivfflat.probes: sqrt(lists)."""
+    return max(1, int(math.sqrt(lists)))
+
+
+def _index_exists(cursor, index_name: str) -> bool:
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL;", (index_name,))
+    return cursor.fetchone()[0]
+
+
+def ensure_ann_index(
+    conn,
+    method: str = "hnsw",
+    m: int = HNSW_DEFAULT_M,
+    ef_construction: int = HNSW_DEFAULT_EF_CONSTRUCTION,
+    rebuild: bool = False
+) -> str:
+    """
+    Create (or rebuild) the cosine ANN index on product_embeddings.embedding.
+
+    Only one vector index is kept: creating an HNSW index drops the IVFFlat one and
+    vice versa. IVFFlat is always rebuilt so its list count tracks the current row count.
+
+    Args:
+        conn: psycopg2 connection.
+        method (str): "hnsw" or "ivfflat".
+        m (int): HNSW max connections per layer.
+        ef_construction (int): HNSW candidate list size used while building.
+        rebuild (bool): Drop and recreate the HNSW index even if it exists.
+
+    Returns:
+        str: Name of the index that is now in place.
+    """
+    if method not in ("hnsw", "ivfflat"):
+        raise ValueError(f"Unknown ANN index method: {method!r} (expected 'hnsw' or 'ivfflat')")
+
+    with conn.cursor() as cursor:
+        if method == "hnsw":
+            cursor.execute(f"DROP INDEX IF EXISTS {IVFFLAT_INDEX_NAME};")
+            if rebuild:
+                cursor.execute(f"DROP INDEX IF EXISTS {HNSW_INDEX_NAME};")
+            if not _index_exists(cursor, HNSW_INDEX_NAME):
+                cursor.execute(
+                    f"CREATE INDEX {HNSW_INDEX_NAME} ON product_embeddings "
+                    f"USING hnsw (embedding vector_cosine_ops) "
+                    f"WITH (m = {int(m)}, ef_construction = {int(ef_construction)});"
+                )
+            index_name = HNSW_INDEX_NAME
+        else:
+            cursor.execute("SELECT COUNT(*) FROM product_embeddings;")
+            lists = ivfflat_lists_for_rows(cursor.fetchone()[0])
+            cursor.execute(f"DROP INDEX IF EXISTS {HNSW_INDEX_NAME};")
+            cursor.execute(f"DROP INDEX IF EXISTS {IVFFLAT_INDEX_NAME};")
+            cursor.execute(
+                f"CREATE INDEX {IVFFLAT_INDEX_NAME} ON product_embeddings "
+                f"USING ivfflat (embedding vector_cosine_ops) WITH (lists = {lists});"
+            )
+            index_name = IVFFLAT_INDEX_NAME
+
+        # Refresh planner statistics so the new index is costed correctly
+        cursor.execute("ANALYZE product_embeddings;")
+    conn.commit()
+    return index_name
+
+
+def ensure_quantized_index(
+    conn,
+    quantization: str = "halfvec",
+    m: int = HNSW_DEFAULT_M,
+    ef_construction: int = HNSW_DEFAULT_EF_CONSTRUCTION,
+    rebuild: bool = False,
+    drop_full_precision: bool = True
+) -> str:
+    """
+    Create the HNSW expression index over a quantized copy of the embeddings.
+
+    halfvec halves the index size with little recall loss; binary (one bit per
+    dimension, Hamming distance) is 32x smaller but needs a larger rerank factor.
+    The full-precision HNSW/IVFFlat index is dropped unless `drop_full_precision`
+    is False, otherwise keeping both costs more memory than the full index alone.
+
+    Returns:
+        str: Name of the quantized index.
+    """
+    if quantization not in QUANTIZED_INDEXES:
+        raise ValueError(f"Unknown quantization: {quantization!r} (expected one of {sorted(QUANTIZED_INDEXES)})")
+    index_name, expression = QUANTIZED_INDEXES[quantization]
+
+    with conn.cursor() as cursor:
+        if drop_full_precision:
+            cursor.execute(f"DROP INDEX IF EXISTS {HNSW_INDEX_NAME};")
+            cursor.execute(f"DROP INDEX IF EXISTS {IVFFLAT_INDEX_NAME};")
+        if rebuild:
+            cursor.execute(f"DROP INDEX IF EXISTS {index_name};")
+        if not _index_exists(cursor, index_name):
+            cursor.execute(
+                f"CREATE INDEX {index_name} ON product_embeddings "
+                f"USING hnsw ({expression}) "
+                f"WITH (m = {int(m)}, ef_construction = {int(ef_construction)});"
+            )
+        cursor.execute("ANALYZE product_embeddings;")
+    conn.commit()
+    return index_name
+
+
+def index_sizes(conn) -> dict:
+    """
+    On-disk size in bytes of every index on product_embeddings, keyed by index name.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexrelid::regclass::text, pg_relation_size(indexrelid) "
+            "FROM pg_index WHERE indrelid = 'product_embeddings'::regclass ORDER BY 1;"
+        )
+        sizes = dict(cursor.fetchall())
+    conn.rollback()
+    return sizes
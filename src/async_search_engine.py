@@ -0,0 +1,142 @@
+"""
+Asynchronous Product Search Engine.
+
+Same search()/SearchFilters/SearchResult contract as ProductSearchEngine, but
+built on asyncpg with a connection pool, so one slow query no longer blocks
+every search queued behind it. Model encoding runs in a thread pool executor,
+keeping the event loop free while the CPU-bound encode is in progress.
+
+Usage:
+    engine = await AsyncProductSearchEngine.create(model, min_size=2, max_size=10)
+    results = await asyncio.gather(*(engine.search(q) for q in queries))
+    await engine.close()
+"""
+
+import asyncio
+import os
+from concurrent.futures import Executor
+from typing import List, Optional
+
+import asyncpg
+from pgvector.asyncpg import register_vector
+
+from product_search_engine import ProductSearchEngine, SearchFilters, SearchResult, numbered_placeholders
+
+# asyncpg uses Postgres' numbered $1, $2, ... placeholders
+to_asyncpg_placeholders = numbered_placeholders
+
+
+class AsyncProductSearchEngine:
+    def __init__(
+        self,
+        pool,
+        embedding_model,
+        executor: Optional[Executor] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        embedding_cache=None
+    ):
+        """
+        Args:
+            pool: asyncpg pool whose connections have pgvector registered (see create()).
+            embedding_model: Any object exposing `.encode(list_of_texts)`.
+            executor (Optional[Executor]): Executor used for encoding; None uses the loop's default.
+            ef_search (Optional[int]): hnsw.ef_search applied to every query.
+            probes (Optional[int]): ivfflat.probes applied to every query.
+            embedding_cache: Optional query embedding cache (see query_cache.EmbeddingCache).
+        """
+        self.pool = pool
+        self.model = embedding_model
+        self.executor = executor
+        self.ef_search = ef_search
+        self.probes = probes
+        self.embedding_cache = embedding_cache
+        # Used only for its SQL builders, so both engines issue identical queries
+        self._query_builder = ProductSearchEngine(db_connection=None, embedding_model=None)
+
+    @classmethod
+    async def create(
+        cls,
+        embedding_model,
+        min_size: int = 2,
+        max_size: int = 10,
+        **engine_kwargs
+    ) -> "AsyncProductSearchEngine":
+        """
+        Create an engine with a new asyncpg pool configured from the DB_* environment variables.
+        pgvector's codec is registered once per pooled connection.
+        """
+        connect_kwargs = dict(
+            database=os.getenv("DB_NAME"),
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD"),
+            host=os.getenv("DB_HOST"),
+            port=int(os.getenv("DB_PORT", 5432))
+        )
+        if sslmode := os.getenv("DB_SSLMODE"):
+            connect_kwargs["ssl"] = sslmode
+        pool = await asyncpg.create_pool(
+            min_size=min_size,
+            max_size=max_size,
+            init=register_vector,
+            **connect_kwargs
+        )
+        return cls(pool, embedding_model, **engine_kwargs)
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+    async def search(self, query: str, top_k: int = 5, filters: Optional[SearchFilters] = None) -> List[SearchResult]:
+        """
+        Asynchronously search for products.
+
+        Args:
+            query (str): The natural language search query.
+            top_k (int): Number of top results to return.
+            filters (Optional[SearchFilters]): Optional structured filters.
+
+        Returns:
+            List[SearchResult]: Ranked list of search results with similarity scores.
+        """
+        # Step 1: Encode off the event loop
+        query_embedding = await self._encode_query(query)
+
+        # Steps 2-3: Build the same SQL as the synchronous engine
+        base_query = self._query_builder._build_similarity_query(top_k)
+        full_query, params = self._query_builder._build_query_with_filters_and_params(
+            base_query=base_query,
+            query_embedding=query_embedding,
+            top_k=top_k,
+            filters=filters.__dict__ if filters else None
+        )
+
+        # Step 4: Execute on a pooled connection
+        rows = await self._fetch(to_asyncpg_placeholders(full_query), params)
+
+        # Step 5: Hydrate results with the projection the query was built from
+        return [self._query_builder.projection.to_result(row) for row in rows]
+
+    async def _encode_query(self, query: str):
+        if self.embedding_cache is not None:
+            cached = self.embedding_cache.get(query)
+            if cached is not None:
+                return cached
+
+        loop = asyncio.get_running_loop()
+        embedding = await loop.run_in_executor(self.executor, lambda: self.model.encode([query])[0])
+
+        if self.embedding_cache is not None:
+            embedding = self.embedding_cache.put(query, embedding)
+        return embedding
+
+    async def _fetch(self, query: str, params: list):
+        async with self.pool.acquire() as conn:
+            if self.ef_search is None and self.probes is None:
+                return await conn.fetch(query, *params)
+            # set_config(..., true) is transaction-scoped, like SET LOCAL in the sync engine
+            async with conn.transaction():
+                if self.ef_search is not None:
+                    await conn.execute("SELECT set_config('hnsw.ef_search', $1, true)", str(int(self.ef_search)))
+                if self.probes is not None:
+                    await conn.execute("SELECT set_config('ivfflat.probes', $1, true)", str(int(self.probes)))
+                return await conn.fetch(query, *params)
@@ -0,0 +1,283 @@
+"""
+Latency and throughput benchmark for the search path.
+
+Runs against the Postgres configured in the DB_* variables (e.g. the docker-compose
+database) and, for every combination of filter scenario and top_k, measures
+
+    - encode:   model.encode of one query
+    - sql:      building and executing the similarity query (psycopg2 executes and
+                buffers the rows in cursor.execute)
+    - hydrate:  _fetch_results, i.e. fetchall + SearchResult construction
+    - search(): end to end, with p50/p95/p99 and single-client QPS
+
+Results are written as JSON so runs can be diffed between releases:
+
+    python src/benchmark_search.py run --output benchmarks/results/main.json
+    python src/benchmark_search.py compare benchmarks/results/main.json benchmarks/results/branch.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from product_search_engine import PLAN_CACHE_MODES, ProductSearchEngine, SearchFilters
+
+QUERIES = [
+    "red dress for summer",
+    "casual shoes for men",
+    "formal wear",
+    "blue jeans",
+    "black leather bag",
+    "running shoes",
+    "printed kurta with palazzos",
+    "white slim fit shirt",
+    "DKNY trolley bag",
+    "kids party wear",
+    "sports bra",
+    "woollen winter jacket",
+]
+
+FILTER_SCENARIOS: Dict[str, Optional[SearchFilters]] = {
+    "none": None,
+    "gender": SearchFilters(gender="Women"),
+    "price": SearchFilters(min_price=500, max_price=1500),
+    "gender+color": SearchFilters(gender="Men", color="Blue"),
+}
+
+DEFAULT_TOP_KS = [5, 10, 50]
+
+
+def summarize(samples_ms: List[float]) -> dict:
+    """Percentile summary of latency samples in milliseconds."""
+    values = np.asarray(samples_ms, dtype=np.float64)
+    if values.size == 0:
+        return {"n": 0}
+    return {
+        "n": int(values.size),
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(values.max()),
+    }
+
+
+def _ms_since(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
+
+
+def measure_stages(engine: ProductSearchEngine, query: str, top_k: int, filters: Optional[SearchFilters]) -> dict:
+    """One query through the inline search path, timing encode, SQL and hydration separately."""
+    start = time.perf_counter()
+    embedding = engine.model.encode([query])[0]
+    encode_ms = _ms_since(start)
+
+    start = time.perf_counter()
+    sql, params = engine._build_query_with_filters_and_params(
+        base_query=engine._build_similarity_query(top_k),
+        query_embedding=embedding,
+        top_k=top_k,
+        filters=filters.__dict__ if filters else None
+    )
+    cursor = engine._execute_query(sql, params)
+    sql_ms = _ms_since(start)
+
+    start = time.perf_counter()
+    engine._fetch_results(cursor)
+    hydrate_ms = _ms_since(start)
+    engine.db.rollback()
+    return {"encode_ms": encode_ms, "sql_ms": sql_ms, "hydrate_ms": hydrate_ms}
+
+
+def run_scenario(
+    engine: ProductSearchEngine,
+    queries: List[str],
+    top_k: int,
+    filters: Optional[SearchFilters],
+    repeat: int
+) -> dict:
+    """Stage breakdown plus end-to-end search() latency and QPS for one scenario."""
+    stages = {"encode_ms": [], "sql_ms": [], "hydrate_ms": []}
+    for _ in range(repeat):
+        for query in queries:
+            for name, value in measure_stages(engine, query, top_k, filters).items():
+                stages[name].append(value)
+
+    end_to_end = []
+    wall_start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            engine.search(query, top_k=top_k, filters=filters)
+            end_to_end.append(_ms_since(start))
+            engine.db.rollback()
+    wall_seconds = time.perf_counter() - wall_start
+
+    return {
+        "stages": {name: summarize(values) for name, values in stages.items()},
+        "end_to_end_ms": summarize(end_to_end),
+        "qps": len(end_to_end) / wall_seconds if wall_seconds else 0.0,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _catalog_metadata(conn) -> dict:
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM product_embeddings")
+        rows = cursor.fetchone()[0]
+        cursor.execute("SELECT version FROM catalog_version")
+        version = cursor.fetchone()[0]
+    conn.rollback()
+    return {"embedded_rows": rows, "catalog_version": version}
+
+
+def run_benchmark(
+    conn,
+    model,
+    top_ks: List[int],
+    scenarios: List[str],
+    repeat: int,
+    warmup: int = 1,
+    **engine_options
+) -> dict:
+    """
+    Run every (filters, top_k) scenario and return the JSON-serializable report.
+    engine_options (e.g. prepare_statements, plan_cache_mode) are passed to the engine.
+    """
+    engine = ProductSearchEngine(conn, model, **engine_options)
+    for _ in range(warmup):
+        for query in QUERIES:
+            engine.search(query, top_k=max(top_ks))
+            conn.rollback()
+
+    results = []
+    for scenario in scenarios:
+        for top_k in top_ks:
+            result = run_scenario(engine, QUERIES, top_k, FILTER_SCENARIOS[scenario], repeat)
+            results.append({"scenario": f"filters={scenario},top_k={top_k}", "filters": scenario,
+                            "top_k": top_k, **result})
+            e2e = result["end_to_end_ms"]
+            print(f"⏳ {results[-1]['scenario']}: p50 {e2e['p50']:.2f}ms p95 {e2e['p95']:.2f}ms "
+                  f"p99 {e2e['p99']:.2f}ms, {result['qps']:.1f} qps")
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+            "queries": len(QUERIES),
+            "engine_options": engine_options,
+            **_catalog_metadata(conn),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, candidate: dict, metric: str = "p95", threshold: float = 0.10) -> List[dict]:
+    """
+    Compare end-to-end and per-stage latencies of two reports scenario by scenario.
+    A row regresses when the candidate is more than `threshold` (fractional) slower.
+    """
+    baseline_by_scenario = {r["scenario"]: r for r in baseline["results"]}
+    rows = []
+    for result in candidate["results"]:
+        before = baseline_by_scenario.get(result["scenario"])
+        if before is None:
+            continue
+        series = {"end_to_end_ms": (before["end_to_end_ms"], result["end_to_end_ms"])}
+        series.update({name: (before["stages"][name], result["stages"][name]) for name in result["stages"]})
+        for name, (old, new) in series.items():
+            if metric not in old or metric not in new:
+                continue
+            change = (new[metric] - old[metric]) / old[metric] if old[metric] else 0.0
+            rows.append({
+                "scenario": result["scenario"],
+                "series": name,
+                "baseline": old[metric],
+                "candidate": new[metric],
+                "change": change,
+                "regression": change > threshold,
+            })
+    return rows
+
+
+def format_comparison(rows: List[dict], metric: str) -> str:
+    lines = [f"{'scenario':<30}{'series':<16}{f'{metric} before':>14}{f'{metric} after':>14}{'change':>9}"]
+    for row in rows:
+        flag = "  ❌" if row["regression"] else ""
+        lines.append(f"{row['scenario']:<30}{row['series']:<16}{row['baseline']:>14.2f}"
+                     f"{row['candidate']:>14.2f}{row['change']:>+9.1%}{flag}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the product search path.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmark and write a JSON report.")
+    run_parser.add_argument("--output", default=None,
+                            help="Report path (default: benchmarks/results/<timestamp>.json).")
+    run_parser.add_argument("--top-k", type=int, nargs="+", default=DEFAULT_TOP_KS)
+    run_parser.add_argument("--filters", nargs="+", default=list(FILTER_SCENARIOS), choices=list(FILTER_SCENARIOS))
+    run_parser.add_argument("--repeat", type=int, default=5, help="Passes over the query set per scenario.")
+    run_parser.add_argument("--prepare", action="store_true", help="Run the search SQL as prepared statements.")
+    run_parser.add_argument("--plan-cache-mode", default=None, choices=list(PLAN_CACHE_MODES))
+
+    compare_parser = subparsers.add_parser("compare", help="Diff two reports and flag regressions.")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--metric", default="p95", choices=["mean", "p50", "p95", "p99"])
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="Fractional slowdown that counts as a regression.")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.candidate) as f:
+            candidate = json.load(f)
+        rows = compare(baseline, candidate, args.metric, args.threshold)
+        print(format_comparison(rows, args.metric))
+        if any(row["regression"] for row in rows):
+            raise SystemExit(f"❌ {sum(row['regression'] for row in rows)} series regressed by more than "
+                             f"{args.threshold:.0%}")
+        print("✅ No regressions")
+        return
+
+    from encoders import load_encoder
+    from utils import db_connection
+
+    model = load_encoder()
+    with db_connection() as conn:
+        report = run_benchmark(conn, model, args.top_k, args.filters, args.repeat,
+                               prepare_statements=args.prepare, plan_cache_mode=args.plan_cache_mode)
+
+    output = args.output or os.path.join(
+        "benchmarks", "results", f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Binary COPY writer for product_embeddings.
+
+Writing vectors through INSERT renders every float as text on the client and parses
+it again on the server. Here each chunk is encoded in PostgreSQL's binary COPY
+format with a NumPy structured array (one fixed-size record per row, built column
+by column), streamed into a temporary staging table and merged with one statement.
+No per-element Python formatting happens.
+
+Binary COPY layout (https://www.postgresql.org/docs/current/sql-copy.html):
+    header:  PGCOPY\\n\\377\\r\\n\\0, int32 flags, int32 header extension length
+    tuple:   int16 field count, then per field int32 byte length + payload
+    trailer: int16 -1
+pgvector's binary vector payload is int16 dim, int16 unused, dim x float4 (big-endian).
+"""
+
+import io
+from typing import Sequence
+
+import numpy as np
+
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + np.array([0, 0], dtype=">i4").tobytes()
+COPY_TRAILER = np.array([-1], dtype=">i2").tobytes()
+
+STAGING_TABLE = "embeddings_staging"
+
+
+def encode_embeddings_copy(
+    product_ids: Sequence[int],
+    embeddings,
+    content_hashes: Sequence[str],
+    model_id: str
+) -> bytes:
+    """
+    Encode rows of (product_id int4, embedding vector, content_hash text, model_id text)
+    as a complete binary COPY stream.
+    """
+    if len({len(h) for h in content_hashes}) > 1:
+        raise ValueError("content hashes must all have the same length")
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    rows, dim = vectors.shape
+    hashes = np.asarray(content_hashes, dtype="S")
+    hash_width = hashes.dtype.itemsize
+    model_bytes = model_id.encode("utf-8")
+
+    record = np.dtype([
+        ("field_count", ">i2"),
+        ("id_len", ">i4"), ("product_id", ">i4"),
+        ("vector_len", ">i4"), ("dim", ">i2"), ("unused", ">i2"), ("vector", ">f4", (dim,)),
+        ("hash_len", ">i4"), ("content_hash", f"S{hash_width}"),
+        ("model_len", ">i4"), ("model_id", f"S{len(model_bytes)}"),
+    ])
+
+    data = np.empty(rows, dtype=record)
+    data["field_count"] = 4
+    data["id_len"] = 4
+    data["product_id"] = np.asarray(product_ids, dtype=np.int64)
+    data["vector_len"] = 4 + 4 * dim
+    data["dim"] = dim
+    data["unused"] = 0
+    data["vector"] = vectors
+    data["hash_len"] = hash_width
+    data["content_hash"] = hashes
+    data["model_len"] = len(model_bytes)
+    data["model_id"] = model_bytes
+
+    return COPY_HEADER + data.tobytes() + COPY_TRAILER
+
+
+def copy_embeddings(cursor, product_ids, embeddings, content_hashes, model_id: str) -> int:
+    """
+    Stream embeddings into a staging table via binary COPY and upsert them into
+    product_embeddings in one statement. Returns the number of rows merged.
+    """
+    if len(product_ids) == 0:
+        return 0
+
+    # ON COMMIT DELETE ROWS keeps the table for the session; TRUNCATE covers repeated
+    # calls within one transaction
+    cursor.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+            product_id INTEGER,
+            embedding vector,
+            content_hash TEXT,
+            model_id TEXT
+        ) ON COMMIT DELETE ROWS;
+        TRUNCATE {STAGING_TABLE};
+    """)
+    payload = encode_embeddings_copy(product_ids, embeddings, content_hashes, model_id)
+    cursor.copy_expert(f"COPY {STAGING_TABLE} FROM STDIN WITH (FORMAT binary)", io.BytesIO(payload))
+    cursor.execute(f"""
+        INSERT INTO product_embeddings (product_id, embedding, content_hash, model_id, embedded_at)
+        SELECT product_id, embedding, content_hash, model_id, now()
+        FROM {STAGING_TABLE}
+        ON CONFLICT (product_id) DO UPDATE SET
+            embedding = EXCLUDED.embedding,
+            content_hash = EXCLUDED.content_hash,
+            model_id = EXCLUDED.model_id,
+            embedded_at = EXCLUDED.embedded_at;
+    """)
+    return cursor.rowcount
@@ -1,18 +1,30 @@
 import pandas as pd
+from typing import Iterator
+
+# Raw CSV header -> SQL-safe column name
+COLUMN_RENAMES = {
+    'ProductID': 'product_id',
+    'ProductName': 'product_name',
+    'ProductBrand': 'product_brand',
+    'Gender': 'gender',
+    'Price (INR)': 'price_inr',
+    'NumImages': 'num_images',
+    'Description': 'description',
+    'PrimaryColor': 'primary_color'
+}
 
 def clean_raw_csv(input_path: str) -> pd.DataFrame:
     df = pd.read_csv(input_path)
 
     # Rename columns to be SQL-safe
-    df = df.rename(columns={
-        'ProductID': 'product_id',
-        'ProductName': 'product_name',
-        'ProductBrand': 'product_brand',
-        'Gender': 'gender',
-        'Price (INR)': 'price_inr',
-        'NumImages': 'num_images',
-        'Description': 'description',
-        'PrimaryColor': 'primary_color'
-    })
+    df = df.rename(columns=COLUMN_RENAMES)
 
     return df
+
+def iter_clean_chunks(input_path: str, chunksize: int = 50_000) -> Iterator[pd.DataFrame]:
+    """
+    Stream the raw CSV in chunks with the same renaming as clean_raw_csv,
+    so large catalogs never have to fit in memory at once.
+    """
+    for chunk in pd.read_csv(input_path, chunksize=chunksize):
+        yield chunk.rename(columns=COLUMN_RENAMES)
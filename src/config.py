@@ -1 +1,8 @@
-MODEL_PATH = "/app/models/snapshots/c9745ed1d9f207416be6d2e6f8de32d1f16199bf"
+import os
+
+# Local snapshot of all-MiniLM-L6-v2; override outside the container, e.g.
+# MODEL_PATH=models/snapshots/c9745ed1d9f207416be6d2e6f8de32d1f16199bf
+MODEL_PATH = os.getenv("MODEL_PATH", "/app/models/snapshots/c9745ed1d9f207416be6d2e6f8de32d1f16199bf")
+
+# Stored next to every embedding so a model change triggers a re-embed
+MODEL_ID = f"sentence-transformers/all-MiniLM-L6-v2@{os.path.basename(MODEL_PATH)}"
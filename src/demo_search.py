@@ -22,20 +22,28 @@ Usage:
     python src/demo_search.py
 """
 
+import time
+_STARTED_AT = time.perf_counter()
+
 from dotenv import load_dotenv
 load_dotenv(".env.local")
 
-from sentence_transformers import SentenceTransformer
-from pgvector.psycopg2 import register_vector
-from utils import db_connection
+from utils import db_connection, get_pool
 from product_search_engine import ProductSearchEngine
+from startup import StartupTimer, preload_encoder
 
 print("🔍 Initializing Product Search Engine...")
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
+timer = StartupTimer(started_at=_STARTED_AT)
+timer.record("imports", time.perf_counter() - _STARTED_AT)
+# Load the model from the local snapshot while the pool connects
+preloader = preload_encoder(timer=timer)
+with timer.stage("db connect"):
+    get_pool()
 
 with db_connection() as conn:
-    register_vector(conn)
+    model = preloader.get()
+    print(timer.report())
     search_engine = ProductSearchEngine(conn, model)
     
     sample_queries = [
@@ -50,7 +58,7 @@ with db_connection() as conn:
         print(f"Query: '{query}'")
         print(f"{'='*60}")
         
-        results = search_engine.search(query, top_k=3)
+        results = search_engine.search(query, top_k=3, description_chars=101)
         
         if not results:
             print("No results found.")
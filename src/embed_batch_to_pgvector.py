@@ -1,42 +1,244 @@
+import argparse
+import hashlib
+import os
+import queue
+import threading
 import time
-from psycopg2.extras import execute_batch
-from pgvector.psycopg2 import register_vector
-from sentence_transformers import SentenceTransformer
-from utils import db_connection
-from config import MODEL_PATH
+from utils import db_connection, bump_catalog_version
+from config import MODEL_PATH, MODEL_ID
+from ann_index import ensure_ann_index, ensure_quantized_index, index_sizes
+from binary_copy import copy_embeddings
 
-print("🚀 Starting full DB embedding...")
-start_time = time.time()
 
-# Load model
-model = SentenceTransformer(MODEL_PATH)
+def content_hash(description: str) -> str:
+    """md5 hex digest of the description; identical to Postgres md5() on a UTF-8 database."""
+    return hashlib.md5(description.encode("utf-8")).hexdigest()
 
-with db_connection() as conn:
-    register_vector(conn)
+
+# Products whose embedding is missing, was computed from a different description,
+# or was produced by a different model. The hash comparison runs server-side, so
+# unchanged descriptions are never sent to the client.
+STALE_ROWS_SELECT = """
+    SELECT p.product_id, p.description
+    FROM products p
+    LEFT JOIN product_embeddings pe ON pe.product_id = p.product_id
+    WHERE p.description IS NOT NULL
+      AND (
+          pe.product_id IS NULL
+          OR pe.content_hash IS DISTINCT FROM md5(p.description)
+          OR pe.model_id IS DISTINCT FROM %s
+      )
+"""
+STALE_ROWS_SQL = STALE_ROWS_SELECT + " ORDER BY p.product_id;"
+
+
+def fetch_stale_rows(cursor, model_id: str) -> list:
+    """Fetch all products needing (re-)embedding, see STALE_ROWS_SQL."""
+    cursor.execute(STALE_ROWS_SQL, (model_id,))
+    return cursor.fetchall()
+
+
+def prune_orphaned_embeddings(cursor) -> int:
+    """Delete embeddings for products that were removed or no longer have a description."""
+    cursor.execute("""
+        DELETE FROM product_embeddings pe
+        WHERE NOT EXISTS (
+            SELECT 1 FROM products p
+            WHERE p.product_id = pe.product_id AND p.description IS NOT NULL
+        );
+    """)
+    return cursor.rowcount
+
+
+def write_embeddings(cursor, product_ids, descriptions, embeddings, model_id: str) -> None:
+    """Upsert embeddings with their provenance through the binary COPY path."""
+    hashes = [content_hash(description) for description in descriptions]
+    copy_embeddings(cursor, product_ids, embeddings, hashes, model_id)
+
+
+class EmbeddingWriter(threading.Thread):
+    """
+    Background thread that writes encoded chunks while the next chunk is being encoded.
+
+    Chunks arrive through a bounded queue, so the encoder blocks (backpressure) when
+    writes fall behind. Each chunk is committed on its own connection, which keeps the
+    reader's server-side cursor untouched and makes progress durable chunk by chunk.
+    """
+
+    def __init__(self, conn, chunks: queue.Queue, model_id: str):
+        super().__init__(name="embedding-writer", daemon=True)
+        self.conn = conn
+        self.chunks = chunks
+        self.model_id = model_id
+        self.rows_written = 0
+        self.write_seconds = 0.0
+        self.error = None
+
+    def run(self):
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                return
+            if self.error is not None:
+                # Keep draining so the producer never blocks on a dead writer
+                continue
+            try:
+                start = time.perf_counter()
+                with self.conn.cursor() as cursor:
+                    write_embeddings(cursor, *chunk, self.model_id)
+                self.conn.commit()
+                self.write_seconds += time.perf_counter() - start
+                self.rows_written += len(chunk[0])
+            except Exception as e:
+                self.conn.rollback()
+                self.error = e
+
+
+def embed_streaming(model, model_id: str, chunk_size: int = 1000, queue_size: int = 2) -> int:
+    """
+    Stream stale rows through a named (server-side) cursor in fixed-size chunks,
+    encode each chunk and hand it to an EmbeddingWriter. Peak memory is bounded by
+    roughly (queue_size + 2) chunks regardless of catalog size.
+
+    Returns:
+        int: Number of embeddings written.
+    """
+    chunks = queue.Queue(maxsize=queue_size)
+    encode_seconds = 0.0
+
+    with db_connection() as read_conn, db_connection() as write_conn:
+        writer = EmbeddingWriter(write_conn, chunks, model_id)
+        writer.start()
+        try:
+            with read_conn.cursor(name="stale_products") as cursor:
+                cursor.itersize = chunk_size
+                cursor.execute(STALE_ROWS_SQL, (model_id,))
+                while writer.error is None:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    product_ids = [row[0] for row in rows]
+                    descriptions = [row[1] for row in rows]
+
+                    start = time.perf_counter()
+                    embeddings = model.encode(descriptions, batch_size=64)
+                    encode_seconds += time.perf_counter() - start
+
+                    chunks.put((product_ids, descriptions, embeddings))
+                    print(f"⏳ Encoded chunk of {len(rows)} rows ({writer.rows_written} written so far)...")
+        finally:
+            chunks.put(None)
+            writer.join()
+
+        if writer.error is not None:
+            raise writer.error
+        print(f"📊 Encode {encode_seconds:.2f}s, write {writer.write_seconds:.2f}s (overlapped)")
+    return writer.rows_written
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Embed product descriptions into product_embeddings.")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Read with a server-side cursor in chunks and write on a background thread.")
+    parser.add_argument("--chunk-size", type=int, default=1000,
+                        help="Rows per chunk in streaming mode.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Embed in this many worker processes, sharded by product_id with resumable checkpoints.")
+    parser.add_argument("--shards-per-worker", type=int, default=4,
+                        help="Shards planned per worker for a new sharded run.")
+    parser.add_argument("--run-id", default=None,
+                        help="Checkpoint key for sharded runs (default: model id + current catalog version).")
+    return parser.parse_args()
+
+
+def default_run_id(conn, model_id: str) -> str:
+    """
+    Sharded runs are keyed on the catalog version, which is only bumped once a run
+    finishes - so rerunning after a crash resumes the same run.
+    """
     with conn.cursor() as cursor:
-        # Fetch products with descriptions
-        cursor.execute("SELECT product_id, description FROM products WHERE description IS NOT NULL;")
-        rows = cursor.fetchall()
-        print(f"📦 Fetched {len(rows)} rows")
+        cursor.execute("SELECT version FROM catalog_version")
+        version = cursor.fetchone()[0]
+    conn.rollback()
+    return f"{model_id}:v{version}"
+
+
+def main():
+    args = parse_args()
+    mode = f" ({args.workers} workers)" if args.workers > 1 else " (streaming)" if args.streaming else ""
+    print(f"🚀 Starting incremental DB embedding{mode}...")
+    start_time = time.time()
+
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            pruned = prune_orphaned_embeddings(cursor)
+            print(f"🧹 Pruned {pruned} orphaned embeddings")
+        conn.commit()
+
+        if args.workers > 1:
+            from sharded_embedding import embed_sharded, summarize
+            results = embed_sharded(
+                MODEL_PATH,
+                MODEL_ID,
+                workers=args.workers,
+                run_id=args.run_id or default_run_id(conn, MODEL_ID),
+                shards_per_worker=args.shards_per_worker
+            )
+            embedded = sum(result.rows for result in results)
+            if results:
+                print(summarize(results))
+        elif args.streaming:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(MODEL_PATH)
+            embedded = embed_streaming(model, MODEL_ID, chunk_size=args.chunk_size)
+        else:
+            with conn.cursor() as cursor:
+                # Fetch products with new, changed or differently-embedded descriptions
+                rows = fetch_stale_rows(cursor, MODEL_ID)
+                print(f"📦 Fetched {len(rows)} rows needing (re-)embedding")
+
+                if rows:
+                    # Only pay the model load cost when there is something to encode
+                    from sentence_transformers import SentenceTransformer
+                    model = SentenceTransformer(MODEL_PATH)
+
+                    # Extract data
+                    product_ids = [row[0] for row in rows]
+                    descriptions = [row[1] for row in rows]
+
+                    print("🧠 Generating embeddings...")
+                    embeddings = model.encode(descriptions, batch_size=64, show_progress_bar=True)
 
-        # Extract data
-        product_ids = [row[0] for row in rows]
-        descriptions = [row[1] for row in rows]
+                    print("💾 Inserting into product_embeddings...")
+                    write_embeddings(cursor, product_ids, descriptions, embeddings, MODEL_ID)
+            embedded = len(rows)
 
-        print("🧠 Generating embeddings...")
-        embeddings = model.encode(descriptions, batch_size=64, show_progress_bar=True)
+        if embedded or pruned:
+            with conn.cursor() as cursor:
+                version = bump_catalog_version(cursor)
+            print(f"🔖 Catalog version is now {version}")
+        conn.commit()
 
-        # Batch insert embeddings using pgvector native support
-        data = list(zip(product_ids, embeddings))  # embeddings are numpy arrays
+        # Build/refresh the ANN index now that the table is populated
+        quantization = os.getenv("ANN_QUANTIZATION")
+        if quantization:
+            # The quantized index replaces the full-precision one rather than sitting next to it
+            before = index_sizes(conn)
+            print(f"🧭 Ensuring {quantization} quantized index on product_embeddings...")
+            print(f"✅ Index ready: {ensure_quantized_index(conn, quantization=quantization)}")
+            after = index_sizes(conn)
+            print(f"📏 Index size: {sum(before.values()) / 1e6:.1f} MB -> {sum(after.values()) / 1e6:.1f} MB")
+            for name, size in after.items():
+                print(f"   {name}: {size / 1e6:.1f} MB")
+        else:
+            index_method = os.getenv("ANN_INDEX_METHOD", "hnsw")
+            print(f"🧭 Ensuring {index_method} index on product_embeddings...")
+            index_name = ensure_ann_index(conn, method=index_method)
+            print(f"✅ Index ready: {index_name}")
 
-        print("💾 Inserting into product_embeddings...")
-        execute_batch(cursor, """
-            INSERT INTO product_embeddings (product_id, embedding)
-            VALUES (%s, %s)
-            ON CONFLICT (product_id) DO UPDATE SET embedding = EXCLUDED.embedding;
-        """, data)
+    elapsed_time = time.time() - start_time
+    print(f"✅ Done embedding {embedded} products. ⏱️ Took {elapsed_time:.2f} seconds.")
 
-    conn.commit()
 
-elapsed_time = time.time() - start_time
-print(f"✅ Done embedding all products. ⏱️ Took {elapsed_time:.2f} seconds.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Query encoders for ProductSearchEngine.
+
+The engine only needs `.encode(list_of_texts)` returning one L2-normalized float32
+row per text. Two backends are provided:
+
+    - SentenceTransformerEncoder: the PyTorch model from config.MODEL_PATH
+    - OnnxEncoder: the same all-MiniLM-L6-v2 weights exported to ONNX and run with
+      ONNX Runtime (optionally dynamically quantized to int8), tokenized with the
+      snapshot's tokenizer.json. Much cheaper per single-query encode on CPU and no
+      torch import at serving time.
+
+`load_encoder()` picks the backend from QUERY_ENCODER ("sentence-transformers",
+"onnx" or "onnx-int8"); the ONNX files live in ONNX_MODEL_DIR (default models/onnx).
+
+Usage:
+    python src/encoders.py export            # writes model.onnx and model_int8.onnx
+    python src/encoders.py parity            # compares ONNX backends against PyTorch
+"""
+
+import argparse
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+from config import MODEL_PATH
+
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "models/onnx")
+ONNX_FILENAMES = {"onnx": "model.onnx", "onnx-int8": "model_int8.onnx"}
+BACKENDS = ["sentence-transformers"] + sorted(ONNX_FILENAMES)
+
+PARITY_TEXTS = [
+    "red dress for summer",
+    "casual shoes for men",
+    "formal wear",
+    "blue jeans",
+    "black leather bag",
+    "running shoes",
+    "Women Navy Blue Printed Straight Kurta with Palazzos",
+    "Men White Solid Slim Fit Casual Shirt",
+]
+
+
+def mean_pool(token_embeddings: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """Average the token embeddings over non-padding tokens (sentence-transformers mean pooling)."""
+    mask = attention_mask[..., None].astype(np.float32)
+    summed = (token_embeddings * mask).sum(axis=1)
+    return summed / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+class SentenceTransformerEncoder:
+    """The PyTorch SentenceTransformer, imported lazily."""
+
+    def __init__(self, model_path: str = MODEL_PATH):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_path)
+
+    def encode(self, texts: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        return self.model.encode(texts, batch_size=batch_size, **kwargs)
+
+
+class OnnxEncoder:
+    """all-MiniLM-L6-v2 on ONNX Runtime: tokenize, run the transformer, mean-pool, normalize."""
+
+    def __init__(
+        self,
+        onnx_path: str,
+        tokenizer_path: str = os.path.join(MODEL_PATH, "tokenizer.json"),
+        max_length: int = 256,
+        intra_op_threads: Optional[int] = None
+    ):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        batches = [self._encode_batch(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+        return np.concatenate(batches) if batches else np.empty((0, 384), dtype=np.float32)
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.asarray([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.asarray([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.asarray([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        inputs = {name: value for name, value in inputs.items() if name in self.input_names}
+        token_embeddings = self.session.run(None, inputs)[0]
+        return l2_normalize(mean_pool(token_embeddings, inputs["attention_mask"])).astype(np.float32)
+
+
+def _resolve_backend(backend: Optional[str]) -> str:
+    backend = backend or os.getenv("QUERY_ENCODER", "sentence-transformers")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend: {backend!r} (expected one of {BACKENDS})")
+    return backend
+
+
+def import_backend(backend: Optional[str] = None) -> None:
+    """
+    Import the backend's heavy dependencies (torch via sentence_transformers, or
+    onnxruntime). Importing is otherwise deferred to encoder construction; calling
+    this first lets start-up timing separate import cost from model loading.
+    """
+    if _resolve_backend(backend) == "sentence-transformers":
+        import sentence_transformers  # noqa: F401
+    else:
+        import onnxruntime  # noqa: F401
+        import tokenizers  # noqa: F401
+
+
+def load_encoder(backend: Optional[str] = None, onnx_dir: str = ONNX_MODEL_DIR):
+    """Build the query encoder selected by `backend` or the QUERY_ENCODER env var."""
+    backend = _resolve_backend(backend)
+    if backend == "sentence-transformers":
+        return SentenceTransformerEncoder()
+    return OnnxEncoder(os.path.join(onnx_dir, ONNX_FILENAMES[backend]))
+
+
+def export_onnx(model_path: str = MODEL_PATH, output_dir: str = ONNX_MODEL_DIR, int8: bool = True) -> List[str]:
+    """
+    Export the snapshot's transformer to ONNX with dynamic batch/sequence axes and,
+    optionally, a dynamically quantized int8 copy (weights int8, activations
+    quantized at run time). Pooling and normalization stay in OnnxEncoder.
+
+    Returns:
+        List[str]: Paths of the written models.
+    """
+    import torch
+    from transformers import AutoModel
+
+    os.makedirs(output_dir, exist_ok=True)
+    model = AutoModel.from_pretrained(model_path).eval()
+    onnx_path = os.path.join(output_dir, ONNX_FILENAMES["onnx"])
+    dummy = {
+        "input_ids": torch.ones(1, 8, dtype=torch.long),
+        "attention_mask": torch.ones(1, 8, dtype=torch.long),
+        "token_type_ids": torch.zeros(1, 8, dtype=torch.long),
+    }
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in dummy}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    torch.onnx.export(
+        model,
+        (dummy["input_ids"], dummy["attention_mask"], dummy["token_type_ids"]),
+        onnx_path,
+        input_names=list(dummy),
+        output_names=["last_hidden_state"],
+        dynamic_axes=dynamic_axes,
+        opset_version=14,
+    )
+    written = [onnx_path]
+
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        int8_path = os.path.join(output_dir, ONNX_FILENAMES["onnx-int8"])
+        quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+        written.append(int8_path)
+    return written
+
+
+@dataclass
+class ParityReport:
+    backend: str
+    min_cosine: float
+    mean_cosine: float
+    max_abs_diff: float
+    single_query_ms: float
+
+
+def _single_query_ms(encoder, texts: List[str], repeats: int = 3) -> float:
+    encoder.encode(texts[:1])  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for text in texts:
+            encoder.encode([text])
+    return (time.perf_counter() - start) * 1000 / (repeats * len(texts))
+
+
+def parity_report(backend: str, reference, candidate, texts: List[str] = PARITY_TEXTS) -> ParityReport:
+    """Compare a candidate encoder's embeddings (and single-query latency) against the reference."""
+    expected = l2_normalize(np.asarray(reference.encode(texts), dtype=np.float32))
+    actual = np.asarray(candidate.encode(texts), dtype=np.float32)
+    cosines = np.sum(expected * l2_normalize(actual), axis=1)
+    return ParityReport(
+        backend=backend,
+        min_cosine=float(cosines.min()),
+        mean_cosine=float(cosines.mean()),
+        max_abs_diff=float(np.abs(expected - actual).max()),
+        single_query_ms=_single_query_ms(candidate, texts),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and check ONNX query encoders.")
+    parser.add_argument("command", choices=["export", "parity"])
+    parser.add_argument("--output-dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("--no-int8", action="store_true", help="Skip the int8 quantized export.")
+    parser.add_argument("--min-cosine", type=float, default=0.99,
+                        help="parity fails when any text's cosine to the PyTorch embedding is below this.")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        for path in export_onnx(output_dir=args.output_dir, int8=not args.no_int8):
+            print(f"✅ Wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+        return
+
+    reference = SentenceTransformerEncoder()
+    reports = [parity_report("sentence-transformers", reference, reference)]
+    for backend in sorted(ONNX_FILENAMES):
+        path = os.path.join(args.output_dir, ONNX_FILENAMES[backend])
+        if os.path.exists(path):
+            reports.append(parity_report(backend, reference, OnnxEncoder(path)))
+    print(json.dumps([report.__dict__ for report in reports], indent=2))
+    failed = [r.backend for r in reports if r.min_cosine < args.min_cosine]
+    if failed:
+        raise SystemExit(f"❌ Parity below {args.min_cosine}: {', '.join(failed)}")
+    print("✅ All backends within parity threshold")
+
+
+if __name__ == "__main__":
+    main()
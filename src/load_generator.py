@@ -0,0 +1,161 @@
+"""
+Concurrent load generator for ProductSearchEngine.
+
+Replays a mixed workload (benchmark_search queries x filter scenarios x top_k) from
+N client threads, each borrowing connections from its own ConnectionPool, and
+appends one JSON line per (catalog size, client count) to the results file.
+Query embeddings are computed once up front and served from an EmbeddingCache, so
+the numbers reflect the database side unless --include-encode is given.
+
+Usage:
+    python src/synthetic_catalog.py generate --rows 100000
+    python src/load_generator.py run --clients 1 4 16 --requests 200
+    python src/synthetic_catalog.py generate --rows 1000000
+    python src/load_generator.py run --clients 1 4 16 --requests 200
+    python src/load_generator.py report
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from benchmark_search import FILTER_SCENARIOS, QUERIES, summarize
+from product_search_engine import ProductSearchEngine, SearchFilters
+from query_cache import EmbeddingCache
+from utils import ConnectionPool, connection_kwargs
+
+RESULTS_PATH = "benchmarks/results/load_generator.jsonl"
+
+Request = Tuple[str, Optional[SearchFilters], int]
+
+
+def build_workload(top_ks: List[int]) -> List[Request]:
+    """Every query under every filter scenario and top_k."""
+    return [
+        (query, filters, top_k)
+        for query in QUERIES
+        for filters in FILTER_SCENARIOS.values()
+        for top_k in top_ks
+    ]
+
+
+def _client(engine: ProductSearchEngine, pool: ConnectionPool, requests: List[Request]):
+    latencies, errors = [], 0
+    for query, filters, top_k in requests:
+        start = time.perf_counter()
+        try:
+            with pool.connection() as conn:
+                engine.using(conn).search(query, top_k=top_k, filters=filters)
+        except Exception:
+            errors += 1
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, errors
+
+
+def replay(
+    engine: ProductSearchEngine,
+    pool: ConnectionPool,
+    workload: List[Request],
+    clients: int,
+    requests_per_client: int,
+    seed: int = 0
+) -> dict:
+    """Run `clients` threads, each issuing requests_per_client requests sampled from the workload."""
+    rng = random.Random(seed)
+    plans = [[rng.choice(workload) for _ in range(requests_per_client)] for _ in range(clients)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        outcomes = list(executor.map(lambda plan: _client(engine, pool, plan), plans))
+    wall_seconds = time.perf_counter() - start
+
+    latencies = [latency for client_latencies, _ in outcomes for latency in client_latencies]
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": sum(errors for _, errors in outcomes),
+        "qps": len(latencies) / wall_seconds if wall_seconds else 0.0,
+        "latency_ms": summarize(latencies),
+    }
+
+
+def catalog_rows(pool: ConnectionPool) -> int:
+    with pool.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM product_embeddings")
+            return cursor.fetchone()[0]
+
+
+def format_report(rows: List[dict], metric: str = "p95") -> str:
+    """Latency/QPS grid: one line per catalog size, one column per client count."""
+    clients = sorted({row["clients"] for row in rows})
+    by_size = {}
+    for row in rows:
+        # Latest run wins for repeated (size, clients) pairs
+        by_size.setdefault(row["catalog_rows"], {})[row["clients"]] = row
+
+    header = f"{'catalog rows':>14}" + "".join(f"{f'{c} clients':>22}" for c in clients)
+    lines = [header, f"{'':>14}" + "".join(f"{f'{metric} ms / qps':>22}" for _ in clients)]
+    for size in sorted(by_size):
+        cells = []
+        for c in clients:
+            row = by_size[size].get(c)
+            cells.append(f"{row['latency_ms'][metric]:>12.1f} / {row['qps']:>7.1f}" if row else f"{'-':>22}")
+        lines.append(f"{size:>14,}" + "".join(f"{cell:>22}" for cell in cells))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a search workload at several concurrency levels.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run")
+    run_parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    run_parser.add_argument("--requests", type=int, default=200, help="Requests per client.")
+    run_parser.add_argument("--top-k", type=int, nargs="+", default=[10])
+    run_parser.add_argument("--include-encode", action="store_true",
+                            help="Encode every query instead of serving embeddings from a warm cache.")
+    run_parser.add_argument("--output", default=RESULTS_PATH)
+    report_parser = subparsers.add_parser("report")
+    report_parser.add_argument("--output", default=RESULTS_PATH)
+    report_parser.add_argument("--metric", default="p95", choices=["p50", "p95", "p99"])
+    args = parser.parse_args()
+
+    if args.command == "report":
+        with open(args.output) as f:
+            print(format_report([json.loads(line) for line in f if line.strip()], args.metric))
+        return
+
+    from encoders import load_encoder
+
+    model = load_encoder()
+    embedding_cache = None
+    if not args.include_encode:
+        embedding_cache = EmbeddingCache(max_size=len(QUERIES))
+        for query, embedding in zip(QUERIES, model.encode(QUERIES)):
+            embedding_cache.put(query, embedding)
+    engine = ProductSearchEngine(None, model, embedding_cache=embedding_cache)
+    workload = build_workload(args.top_k)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    for clients in args.clients:
+        pool = ConnectionPool(min_size=clients, max_size=clients, **connection_kwargs())
+        try:
+            rows = catalog_rows(pool)
+            result = {"catalog_rows": rows, "timestamp": time.time(), **replay(engine, pool, workload, clients,
+                                                                                args.requests)}
+        finally:
+            pool.close()
+        latency = {metric: result["latency_ms"].get(metric, float("nan")) for metric in ("p50", "p95", "p99")}
+        print(f"⏳ {rows:,} rows, {clients} clients: p50 {latency['p50']:.1f}ms p95 {latency['p95']:.1f}ms "
+              f"p99 {latency['p99']:.1f}ms, {result['qps']:.1f} qps, {result['errors']} errors")
+        with open(args.output, "a") as f:
+            f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
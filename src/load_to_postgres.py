@@ -1,40 +1,93 @@
-import numpy as np
-from psycopg2.extensions import register_adapter, AsIs
-from clean_data import clean_raw_csv
+import io
 import time
-from utils import db_connection 
-
-# Register numpy int types so psycopg2 can handle them
-register_adapter(np.int64, AsIs)
-register_adapter(np.int32, AsIs)
-
-# Delay to wait for db to be ready
-time.sleep(5)
-
-df = clean_raw_csv("data/myntra_products_catalog.csv")
-print(f"✅ Loaded CSV with {len(df)} rows")
-
-total = len(df)
-with db_connection() as conn:
-    with conn.cursor() as cursor:
-        for i, (_, row) in enumerate(df.iterrows(), start=1):
-            cursor.execute("""
-                INSERT INTO products (
-                    product_id, product_name, product_brand,
-                    gender, price_inr, num_images, description, primary_color
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (product_id) DO NOTHING;
-            """, (
-                int(row.product_id),
-                row.product_name,
-                row.product_brand,
-                row.gender,
-                int(row.price_inr),
-                int(row.num_images),
-                row.description,
-                row.primary_color
-            ))
-            if i % 1000 == 0 or i == total:
-                print(f"⏳ Inserted {i}/{total} rows...")
+from clean_data import iter_clean_chunks
+from utils import db_connection, bump_catalog_version, wait_for_database
+
+CSV_PATH = "data/myntra_products_catalog.csv"
+CHUNK_SIZE = 50_000
+
+PRODUCT_COLUMNS = [
+    "product_id", "product_name", "product_brand",
+    "gender", "price_inr", "num_images", "description", "primary_color"
+]
+INTEGER_COLUMNS = ["product_id", "price_inr", "num_images"]
+
+
+def create_staging_table(cursor) -> None:
+    """
+    Temporary staging table dropped at commit. staged_seq numbers the rows in COPY
+    order, so merge_staging can keep the last occurrence of a duplicated product_id.
+    """
+    cursor.execute("""
+        CREATE TEMP TABLE products_staging
+        (LIKE products INCLUDING DEFAULTS, staged_seq bigint GENERATED ALWAYS AS IDENTITY) ON COMMIT DROP;
+    """)
+
+
+def copy_chunk(cursor, chunk) -> int:
+    """COPY one cleaned DataFrame chunk into the staging table. Returns the number of rows copied."""
+    chunk = chunk[PRODUCT_COLUMNS].copy()
+    # Nullable ints so missing values are written as empty fields (NULL), not "nan" or "1.0"
+    for column in INTEGER_COLUMNS:
+        chunk[column] = chunk[column].astype("Int64")
+
+    buffer = io.StringIO()
+    chunk.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY products_staging ({', '.join(PRODUCT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
+    return len(chunk)
+
+
+def merge_staging(cursor) -> int:
+    """
+    Upsert the staged rows into products in one statement. When a product_id was staged
+    more than once, the last staged row wins. Rows whose values are unchanged are left
+    untouched. Returns the number of rows written.
+    """
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in PRODUCT_COLUMNS[1:])
+    changed = " OR ".join(f"products.{c} IS DISTINCT FROM EXCLUDED.{c}" for c in PRODUCT_COLUMNS[1:])
+    cursor.execute(f"""
+        INSERT INTO products ({', '.join(PRODUCT_COLUMNS)})
+        SELECT DISTINCT ON (product_id) {', '.join(PRODUCT_COLUMNS)}
+        FROM products_staging
+        ORDER BY product_id, staged_seq DESC
+        ON CONFLICT (product_id) DO UPDATE SET {updates}
+        WHERE {changed};
+    """)
+    return cursor.rowcount
+
+
+def main():
+    # Wait until the database actually answers instead of sleeping a fixed time
+    waited = wait_for_database()
+    print(f"✅ Database ready (waited {waited:.1f}s)")
+
+    start_time = time.time()
+    copied = 0
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            create_staging_table(cursor)
+            for chunk in iter_clean_chunks(CSV_PATH, chunksize=CHUNK_SIZE):
+                copied += copy_chunk(cursor, chunk)
+                elapsed = time.time() - start_time
+                print(f"⏳ Copied {copied} rows into staging ({copied / elapsed:,.0f} rows/sec)...")
+
+            written = merge_staging(cursor)
+            # Unchanged reloads keep the version, so result caches stay valid
+            version = bump_catalog_version(cursor) if written > 0 else None
         conn.commit()
-print("✅ Finished inserting rows into Postgres")
+
+    elapsed = time.time() - start_time
+    print(f"✅ Upserted {written} new/changed rows of {copied} in {elapsed:.2f}s ({copied / elapsed:,.0f} rows/sec)")
+    if version is not None:
+        print(f"🔖 Catalog version is now {version}")
+    else:
+        print("🔖 No changes, catalog version left as is")
+    print("✅ Finished inserting rows into Postgres")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""
+In-process, memory-mapped vector index for read-heavy replicas.
+
+`export` dumps product_embeddings plus the product columns into a directory of
+flat files; `MmapVectorIndex` answers searches from them with a vectorized dot
+product, boolean filter masks and argpartition top-k. No Postgres round trip is
+needed on the hot path, and several worker processes opening the same directory
+share one page-cached copy of the data.
+
+`directory` is a symlink to the current export, `<directory>.v<catalog version>.<ns>`;
+each export writes a new sibling and then atomically repoints the symlink, keeping the
+previous export for readers still opening it.
+
+Directory layout:
+    manifest.json              row count, dimension, catalog version, category vocabularies
+    embeddings.f32             (rows, dim) float32, L2-normalized, so dot product = cosine similarity
+    product_id.npy             int64
+    price_inr.npy              float64 (NaN = NULL)
+    num_images.npy             float64 (NaN = NULL)
+    <gender|product_brand|primary_color>.codes.npy   int32 codes into the manifest vocabulary (-1 = NULL)
+    <text column>.bin / .offsets.npy / .nulls.npy   UTF-8 blob, (rows + 1) int64 offsets, NULL flags
+
+Usage:
+    python src/mmap_index.py export /data/mmap_index
+    engine = ProductSearchEngine(None, model, vector_index=MmapVectorIndex.open("/data/mmap_index"))
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from product_search_engine import SearchProjection, SearchResult
+
+CATEGORY_COLUMNS = ["gender", "product_brand", "primary_color"]
+TEXT_COLUMNS = ["product_name", "product_brand", "gender", "description", "primary_color"]
+NUMERIC_COLUMNS = ["price_inr", "num_images"]
+
+# SearchFilters field -> indexed column
+FILTER_COLUMNS = {"gender": "gender", "brand": "product_brand", "color": "primary_color"}
+
+# Filters matching at most this fraction of the rows gather the matching embeddings out of the
+# map; broader ones score the mapped matrix in place and mask the rest out
+GATHER_MAX_FRACTION = 0.05
+
+EXPORT_SQL = """
+    SELECT p.product_id, p.product_name, p.product_brand, p.gender, p.price_inr,
+        p.num_images, p.description, p.primary_color, pe.embedding
+    FROM products p
+    JOIN product_embeddings pe ON p.product_id = pe.product_id
+    ORDER BY p.product_id
+"""
+
+
+class _StringColumnWriter:
+    def __init__(self, directory: str, name: str):
+        self.directory = directory
+        self.name = name
+        self.blob = open(os.path.join(directory, f"{name}.bin"), "wb")
+        self.offsets = [0]
+        self.nulls = []
+
+    def append(self, value: Optional[str]) -> None:
+        self.nulls.append(value is None)
+        if value is not None:
+            self.blob.write(value.encode("utf-8"))
+        self.offsets.append(self.blob.tell())
+
+    def close(self) -> None:
+        self.blob.close()
+        np.save(os.path.join(self.directory, f"{self.name}.offsets.npy"), np.asarray(self.offsets, dtype=np.int64))
+        np.save(os.path.join(self.directory, f"{self.name}.nulls.npy"), np.asarray(self.nulls, dtype=bool))
+
+
+class _StringColumn:
+    def __init__(self, directory: str, name: str):
+        path = os.path.join(directory, f"{name}.bin")
+        self.blob = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.empty(0, np.uint8)
+        self.offsets = np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode="r")
+        self.nulls = np.load(os.path.join(directory, f"{name}.nulls.npy"), mmap_mode="r")
+
+    def __getitem__(self, row: int) -> Optional[str]:
+        if self.nulls[row]:
+            return None
+        return bytes(self.blob[self.offsets[row]:self.offsets[row + 1]]).decode("utf-8")
+
+
+def export(conn, directory: str, chunk_size: int = 10_000) -> dict:
+    """
+    Export embeddings and product columns into a new versioned directory and point
+    the `directory` symlink at it.
+
+    The symlink is swapped with an atomic rename once the export is complete, so
+    `directory` always resolves to a whole index. The row count, the catalog version
+    and the rows are all read in one REPEATABLE READ snapshot, so concurrent writes
+    can neither overflow the arrays nor mismatch the version.
+
+    Returns:
+        dict: The manifest.
+    """
+    base = directory.rstrip(os.sep)
+    conn.rollback()
+    with conn.cursor() as cursor:
+        # First statement of the transaction, so every read below sees the same snapshot
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        cursor.execute("SELECT COUNT(*) FROM products p JOIN product_embeddings pe ON p.product_id = pe.product_id")
+        rows = cursor.fetchone()[0]
+        cursor.execute("SELECT version FROM catalog_version")
+        catalog_version = cursor.fetchone()[0]
+
+    version_dir = f"{base}.v{catalog_version}.{time.time_ns()}"
+    os.makedirs(version_dir)
+    try:
+        manifest = _write_export(conn, version_dir, rows, catalog_version, chunk_size)
+    except BaseException:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+    _swap_symlink(base, version_dir)
+    return manifest
+
+
+def _write_export(conn, version_dir: str, rows: int, catalog_version: int, chunk_size: int) -> dict:
+    """Stream the snapshot's rows into the files of `version_dir` and write its manifest."""
+    product_ids = np.empty(rows, dtype=np.int64)
+    numeric = {column: np.full(rows, np.nan) for column in NUMERIC_COLUMNS}
+    vocabularies: Dict[str, Dict[str, int]] = {column: {} for column in CATEGORY_COLUMNS}
+    codes = {column: np.full(rows, -1, dtype=np.int32) for column in CATEGORY_COLUMNS}
+    strings = {column: _StringColumnWriter(version_dir, column) for column in TEXT_COLUMNS}
+    embeddings = None
+    dim = 0
+
+    row_index = 0
+    with conn.cursor(name="mmap_export") as cursor:
+        cursor.itersize = chunk_size
+        cursor.execute(EXPORT_SQL)
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            if row_index + len(chunk) > rows:
+                raise RuntimeError(f"Export streamed more than the {rows} rows counted in its snapshot")
+            vectors = np.asarray([row[8] for row in chunk], dtype=np.float32)
+            if embeddings is None:
+                dim = vectors.shape[1]
+                embeddings = np.memmap(os.path.join(version_dir, "embeddings.f32"), dtype=np.float32,
+                                       mode="w+", shape=(max(rows, 1), dim))
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            embeddings[row_index:row_index + len(chunk)] = vectors / np.where(norms == 0, 1, norms)
+
+            for offset, row in enumerate(chunk):
+                i = row_index + offset
+                product_id, product_name, brand, gender, price, num_images, description, color, _ = row
+                product_ids[i] = product_id
+                numeric["price_inr"][i] = np.nan if price is None else price
+                numeric["num_images"][i] = np.nan if num_images is None else num_images
+                for column, value in (("gender", gender), ("product_brand", brand), ("primary_color", color)):
+                    if value is not None:
+                        codes[column][i] = vocabularies[column].setdefault(value, len(vocabularies[column]))
+                for column, value in (("product_name", product_name), ("product_brand", brand),
+                                      ("gender", gender), ("description", description),
+                                      ("primary_color", color)):
+                    strings[column].append(value)
+            row_index += len(chunk)
+    conn.rollback()
+
+    if embeddings is not None:
+        embeddings.flush()
+        del embeddings
+    for writer in strings.values():
+        writer.close()
+    np.save(os.path.join(version_dir, "product_id.npy"), product_ids[:row_index])
+    for column, values in numeric.items():
+        np.save(os.path.join(version_dir, f"{column}.npy"), values[:row_index])
+    for column, values in codes.items():
+        np.save(os.path.join(version_dir, f"{column}.codes.npy"), values[:row_index])
+
+    manifest = {
+        "rows": row_index,
+        "dim": dim,
+        "catalog_version": catalog_version,
+        "vocabularies": vocabularies,
+    }
+    with open(os.path.join(version_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def _swap_symlink(base: str, target: str) -> None:
+    """
+    Atomically point the `base` symlink at `target`, then remove exports older than
+    the one it replaced (that one may still be opening in another process).
+    """
+    previous = os.path.realpath(base) if os.path.islink(base) else None
+    link_tmp = f"{base}.link.tmp"
+    if os.path.lexists(link_tmp):
+        os.remove(link_tmp)
+    os.symlink(os.path.basename(target), link_tmp)
+    if os.path.isdir(base) and not os.path.islink(base):
+        # Index exported before versioned directories: a one-time, non-atomic switch
+        shutil.rmtree(base)
+    os.replace(link_tmp, base)
+
+    keep = {os.path.realpath(target), previous}
+    for path in glob.glob(f"{glob.escape(base)}.v*"):
+        if os.path.isdir(path) and os.path.realpath(path) not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class MmapVectorIndex:
+    def __init__(self, directory: str):
+        """Open an exported index. Arrays are memory-mapped read-only."""
+        # Resolve the symlink once, so an export swapping it mid-open cannot mix two versions
+        directory = os.path.realpath(directory)
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        self.directory = directory
+        self.rows = manifest["rows"]
+        self.dim = manifest["dim"]
+        self.catalog_version = manifest["catalog_version"]
+        self.vocabularies = manifest["vocabularies"]
+
+        self.embeddings = (
+            np.memmap(os.path.join(directory, "embeddings.f32"), dtype=np.float32, mode="r",
+                      shape=(self.rows, self.dim))
+            if self.rows else np.empty((0, self.dim), dtype=np.float32)
+        )
+        self.product_ids = np.load(os.path.join(directory, "product_id.npy"), mmap_mode="r")
+        self.numeric = {c: np.load(os.path.join(directory, f"{c}.npy"), mmap_mode="r") for c in NUMERIC_COLUMNS}
+        self.codes = {c: np.load(os.path.join(directory, f"{c}.codes.npy"), mmap_mode="r") for c in CATEGORY_COLUMNS}
+        self.strings = {c: _StringColumn(directory, c) for c in TEXT_COLUMNS}
+
+    @classmethod
+    def open(cls, directory: str) -> "MmapVectorIndex":
+        return cls(directory)
+
+    def filter_mask(self, filters: Optional[dict]) -> Optional[np.ndarray]:
+        """
+        Boolean row mask for the filters, or None when nothing is filtered.
+        Mirrors the SQL builder: only truthy filter values apply, and NULLs never match.
+        """
+        if not filters or not any(filters.values()):
+            return None
+        mask = np.ones(self.rows, dtype=bool)
+        price = self.numeric["price_inr"]
+        if filters.get("min_price"):
+            mask &= price >= filters["min_price"]
+        if filters.get("max_price"):
+            mask &= price <= filters["max_price"]
+        for key, column in FILTER_COLUMNS.items():
+            if filters.get(key):
+                code = self.vocabularies[column].get(filters[key])
+                if code is None:
+                    return np.zeros(self.rows, dtype=bool)
+                mask &= self.codes[column] == code
+        return mask
+
+    def search(
+        self,
+        query_embedding,
+        top_k: int,
+        filters: Optional[dict] = None,
+        projection: Optional[SearchProjection] = None
+    ) -> List[SearchResult]:
+        """Exact cosine top-k over the (filtered) rows."""
+        return self.search_many([query_embedding], top_k, filters, projection)[0]
+
+    def search_many(
+        self,
+        query_embeddings,
+        top_k: int,
+        filters: Optional[dict] = None,
+        projection: Optional[SearchProjection] = None
+    ) -> List[List[SearchResult]]:
+        """
+        Exact cosine top-k for several queries with one matrix product. Only the
+        projection's columns are read from the mapped files.
+        """
+        projection = projection or SearchProjection()
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        mask = self.filter_mask(filters)
+        matched = self.rows if mask is None else int(np.count_nonzero(mask))
+        if matched == 0 or top_k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        candidate_rows, scores = self._scores(queries, mask, matched)  # (queries, candidates)
+
+        k = min(top_k, matched)
+        results = []
+        for query_scores in scores:
+            top = np.argpartition(-query_scores, k - 1)[:k]
+            top = top[np.argsort(-query_scores[top], kind="stable")]
+            results.append([
+                self._hydrate(i if candidate_rows is None else candidate_rows[i], float(query_scores[i]), projection)
+                for i in top
+            ])
+        return results
+
+    def _scores(self, queries: np.ndarray, mask: Optional[np.ndarray], matched: int):
+        """
+        Cosine scores of the queries against the rows the mask keeps. Returns
+        (candidate_rows, scores): with candidate_rows None, scores cover every row and
+        masked-out rows score -inf, so a broad filter never copies embeddings out of the map.
+        """
+        if mask is not None and matched <= self.rows * GATHER_MAX_FRACTION:
+            candidate_rows = np.flatnonzero(mask)
+            return candidate_rows, queries @ self.embeddings[candidate_rows].T
+        scores = queries @ self.embeddings.T
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+        return None, scores
+
+    def search_after(
+        self,
+        query_embedding,
+        limit: int,
+        after: Optional[Tuple[float, int]] = None,
+        filters: Optional[dict] = None,
+        projection: Optional[SearchProjection] = None
+    ) -> List[Tuple[SearchResult, float]]:
+        """
+        Keyset page for ProductSearchEngine.search_page: up to `limit` (result, distance)
+        pairs strictly after `after` in (cosine distance, product_id) order.
+        """
+        projection = projection or SearchProjection()
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        query = query / (norm or 1)
+
+        mask = self.filter_mask(filters)
+        matched = self.rows if mask is None else int(np.count_nonzero(mask))
+        if matched == 0:
+            return []
+        rows, scores = self._scores(query[None, :], mask, matched)
+        distances = 1.0 - scores[0].astype(np.float64)
+        ids = np.asarray(self.product_ids if rows is None else self.product_ids[rows])
+        # Masked-out rows score -inf, i.e. distance +inf; the cursor then trims what earlier pages returned
+        keep = np.isfinite(distances)
+        if after is not None:
+            keep &= (distances > after[0]) | ((distances == after[0]) & (ids > after[1]))
+        selected = np.flatnonzero(keep)
+        rows = selected if rows is None else rows[selected]
+        distances, ids = distances[selected], ids[selected]
+
+        if limit <= 0 or len(rows) == 0:
+            return []
+        if len(rows) > limit:
+            # Keep everything tied with the limit-th distance so the id tiebreak stays exact
+            cutoff = np.partition(distances, limit - 1)[limit - 1]
+            near = np.flatnonzero(distances <= cutoff)
+        else:
+            near = np.arange(len(rows))
+        order = near[np.lexsort((ids[near], distances[near]))][:limit]
+        return [(self._hydrate(rows[i], float(1.0 - distances[i]), projection), float(distances[i])) for i in order]
+
+    def _hydrate(self, row: int, score: float, projection: SearchProjection) -> SearchResult:
+        values = {}
+        for name in projection.fields:
+            if name == "product_id":
+                values[name] = int(self.product_ids[row])
+            elif name in self.numeric:
+                value = self.numeric[name][row]
+                values[name] = None if np.isnan(value) else int(value)
+            else:
+                values[name] = self.strings[name][row]
+        if projection.description_chars is not None and values.get("description") is not None:
+            values["description"] = values["description"][:projection.description_chars]
+        return SearchResult(**values, similarity_score=score)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export product embeddings to a memory-mapped index.")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("directory")
+    args = parser.parse_args()
+
+    from utils import db_connection
+    with db_connection() as conn:
+        manifest = export(conn, args.directory)
+    print(f"✅ Exported {manifest['rows']} rows (dim {manifest['dim']}, "
+          f"catalog version {manifest['catalog_version']}) to {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
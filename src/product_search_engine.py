@@ -1,17 +1,169 @@
-from dataclasses import dataclass
-from typing import Optional, Tuple
+import base64
+import binascii
+import bisect
+import copy
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 
-@dataclass
+import numpy as np
+
+EMBEDDING_DIMENSIONS = 384
+
+# Distance expressions over the compact copies used for candidate retrieval. Each one
+# must match an expression index created by ann_index.ensure_quantized_index, otherwise
+# pgvector falls back to a sequential scan.
+QUANTIZED_DISTANCES = {
+    "halfvec": f"pe.embedding::halfvec({EMBEDDING_DIMENSIONS}) <=> %s::halfvec({EMBEDDING_DIMENSIONS})",
+    "binary": f"binary_quantize(pe.embedding)::bit({EMBEDDING_DIMENSIONS}) <~> binary_quantize(%s::vector)",
+}
+
+# Values accepted for Postgres' plan_cache_mode (applies to prepared statements only)
+PLAN_CACHE_MODES = ("auto", "force_generic_plan", "force_custom_plan")
+
+_PLACEHOLDER = re.compile(r"%s")
+_CAST_PLACEHOLDER = re.compile(r"%s(::\w+(?:\(\d+\))?(?:\[\])?)?")
+
+
+def numbered_placeholders(query: str) -> str:
+    """Convert psycopg2-style %s placeholders to Postgres' numbered $1, $2, ..."""
+    counter = iter(range(1, query.count("%s") + 1))
+    return _PLACEHOLDER.sub(lambda _: f"${next(counter)}", query)
+
+
+def _execute_arguments(query: str) -> List[str]:
+    """
+    EXECUTE argument list for a statement prepared from `query`: one %s per placeholder,
+    keeping the placeholder's cast (e.g. %s::vector[]), since EXECUTE only applies
+    assignment casts and psycopg2 sends a list of vectors as text[].
+    """
+    return [f"%s{cast or ''}" for cast in _CAST_PLACEHOLDER.findall(query)]
+
+# Product columns a search can return, in SearchResult (and SELECT) order
+RESULT_FIELDS = (
+    "product_id", "product_name", "product_brand", "gender", "price_inr",
+    "num_images", "description", "primary_color",
+)
+
+@dataclass(slots=True)
 class SearchResult:
+    """One search hit. Fields left out of the search's projection stay None."""
     product_id: int
-    product_name: str
-    product_brand: Optional[str]
-    gender: Optional[str]
-    price_inr: Optional[float]
-    num_images: Optional[int]
-    description: Optional[str]
-    primary_color: Optional[str]
-    similarity_score: float
+    product_name: Optional[str] = None
+    product_brand: Optional[str] = None
+    gender: Optional[str] = None
+    price_inr: Optional[float] = None
+    num_images: Optional[int] = None
+    description: Optional[str] = None
+    primary_color: Optional[str] = None
+    similarity_score: float = 0.0
+
+@dataclass(frozen=True)
+class SearchProjection:
+    """Which product columns a search selects and hydrates; product_id and the score are always returned."""
+    fields: Tuple[str, ...] = RESULT_FIELDS
+    description_chars: Optional[int] = None  # truncate descriptions server-side with left()
+
+    @classmethod
+    def of(cls, fields: Optional[Sequence[str]] = None, description_chars: Optional[int] = None) -> "SearchProjection":
+        if fields is None:
+            fields = RESULT_FIELDS
+        unknown = set(fields) - set(RESULT_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown result fields: {sorted(unknown)} (expected any of {list(RESULT_FIELDS)})")
+        if description_chars is not None and description_chars < 0:
+            raise ValueError(f"description_chars must be >= 0, got {description_chars}")
+        return cls(
+            fields=tuple(name for name in RESULT_FIELDS if name == "product_id" or name in fields),
+            description_chars=description_chars
+        )
+
+    def select_list(self, alias: str = "p") -> str:
+        """Columns read from the products table, with the description truncated when configured."""
+        columns = []
+        for name in self.fields:
+            if name == "description" and self.description_chars is not None:
+                columns.append(f"left({alias}.description, {int(self.description_chars)}) AS description")
+            else:
+                columns.append(f"{alias}.{name}")
+        return ", ".join(columns)
+
+    def column_list(self, alias: str = "") -> str:
+        """The projected column names, as re-selected from a subquery or CTE."""
+        prefix = f"{alias}." if alias else ""
+        return ", ".join(prefix + name for name in self.fields)
+
+    def to_result(self, row) -> SearchResult:
+        """Build a SearchResult from (projected columns..., similarity)."""
+        if self.fields == RESULT_FIELDS:
+            return SearchResult(*row)
+        return SearchResult(**dict(zip(self.fields, row)), similarity_score=row[len(self.fields)])
+
+# Facet name -> products column; the names match the SearchFilters fields
+FACET_COLUMNS = {"brand": "product_brand", "color": "primary_color", "gender": "gender"}
+
+# Upper bounds (INR, exclusive) of the price facet buckets; the last bucket is open-ended
+DEFAULT_PRICE_BUCKETS = (500, 1000, 2000, 5000)
+
+@dataclass
+class SearchFacets:
+    """Value counts over the candidate set of a search (the nearest `candidates` matching products)."""
+    candidates: int = 0
+    brand: Dict[str, int] = field(default_factory=dict)
+    color: Dict[str, int] = field(default_factory=dict)
+    gender: Dict[str, int] = field(default_factory=dict)
+    price: List[Tuple[Optional[int], Optional[int], int]] = field(default_factory=list)  # (min, max exclusive, count)
+
+    @classmethod
+    def from_counts(cls, payload: Optional[dict], price_buckets: Sequence[int]) -> "SearchFacets":
+        """Build from the facet JSON of the faceted query: {"candidates": n, "counts": [[facet, value, n], ...]}."""
+        facets = cls(candidates=payload["candidates"] if payload else 0)
+        price_counts = {}
+        for facet, value, count in (payload or {}).get("counts", []):
+            if facet == "price":
+                price_counts[int(value)] = count
+            else:
+                getattr(facets, facet)[value] = count
+        for name in FACET_COLUMNS:
+            counts = getattr(facets, name)
+            setattr(facets, name, dict(sorted(counts.items(), key=lambda item: (-item[1], item[0]))))
+        facets.price = _price_ranges(price_counts, price_buckets)
+        return facets
+
+    @classmethod
+    def from_results(cls, results: List["SearchResult"], price_buckets: Sequence[int]) -> "SearchFacets":
+        """Same counts computed in Python, for searches answered without SQL (vector_index)."""
+        counts = []
+        for facet, column in FACET_COLUMNS.items():
+            values = [getattr(r, column) for r in results if getattr(r, column) is not None]
+            counts += [[facet, value, values.count(value)] for value in dict.fromkeys(values)]
+        prices = [bisect.bisect_right(price_buckets, r.price_inr) for r in results if r.price_inr is not None]
+        counts += [["price", str(bucket), prices.count(bucket)] for bucket in dict.fromkeys(prices)]
+        return cls.from_counts({"candidates": len(results), "counts": counts}, price_buckets)
+
+
+def _price_ranges(bucket_counts: Dict[int, int], price_buckets: Sequence[int]) -> list:
+    """width_bucket() indexes -> (min, max exclusive, count), in price order, empty buckets included."""
+    bounds = [None, *price_buckets, None]
+    return [(bounds[i], bounds[i + 1], bucket_counts.get(i, 0)) for i in range(len(price_buckets) + 1)]
+
+@dataclass
+class FacetedSearch:
+    results: List[SearchResult]
+    facets: SearchFacets
+
+@dataclass
+class SearchPage:
+    """One page of a paginated search; pass `cursor` back to search_page() for the next one."""
+    results: List[SearchResult]
+    cursor: Optional[str]  # None once the results are exhausted
 
 @dataclass
 class SearchFilters:
@@ -20,15 +172,278 @@ class SearchFilters:
     gender: Optional[str] = None
     brand: Optional[str] = None
     color: Optional[str] = None
+
+@dataclass
+class FilterStatistics:
+    """Cached per-column statistics over embedded products, used to estimate filter selectivity."""
+    total_rows: int
+    gender_counts: Dict[str, int] = field(default_factory=dict)
+    brand_counts: Dict[str, int] = field(default_factory=dict)
+    color_counts: Dict[str, int] = field(default_factory=dict)
+    price_quantiles: list = field(default_factory=list)
+    loaded_at: float = 0.0
+
+    def estimate_selectivity(self, filters: Optional[dict]) -> float:
+        """
+        Estimate the fraction of rows matching the filters, assuming the columns are independent.
+        Mirrors the truthiness checks in ProductSearchEngine._build_filter_clause.
+        """
+        if not filters or not self.total_rows:
+            return 1.0
+
+        selectivity = 1.0
+        for key, counts in (
+            ('gender', self.gender_counts),
+            ('brand', self.brand_counts),
+            ('color', self.color_counts),
+        ):
+            if filters.get(key):
+                selectivity *= counts.get(filters[key], 0) / self.total_rows
+
+        min_price, max_price = filters.get('min_price'), filters.get('max_price')
+        if (min_price or max_price) and self.price_quantiles:
+            low = bisect.bisect_left(self.price_quantiles, min_price) if min_price else 0
+            high = bisect.bisect_right(self.price_quantiles, max_price) if max_price else len(self.price_quantiles)
+            selectivity *= max(0, high - low) / len(self.price_quantiles)
+
+        return selectivity
+
+@dataclass
+class SearchPlan:
+    """Describes how a search was (or would be) executed."""
+    strategy: str  # "unfiltered", "inline_filters", "exact", "ann_overfetch", "result_cache", "vector_index"
+                   # "quantized_rerank", "hybrid_rrf", "keyset_page" or "faceted"
+    estimated_selectivity: float = 1.0
+    estimated_rows: Optional[int] = None
+    overfetch_factor: Optional[int] = None
+    attempts: int = 1
+    reason: str = ""
+
+@dataclass
+class SearchStats:
+    """Per-call instrumentation, recorded only when the engine has a metrics collector."""
+    top_k: int
+    filters: str  # active filter names joined with "+", or "none"
+    queries: int = 1
+    stages: Dict[str, float] = field(default_factory=dict)  # seconds: encode, build, execute, hydrate
+    total_seconds: float = 0.0
+    rows: int = 0
+    strategy: Optional[str] = None
+    embedding_cache_hits: int = 0
+    result_cache_hits: int = 0
+    prepare_hits: int = 0  # queries executed from an already prepared statement
+    prepares: int = 0  # statements prepared during the call
+    error: Optional[str] = None
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @staticmethod
+    def filter_label(filters: Optional[dict]) -> str:
+        active = sorted(name for name, value in (filters or {}).items() if value)
+        return "+".join(active) or "none"
     
 class ProductSearchEngine:
-    def __init__(self, db_connection, embedding_model):
+    def __init__(
+        self,
+        db_connection,
+        embedding_model,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        adaptive_filtering: bool = False,
+        exact_scan_max_rows: int = 5000,
+        max_overfetch_candidates: int = 1000,
+        stats_ttl_seconds: float = 300.0,
+        embedding_cache=None,
+        result_cache=None,
+        vector_index=None,
+        quantization: Optional[str] = None,
+        rerank_factor: int = 4,
+        hybrid: bool = False,
+        lexical_candidates: int = 50,
+        vector_candidates: Optional[int] = None,
+        rrf_k: int = 60,
+        metrics=None,
+        slow_query_log=None,
+        fields: Optional[Sequence[str]] = None,
+        description_chars: Optional[int] = None,
+        max_query_handles: int = 1024,
+        price_buckets: Sequence[int] = DEFAULT_PRICE_BUCKETS,
+        prepare_statements: bool = False,
+        plan_cache_mode: Optional[str] = None,
+        max_prepared_connections: int = 256
+    ):
+        """
+        Args:
+            db_connection: psycopg2 connection with pgvector registered.
+            embedding_model: Any object exposing `.encode(list_of_texts)`.
+            ef_search (Optional[int]): hnsw.ef_search applied to every query (higher = better recall, slower).
+            probes (Optional[int]): ivfflat.probes applied to every query (higher = better recall, slower).
+            adaptive_filtering (bool): Plan filtered searches from cached column statistics
+                instead of always adding the filters to the ANN query's WHERE clause. Without it,
+                a filtered search() whose ANN scan returns fewer than top_k rows is re-run exactly.
+            exact_scan_max_rows (int): Filtered searches estimated to match at most this many
+                rows run as an exact scan over the filtered subset.
+            max_overfetch_candidates (int): Upper bound on ANN candidates fetched before filtering;
+                beyond it the planner falls back to an exact scan. pgvector caps hnsw.ef_search at 1000.
+            stats_ttl_seconds (float): How long cached filter statistics are reused before reloading.
+            embedding_cache: Optional query embedding cache (see query_cache.EmbeddingCache),
+                shareable between engines, the CLI and the Streamlit app.
+            result_cache: Optional search result cache (see query_cache.SearchResultCache), keyed on
+                (normalized query, filters, top_k) and invalidated when the catalog version changes.
+            vector_index: Optional in-process index (see mmap_index.MmapVectorIndex) answering searches
+                without a database round trip; db_connection may then be None.
+            quantization (Optional[str]): "halfvec" or "binary" to retrieve candidates from the compact
+                index (see QUANTIZED_DISTANCES) and rescore them against the full-precision vectors.
+            rerank_factor (int): Candidates fetched per requested result in quantized mode.
+            hybrid (bool): Fuse full-text (products.search_tsv) and vector candidates with
+                reciprocal rank fusion instead of ranking by cosine similarity alone.
+            lexical_candidates (int): Full-text candidates per hybrid query.
+            vector_candidates (Optional[int]): Vector candidates per hybrid query (default: 2 * top_k).
+            rrf_k (int): Reciprocal rank fusion constant; each list contributes 1 / (rrf_k + rank).
+            metrics: Optional collector (see search_metrics.SearchMetrics). When set, every search()
+                and search_many() call records a SearchStats (stage timings, rows, filters, cache hits),
+                passes it to metrics.record() and keeps it in last_stats.
+            slow_query_log: Optional slow-query log (see slow_query_log.SlowQueryLog) that is shown
+                every executed query with its duration and logs/EXPLAINs the ones over its threshold.
+            fields (Optional[Sequence[str]]): Default result projection (see RESULT_FIELDS); columns
+                left out are neither selected nor sent over the wire. search() can override it per call.
+            description_chars (Optional[int]): Truncate descriptions to this many characters in SQL;
+                fetch_descriptions() loads the full text for the results that need it.
+            max_query_handles (int): Query vectors kept for resuming paginated searches; a cursor
+                whose vector was evicted re-encodes its query (through embedding_cache, if set).
+            price_buckets (Sequence[int]): Ascending price bounds of the price facet (see search_with_facets).
+            prepare_statements (bool): PREPARE each query shape (one per strategy and filter combination)
+                once per connection and EXECUTE it afterwards, so Postgres skips parsing and, with
+                generic plans, planning. Not compatible with transaction-pooling proxies (PgBouncer).
+            plan_cache_mode (Optional[str]): plan_cache_mode set for each search transaction
+                (see PLAN_CACHE_MODES); "force_generic_plan" plans a shape once, "force_custom_plan"
+                re-plans with the actual filter values.
+            max_prepared_connections (int): Connections whose prepared statements are tracked; the
+                least recently used are forgotten and re-read from pg_prepared_statements if reused.
+        """
+        if plan_cache_mode is not None and plan_cache_mode not in PLAN_CACHE_MODES:
+            raise ValueError(f"Unknown plan_cache_mode: {plan_cache_mode!r} (expected one of {list(PLAN_CACHE_MODES)})")
+        if quantization is not None and quantization not in QUANTIZED_DISTANCES:
+            raise ValueError(f"Unknown quantization: {quantization!r} (expected one of {sorted(QUANTIZED_DISTANCES)})")
         self.db = db_connection
         self.model = embedding_model
+        self.ef_search = ef_search
+        self.probes = probes
+        self.adaptive_filtering = adaptive_filtering
+        self.exact_scan_max_rows = exact_scan_max_rows
+        self.max_overfetch_candidates = max_overfetch_candidates
+        self.stats_ttl_seconds = stats_ttl_seconds
+        self.embedding_cache = embedding_cache
+        self.result_cache = result_cache
+        self.vector_index = vector_index
+        self.quantization = quantization
+        self.rerank_factor = rerank_factor
+        self.hybrid = hybrid
+        self.lexical_candidates = lexical_candidates
+        self.vector_candidates = vector_candidates
+        self.rrf_k = rrf_k
+        self.metrics = metrics
+        self.slow_query_log = slow_query_log
+        self.projection = SearchProjection.of(fields, description_chars)
+        self._projection = self.projection  # projection of the call in progress
+        # Mutable state shared with copies made by using()
+        self._shared = {
+            "filter_stats": None,
+            "query_vectors": OrderedDict(),
+            "prepared": OrderedDict(),  # (id(conn), backend pid) -> names of statements prepared on it
+            "prepare_counts": {"hits": 0, "prepares": 0},
+            "ef_search_raised": set(),  # id() of connections whose transaction may carry a raised ef_search
+            "lock": threading.Lock(),  # guards the LRUs and counters above across threads (Streamlit sessions)
+        }
+        self.max_query_handles = max_query_handles
+        self.price_buckets = tuple(price_buckets)
+        self.prepare_statements = prepare_statements
+        self.plan_cache_mode = plan_cache_mode
+        self.max_prepared_connections = max_prepared_connections
+        self.last_plan: Optional[SearchPlan] = None
+        self.last_stats: Optional[SearchStats] = None
+        self._stats: Optional[SearchStats] = None  # stats of the call in progress
+
+    @property
+    def _filter_stats(self) -> Optional[FilterStatistics]:
+        return self._shared["filter_stats"]
+
+    @_filter_stats.setter
+    def _filter_stats(self, stats: Optional[FilterStatistics]) -> None:
+        self._shared["filter_stats"] = stats
+
+    def using(self, db_connection) -> "ProductSearchEngine":
+        """
+        Return a copy of this engine bound to another connection, e.g. one borrowed from
+        utils.db_connection() for a single request. The copy shares the model, caches and
+        filter statistics with this engine.
+        """
+        engine = copy.copy(self)
+        engine.db = db_connection
+        engine.last_plan = None
+        engine.last_stats = None
+        engine._stats = None
+        engine._projection = engine.projection
+        return engine
+
+    @contextmanager
+    def _instrument(self, top_k: int, filters: Optional[SearchFilters], queries: int = 1):
+        """Collect a SearchStats for the enclosed call; yields None when metrics are disabled."""
+        if self.metrics is None:
+            yield None
+            return
+        stats = SearchStats(top_k=top_k, filters=SearchStats.filter_label(filters.__dict__ if filters else None),
+                            queries=queries)
+        self._stats = stats
+        embedding_hits = self.embedding_cache.hits if self.embedding_cache is not None else 0
+        started = time.perf_counter()
+        try:
+            yield stats
+        except Exception as e:
+            stats.error = type(e).__name__
+            raise
+        finally:
+            self._stats = None
+            stats.total_seconds = time.perf_counter() - started
+            # Whatever is not encode/execute/hydrate: cache lookups, planning and query building
+            stats.add("build", max(0.0, stats.total_seconds - sum(stats.stages.values())))
+            stats.strategy = self.last_plan.strategy if self.last_plan else None
+            if self.embedding_cache is not None:
+                stats.embedding_cache_hits = self.embedding_cache.hits - embedding_hits
+            self.last_stats = stats
+            self.metrics.record(stats)
+
+    @contextmanager
+    def _project(self, fields: Optional[Sequence[str]], description_chars: Optional[int]):
+        """Use a per-call projection for the enclosed call, if the caller asked for one."""
+        if fields is None and description_chars is None:
+            yield self._projection
+            return
+        previous = self._projection
+        self._projection = SearchProjection.of(
+            fields if fields is not None else self.projection.fields,
+            description_chars if description_chars is not None else self.projection.description_chars
+        )
+        try:
+            yield self._projection
+        finally:
+            self._projection = previous
+
+    def _record_stage(self, stage: str, started: float) -> None:
+        if self._stats is not None:
+            self._stats.add(stage, time.perf_counter() - started)
 
     from typing import Optional, List
 
-    def search(self, query: str, top_k: int = 5, filters: Optional[SearchFilters] = None) -> List[SearchResult]:
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[SearchFilters] = None,
+        fields: Optional[Sequence[str]] = None,
+        description_chars: Optional[int] = None
+    ) -> List[SearchResult]:
         """
         Orchestrate the product search process:
         1. Convert the natural language query into an embedding vector.
@@ -41,18 +456,65 @@ class ProductSearchEngine:
             query (str): The natural language search query.
             top_k (int): Number of top results to return.
             filters (Optional[SearchFilters]): Optional structured filters.
+            fields (Optional[Sequence[str]]): Result fields to select, e.g. ("product_name", "price_inr");
+                defaults to the engine's projection. product_id and the score are always included.
+            description_chars (Optional[int]): Truncate descriptions to this many characters in SQL.
 
         Returns:
             List[SearchResult]: Ranked list of search results with similarity scores.
         """
-        # Step 1: Convert query to embedding
-        query_embedding = self.model.encode([query])[0]
+        with self._instrument(top_k, filters) as stats, self._project(fields, description_chars) as projection:
+            # Full result lists are reused while the catalog version is unchanged
+            catalog_version = None
+            if self.result_cache is not None:
+                catalog_version = self.result_cache.current_version(self._read_catalog_version)
+                cached = self.result_cache.get(query, filters, top_k, catalog_version, projection)
+                if cached is not None:
+                    self.last_plan = SearchPlan(strategy="result_cache", reason=f"catalog version {catalog_version}")
+                    if stats is not None:
+                        stats.result_cache_hits, stats.rows = 1, len(cached)
+                    return cached
+
+            # Step 1: Convert query to embedding (served from the cache when possible)
+            started = time.perf_counter()
+            query_embedding = self._encode_query(query)
+            self._record_stage("encode", started)
+
+            # Steps 2-5: Build, execute and fetch the similarity query
+            filters_dict = filters.__dict__ if filters else None
+            if self.hybrid and self.vector_index is None:
+                results = self._hybrid_search(query, query_embedding, top_k, filters_dict)
+            else:
+                results = self._search_embedding(query_embedding, top_k, filters_dict)
+
+            if self.result_cache is not None:
+                self.result_cache.put(query, filters, top_k, catalog_version, results, projection)
+            if stats is not None:
+                stats.rows = len(results)
+            return results
+
+    def _search_embedding(self, query_embedding, top_k: int, filters_dict: Optional[dict]) -> List[SearchResult]:
+        """Run the similarity search for an already-encoded query."""
+        if self.vector_index is not None:
+            self.last_plan = SearchPlan(strategy="vector_index")
+            started = time.perf_counter()
+            results = self.vector_index.search(query_embedding, top_k, filters_dict, projection=self._projection)
+            self._record_stage("execute", started)
+            return results
+
+        # Filtered searches go through the planner (exact scan vs ANN over-fetch) when enabled
+        if self.adaptive_filtering and self._has_active_filters(filters_dict):
+            return self._planned_search(query_embedding, top_k, filters_dict)
+        if self.quantization is not None:
+            return self._quantized_search(query_embedding, top_k, filters_dict)
+        self.last_plan = SearchPlan(
+            strategy="inline_filters" if self._has_active_filters(filters_dict) else "unfiltered"
+        )
 
         # Step 2: Build base SQL query joining products and embeddings
         base_query = self._build_similarity_query(top_k)
 
         # Step 3: Build full query with filters and prepare parameters
-        filters_dict = filters.__dict__ if filters else None
         full_query, params = self._build_query_with_filters_and_params(
             base_query=base_query,
             query_embedding=query_embedding,
@@ -65,13 +527,587 @@ class ProductSearchEngine:
 
         # Step 5: Fetch and return results
         results = self._fetch_results(cursor)
+        if len(results) < top_k and self._has_active_filters(filters_dict):
+            # An HNSW scan stops after ef_search candidates, most of which the filters may
+            # reject; re-run as an exact scan so a filtered search is never silently underfilled
+            self.last_plan = SearchPlan(
+                strategy="exact", attempts=2, reason=f"inline ANN scan returned {len(results)} of {top_k} rows"
+            )
+            query, params = self._build_exact_query(query_embedding, top_k, filters_dict)
+            results = self._fetch_results(self._execute_query(query, params))
         return results
 
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        filters: Optional[SearchFilters] = None,
+        fields: Optional[Sequence[str]] = None,
+        description_chars: Optional[int] = None
+    ) -> List[List[SearchResult]]:
+        """
+        Search several queries at once: one batched encode and one SQL round trip.
+
+        The query vectors are sent as a single vector[] parameter, unnested WITH ORDINALITY
+        and each one is resolved by a LATERAL subquery built exactly like its search()
+        counterpart, so results match per-query search() output.
+
+        Args:
+            queries (List[str]): Natural language search queries.
+            top_k (int): Number of top results per query.
+            filters (Optional[SearchFilters]): Structured filters applied to every query.
+            fields (Optional[Sequence[str]]): Result projection, as in search().
+            description_chars (Optional[int]): Description truncation, as in search().
+
+        Returns:
+            List[List[SearchResult]]: One ranked result list per query, in input order.
+        """
+        with self._instrument(top_k, filters, queries=len(queries)) as stats, \
+                self._project(fields, description_chars) as projection:
+            results: List[Optional[List[SearchResult]]] = [None] * len(queries)
+
+            catalog_version = None
+            if self.result_cache is not None:
+                catalog_version = self.result_cache.current_version(self._read_catalog_version)
+                for i, query in enumerate(queries):
+                    results[i] = self.result_cache.get(query, filters, top_k, catalog_version, projection)
+
+            pending = [i for i, cached in enumerate(results) if cached is None]
+            if stats is not None:
+                stats.result_cache_hits = len(queries) - len(pending)
+            if pending:
+                started = time.perf_counter()
+                embeddings = self._encode_queries([queries[i] for i in pending])
+                self._record_stage("encode", started)
+                filters_dict = filters.__dict__ if filters else None
+                if self.hybrid and self.vector_index is None:
+                    # Hybrid queries need the query text as well; each runs as its own fused query
+                    batch_results = [
+                        self._hybrid_search(queries[i], embedding, top_k, filters_dict)
+                        for i, embedding in zip(pending, embeddings)
+                    ]
+                else:
+                    batch_results = self._search_embeddings(embeddings, top_k, filters_dict)
+                for i, query_results in zip(pending, batch_results):
+                    results[i] = query_results
+                    if self.result_cache is not None:
+                        self.result_cache.put(queries[i], filters, top_k, catalog_version, query_results, projection)
+            if stats is not None:
+                stats.rows = sum(len(query_results) for query_results in results)
+            return results
+
+    def search_with_facets(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[SearchFilters] = None,
+        facet_candidates: int = 200,
+        fields: Optional[Sequence[str]] = None,
+        description_chars: Optional[int] = None
+    ) -> FacetedSearch:
+        """
+        Ranked results plus facet counts (brand, color, gender, price buckets) over the
+        facet_candidates nearest products matching the filters, in one SQL round trip:
+        the candidates are materialized once, the top_k rows are read from them and the
+        facet counts ride along as JSON on the first row.
+
+        Like search(), answers are kept in the result cache (under the same catalog
+        version) and a filtered candidate scan that comes back short falls back to an
+        exact scan of the matching rows. The candidates come from the inline-filter query;
+        quantization and hybrid mode do not apply. Use facet_vocabularies() for the
+        catalog-wide values (e.g. to populate filter widgets before any search).
+
+        Args:
+            query (str): The natural language search query.
+            top_k (int): Number of results to return.
+            filters (Optional[SearchFilters]): Structured filters, applied to the candidates.
+            facet_candidates (int): Size of the candidate set the facets are counted over.
+            fields (Optional[Sequence[str]]): Result projection, as in search().
+            description_chars (Optional[int]): Description truncation, as in search().
+
+        Returns:
+            FacetedSearch: The results and their SearchFacets.
+        """
+        candidates = max(top_k, facet_candidates)
+        with self._instrument(top_k, filters) as stats, self._project(fields, description_chars) as projection:
+            catalog_version = None
+            if self.result_cache is not None:
+                catalog_version = self.result_cache.current_version(self._read_catalog_version)
+                cached = self.result_cache.get_faceted(query, filters, top_k, candidates, catalog_version, projection)
+                if cached is not None:
+                    self.last_plan = SearchPlan(strategy="result_cache", reason=f"catalog version {catalog_version}")
+                    if stats is not None:
+                        stats.result_cache_hits, stats.rows = 1, len(cached[0])
+                    return FacetedSearch(results=cached[0], facets=cached[1])
+
+            started = time.perf_counter()
+            query_embedding = self._encode_query(query)
+            self._record_stage("encode", started)
+
+            filters_dict = filters.__dict__ if filters else None
+            self.last_plan = SearchPlan(strategy="faceted", reason=f"facets over {candidates} candidates")
+            if self.vector_index is not None:
+                # Hydrate the facet columns too, count in Python, then drop them from the results
+                facet_projection = SearchProjection.of(
+                    projection.fields + tuple(FACET_COLUMNS.values()) + ("price_inr",), projection.description_chars
+                )
+                started = time.perf_counter()
+                candidate_results = self.vector_index.search(
+                    query_embedding, candidates, filters_dict, projection=facet_projection
+                )
+                self._record_stage("execute", started)
+                results = [
+                    SearchResult(
+                        similarity_score=result.similarity_score,
+                        **{name: getattr(result, name) for name in projection.fields}
+                    )
+                    for result in candidate_results[:top_k]
+                ]
+                facets = SearchFacets.from_results(candidate_results, self.price_buckets)
+            else:
+                rows = self._fetch_faceted(query_embedding, top_k, candidates, filters_dict)
+                if filters_dict and self._facet_candidate_count(rows) < candidates:
+                    # The filtered index scan stops at ef_search candidates; a short
+                    # candidate set may just mean the matches were beyond it
+                    rows = self._fetch_faceted(query_embedding, top_k, candidates, filters_dict, exact=True)
+                    self.last_plan = SearchPlan(
+                        strategy="faceted", attempts=2,
+                        reason=f"facets over {candidates} candidates (exact scan after a short index scan)"
+                    )
+                started = time.perf_counter()
+                results = [projection.to_result(row[:-1]) for row in rows]
+                facets = SearchFacets.from_counts(rows[0][-1] if rows else None, self.price_buckets)
+                self._record_stage("hydrate", started)
+
+            if self.result_cache is not None:
+                self.result_cache.put_faceted(
+                    query, filters, top_k, candidates, catalog_version, results, facets, projection
+                )
+            if stats is not None:
+                stats.rows = len(results)
+            return FacetedSearch(results=results, facets=facets)
+
+    @staticmethod
+    def _facet_candidate_count(rows) -> int:
+        """Size of the candidate set a faceted query counted over (0 when nothing matched)."""
+        return rows[0][-1]["candidates"] if rows and rows[0][-1] else 0
+
+    def _fetch_faceted(self, query_embedding, top_k: int, candidates: int, filters_dict, exact: bool = False):
+        sql, params = self._build_faceted_query(query_embedding, top_k, candidates, filters_dict, exact=exact)
+        cursor = self._execute_query(sql, params, min_ef_search=None if exact else candidates)
+        return cursor.fetchall()
+
+    def _build_faceted_query(
+        self,
+        query_embedding,
+        top_k: int,
+        candidates: int,
+        filters: Optional[dict],
+        exact: bool = False
+    ) -> Tuple[str, List]:
+        """
+        One statement for results and facets. The facet JSON is an uncorrelated
+        subquery, evaluated once and only returned on the first row. With exact=True
+        the matching rows are fenced off (OFFSET 0) before ordering, so the candidates
+        come from an exact scan rather than the HNSW index.
+        """
+        where_sql, filter_params = self._build_filter_clause(filters)
+        projection = self._projection
+        facet_columns = [c for c in (*FACET_COLUMNS.values(), "price_inr") if c not in projection.fields]
+        extra_columns = "".join(f", p.{column}" for column in facet_columns)
+        value_counts = " UNION ALL ".join(
+            f"SELECT '{facet}' AS facet, {column} AS value, COUNT(*) AS n "
+            f"FROM candidates WHERE {column} IS NOT NULL GROUP BY {column}"
+            for facet, column in FACET_COLUMNS.items()
+        )
+        matching = f"""
+                SELECT {projection.select_list("p")}{extra_columns},
+                    pe.embedding <=> %s AS distance
+                FROM products p
+                JOIN product_embeddings pe ON p.product_id = pe.product_id
+                {where_sql}"""
+        if exact:
+            candidates_sql = f"SELECT * FROM ({matching}\n                OFFSET 0) matching ORDER BY distance LIMIT %s"
+            candidate_params = [query_embedding] + filter_params + [candidates]
+        else:
+            candidates_sql = f"{matching}\n                ORDER BY pe.embedding <=> %s LIMIT %s"
+            candidate_params = [query_embedding] + filter_params + [query_embedding, candidates]
+        query = f"""
+            WITH candidates AS MATERIALIZED (
+                {candidates_sql}
+            ),
+            facet_counts AS (
+                {value_counts}
+                UNION ALL
+                SELECT 'price', width_bucket(price_inr::float8, %s::float8[])::text, COUNT(*)
+                FROM candidates WHERE price_inr IS NOT NULL GROUP BY 2
+            )
+            SELECT {projection.column_list()}, 1 - distance AS similarity,
+                CASE WHEN row_number() OVER (ORDER BY distance, product_id) = 1 THEN (
+                    SELECT json_build_object(
+                        'candidates', (SELECT COUNT(*) FROM candidates),
+                        'counts', COALESCE(json_agg(json_build_array(facet, value, n)), '[]'::json)
+                    )
+                    FROM facet_counts
+                ) END AS facets
+            FROM candidates
+            ORDER BY distance, product_id
+            LIMIT %s
+        """
+        params = candidate_params + [list(self.price_buckets), top_k]
+        return query, params
+
+    def facet_vocabularies(self) -> Dict[str, object]:
+        """
+        Catalog-wide facet values, most common first, plus the price range - for filter
+        widgets before (or without) a search. Served from the cached filter statistics,
+        so loading them once at startup also warms the adaptive-filtering planner.
+        """
+        stats = self.get_filter_statistics()
+
+        def by_count(counts: Dict[str, int]) -> List[str]:
+            return [value for value, _ in sorted(counts.items(), key=lambda item: (-item[1], item[0]))]
+
+        return {
+            "brand": by_count(stats.brand_counts),
+            "color": by_count(stats.color_counts),
+            "gender": by_count(stats.gender_counts),
+            "price_range": (stats.price_quantiles[0], stats.price_quantiles[-1]) if stats.price_quantiles else None,
+        }
+
+    def search_page(
+        self,
+        query: Optional[str] = None,
+        page_size: int = 10,
+        filters: Optional[SearchFilters] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+        description_chars: Optional[int] = None
+    ) -> SearchPage:
+        """
+        Keyset-paginated search. The first call takes the query (and filters); later
+        calls take only the cursor returned with the previous page, which carries the
+        filters, a handle to the query vector and the last (distance, product_id) seen.
+
+        Each page asks for rows strictly after that pair in (distance, product_id) order,
+        so earlier pages are never fetched, hydrated or sent again and the query is not
+        re-encoded. The ANN index still walks past the earlier rows: hnsw.ef_search is
+        raised to cover them, up to its 1000 limit. An index scan that comes back short
+        (filters rejecting its candidates, or a page past that limit) is re-run as an
+        exact scan, so the cursor is only None once an exact scan ran out of rows.
+        Pages ignore adaptive_filtering/quantization and are not supported in hybrid mode.
+
+        Args:
+            query (Optional[str]): The search query; required without a cursor.
+            page_size (int): Results per page.
+            filters (Optional[SearchFilters]): Structured filters (first page only).
+            cursor (Optional[str]): Opaque cursor from the previous SearchPage.
+            fields (Optional[Sequence[str]]): Result projection, as in search().
+            description_chars (Optional[int]): Description truncation, as in search().
+
+        Returns:
+            SearchPage: The results and the cursor for the next page (None when exhausted).
+        """
+        if self.hybrid:
+            raise ValueError("search_page does not support hybrid (rank fusion) search")
+        if cursor is not None:
+            state = self._decode_cursor(cursor)
+            query, filters = state["q"], SearchFilters(**state["f"])
+            after, position = (state["d"], state["id"]), state["n"]
+        elif query is None:
+            raise ValueError("search_page needs a query or a cursor")
+        else:
+            state, after, position = None, None, 0
+
+        with self._instrument(page_size, filters) as stats, self._project(fields, description_chars):
+            started = time.perf_counter()
+            handle, query_embedding = self._query_vector(query, state["h"] if state else None)
+            self._record_stage("encode", started)
+
+            filters_dict = filters.__dict__ if filters else None
+            self.last_plan = SearchPlan(strategy="keyset_page", reason=f"rows after {position}")
+            if self.vector_index is not None:
+                started = time.perf_counter()
+                rows = self.vector_index.search_after(
+                    query_embedding, page_size + 1, after, filters_dict, projection=self._projection
+                )
+                self._record_stage("execute", started)
+            else:
+                sql, params = self._build_keyset_query(query_embedding, page_size + 1, after, filters_dict)
+                cursor_rows = self._execute_query(sql, params, min_ef_search=position + page_size + 1)
+                started = time.perf_counter()
+                to_result = self._projection.to_result
+                rows = [(to_result(row[:-1]), row[-1]) for row in cursor_rows.fetchall()]
+                self._record_stage("hydrate", started)
+                if len(rows) <= page_size:
+                    # A short index scan does not mean the matches ran out; only an exact scan can tell
+                    self.last_plan.attempts += 1
+                    self.last_plan.reason += f", exact scan after the index returned {len(rows)} rows"
+                    sql, params = self._build_keyset_query(
+                        query_embedding, page_size + 1, after, filters_dict, exact=True
+                    )
+                    cursor_rows = self._execute_query(sql, params)
+                    started = time.perf_counter()
+                    rows = [(to_result(row[:-1]), row[-1]) for row in cursor_rows.fetchall()]
+                    self._record_stage("hydrate", started)
+
+            # One extra row tells whether another page exists without an empty round trip
+            page, next_cursor = rows[:page_size], None
+            if len(rows) > page_size:
+                last, distance = page[-1]
+                next_cursor = self._encode_cursor({
+                    "h": handle,
+                    "q": query,
+                    "f": {k: v for k, v in (filters_dict or {}).items() if v},
+                    "d": distance,
+                    "id": last.product_id,
+                    "n": position + page_size,
+                })
+            if stats is not None:
+                stats.rows = len(page)
+            return SearchPage(results=[result for result, _ in page], cursor=next_cursor)
+
+    def search_iter(
+        self,
+        query: str,
+        filters: Optional[SearchFilters] = None,
+        page_size: int = 50,
+        fields: Optional[Sequence[str]] = None,
+        description_chars: Optional[int] = None
+    ) -> Iterator[SearchResult]:
+        """
+        Stream results in similarity order, fetching keyset pages of page_size as the
+        consumer advances (e.g. itertools.islice(engine.search_iter(q), 200)).
+        """
+        page = self.search_page(query, page_size, filters, fields=fields, description_chars=description_chars)
+        while True:
+            yield from page.results
+            if page.cursor is None:
+                return
+            page = self.search_page(page_size=page_size, cursor=page.cursor, fields=fields,
+                                    description_chars=description_chars)
+
+    def _query_vector(self, query: str, handle: Optional[str] = None):
+        """
+        Return (handle, embedding) for a paginated query. Vectors are kept in a small LRU
+        shared with using() copies; an unknown handle (evicted, or another process) re-encodes.
+        """
+        vectors, lock = self._shared["query_vectors"], self._shared["lock"]
+        with lock:
+            if handle is not None and handle in vectors:
+                vectors.move_to_end(handle)
+                return handle, vectors[handle]
+
+        embedding = np.asarray(self._encode_query(query), dtype=np.float32)
+        handle = hashlib.sha1(embedding.tobytes()).hexdigest()[:16]
+        with lock:
+            vectors[handle] = embedding
+            while len(vectors) > self.max_query_handles:
+                vectors.popitem(last=False)
+        return handle, embedding
+
+    @staticmethod
+    def _encode_cursor(state: dict) -> str:
+        payload = json.dumps(state, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(payload).decode("ascii")
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> dict:
+        try:
+            state = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            if not {"h", "q", "f", "d", "id", "n"} <= state.keys():
+                raise KeyError
+        except (binascii.Error, UnicodeError, ValueError, KeyError, AttributeError):
+            raise ValueError("Invalid search cursor") from None
+        return state
+
+    def _build_keyset_query(
+        self,
+        query_embedding,
+        limit: int,
+        after: Optional[Tuple[float, int]],
+        filters: Optional[dict],
+        exact: bool = False
+    ) -> Tuple[str, List]:
+        """
+        Page query ordered by (distance, product_id). The distance prefix comes from
+        the vector index and product_id only breaks ties (an incremental sort), so
+        duplicate embeddings never straddle a page boundary inconsistently. With
+        `exact`, the matching rows are materialized first and all of them are scored,
+        as in _build_exact_query.
+        """
+        where_sql, filter_params = self._build_filter_clause(filters)
+        keyset_params = []
+        if after is not None:
+            keyset = "(pe.embedding <=> %s, pe.product_id) > (%s::float8, %s)"
+            where_sql = f"{where_sql} AND {keyset}" if where_sql else f" WHERE {keyset}"
+            keyset_params = [query_embedding, after[0], after[1]]
+        if exact:
+            query = f"""
+                WITH candidates AS MATERIALIZED (
+                    SELECT {self._projection.select_list("p")},
+                        pe.embedding <=> %s AS distance
+                    FROM products p
+                    JOIN product_embeddings pe ON p.product_id = pe.product_id
+                    {where_sql}
+                )
+                SELECT {self._projection.column_list()}, 1 - distance AS similarity, distance
+                FROM candidates
+                ORDER BY distance, product_id
+                LIMIT %s
+            """
+            return query, [query_embedding] + filter_params + keyset_params + [limit]
+        params = [query_embedding, query_embedding] + filter_params + keyset_params
+        query = f"""
+            SELECT {self._projection.select_list("p")},
+                1 - (pe.embedding <=> %s) AS similarity,
+                pe.embedding <=> %s AS distance
+            FROM products p
+            JOIN product_embeddings pe ON p.product_id = pe.product_id
+            {where_sql}
+            ORDER BY pe.embedding <=> %s, pe.product_id
+            LIMIT %s
+        """
+        return query, params + [query_embedding, limit]
+
+    def _search_embeddings(self, embeddings: list, top_k: int, filters_dict: Optional[dict]) -> List[List[SearchResult]]:
+        """Resolve several encoded queries with a single LATERAL query."""
+        if self.vector_index is not None:
+            self.last_plan = SearchPlan(strategy="vector_index")
+            return self.vector_index.search_many(embeddings, top_k, filters_dict, projection=self._projection)
+        if self.quantization is not None and not (self.adaptive_filtering and self._has_active_filters(filters_dict)):
+            # The two-stage query is per query vector; keep the single-query path for it
+            return [self._search_embedding(embedding, top_k, filters_dict) for embedding in embeddings]
+
+        if self.adaptive_filtering and self._has_active_filters(filters_dict):
+            plan = self._plan_for_filters(top_k, filters_dict)
+        else:
+            plan = SearchPlan(strategy="inline_filters" if self._has_active_filters(filters_dict) else "unfiltered")
+
+        candidates = top_k * plan.overfetch_factor if plan.strategy == "ann_overfetch" else None
+        query, params = self._build_batch_query(embeddings, top_k, plan.strategy, filters_dict, candidates)
+        cursor = self._execute_query(query, params, min_ef_search=candidates)
+
+        started = time.perf_counter()
+        grouped = [[] for _ in embeddings]
+        for row in cursor.fetchall():
+            grouped[row[0] - 1].append(self._projection.to_result(row[1:]))
+        self._record_stage("hydrate", started)
+
+        if plan.strategy == "ann_overfetch":
+            # Queries whose first over-fetch came up short escalate exactly as search() would
+            for i, query_results in enumerate(grouped):
+                if len(query_results) < top_k:
+                    grouped[i] = self._planned_search(embeddings[i], top_k, filters_dict)
+
+        self.last_plan = plan
+        return grouped
+
+    def _build_batch_query(
+        self,
+        embeddings: list,
+        top_k: int,
+        strategy: str,
+        filters: Optional[dict],
+        candidates: Optional[int] = None
+    ) -> Tuple[str, List]:
+        """
+        Build the multi-query statement. Each LATERAL subquery mirrors the single-query
+        SQL for the given plan strategy, with the query vector taken from q.query_embedding.
+        """
+        where_sql, filter_params = self._build_filter_clause(filters)
+        vectors = [np.asarray(e, dtype=np.float32) for e in embeddings]
+        queries_sql = "unnest(%s::vector[]) WITH ORDINALITY AS q(query_embedding, ord)"
+        projection = self._projection
+
+        if strategy == "exact":
+            query = f"""
+                WITH candidates AS MATERIALIZED (
+                    SELECT {projection.select_list("p")}, pe.embedding
+                    FROM products p
+                    JOIN product_embeddings pe ON p.product_id = pe.product_id
+                    {where_sql}
+                )
+                SELECT q.ord, {projection.column_list("r")}, r.similarity
+                FROM {queries_sql}
+                CROSS JOIN LATERAL (
+                    SELECT c.*, 1 - (c.embedding <=> q.query_embedding) AS similarity,
+                        c.embedding <=> q.query_embedding AS distance
+                    FROM candidates c
+                    ORDER BY distance LIMIT %s
+                ) r
+                ORDER BY q.ord, r.distance
+            """
+            return query, filter_params + [vectors, top_k]
+
+        if strategy == "ann_overfetch":
+            query = f"""
+                SELECT q.ord, {projection.column_list("r")}, r.similarity
+                FROM {queries_sql}
+                CROSS JOIN LATERAL (
+                    SELECT {projection.select_list("p")}, 1 - c.distance AS similarity, c.distance
+                    FROM (
+                        SELECT pe.product_id, pe.embedding <=> q.query_embedding AS distance
+                        FROM product_embeddings pe
+                        ORDER BY distance LIMIT %s
+                    ) c
+                    JOIN products p ON p.product_id = c.product_id
+                    {where_sql}
+                    ORDER BY c.distance LIMIT %s
+                ) r
+                ORDER BY q.ord, r.distance
+            """
+            return query, [vectors, candidates] + filter_params + [top_k]
+
+        query = f"""
+            SELECT q.ord, {projection.column_list("r")}, r.similarity
+            FROM {queries_sql}
+            CROSS JOIN LATERAL (
+                SELECT {projection.select_list("p")},
+                    1 - (pe.embedding <=> q.query_embedding) AS similarity,
+                    pe.embedding <=> q.query_embedding AS distance
+                FROM products p
+                JOIN product_embeddings pe ON p.product_id = pe.product_id
+                {where_sql}
+                ORDER BY pe.embedding <=> q.query_embedding LIMIT %s
+            ) r
+            ORDER BY q.ord, r.distance
+        """
+        return query, [vectors] + filter_params + [top_k]
+
+    def _read_catalog_version(self) -> int:
+        """Read the catalog/embedding version bumped by the pipeline scripts on every write."""
+        if self.vector_index is not None:
+            # An exported index is a snapshot of the version it was exported at
+            return self.vector_index.catalog_version
+        cursor = self.db.cursor()
+        cursor.execute("SELECT version FROM catalog_version")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def _encode_query(self, query: str):
+        """Encode a single query, going through the embedding cache when one is configured."""
+        if self.embedding_cache is None:
+            return self.model.encode([query])[0]
+        return self.embedding_cache.get_or_encode(query, lambda q: self.model.encode([q])[0])
+
+    def _encode_queries(self, queries: List[str]) -> list:
+        """Encode several queries in one model call; cached embeddings are not re-encoded."""
+        if self.embedding_cache is None:
+            return list(self.model.encode(queries))
+
+        embeddings = [self.embedding_cache.get(query) for query in queries]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            encoded = self.model.encode([queries[i] for i in missing])
+            for i, embedding in zip(missing, encoded):
+                embeddings[i] = self.embedding_cache.put(queries[i], embedding)
+        return embeddings
+
     def _build_similarity_query(self, top_k: int) -> str:
-        return """
-            SELECT p.product_id, p.product_name, p.product_brand, p.gender, p.price_inr, 
-                p.num_images, p.description, p.primary_color,
-                1 - (pe.embedding <=> %s) as similarity
+        return f"""
+            SELECT {self._projection.select_list("p")},
+                1 - (pe.embedding <=> %s) AS similarity
             FROM products p
             JOIN product_embeddings pe ON p.product_id = pe.product_id
         """
@@ -87,6 +1123,11 @@ class ProductSearchEngine:
         Modify the base SQL query to include WHERE clauses for structured filters,
         and prepare the parameters list including the query embedding and top_k.
 
+        Results are ordered by the raw cosine distance operator (ascending) rather than
+        by the computed similarity, so Postgres can serve the ORDER BY ... LIMIT from
+        the HNSW/IVFFlat index. The embedding is therefore bound twice: once for the
+        similarity column and once for the ordering.
+
         Args:
             base_query (str): The initial SQL query string before applying filters.
             query_embedding (list): The embedding vector for the query.
@@ -105,31 +1146,323 @@ class ProductSearchEngine:
         # Add query embedding to parameters
         params.append(query_embedding)
         
-        if filters:
-            query += " WHERE 1=1"
-            if filters.get('min_price'):
-                query += " AND price_inr >= %s"
-                params.append(filters['min_price'])
-            if filters.get('max_price'):
-                query += " AND price_inr <= %s"
-                params.append(filters['max_price'])
-            if filters.get('gender'):
-                query += " AND gender = %s"
-                params.append(filters['gender'])
-            if filters.get('brand'):
-                query += " AND product_brand = %s"
-                params.append(filters['brand'])
-            if filters.get('color'):
-                query += " AND primary_color = %s"
-                params.append(filters['color'])
+        where_sql, filter_params = self._build_filter_clause(filters)
+        query += where_sql
+        params.extend(filter_params)
         
-        query += " ORDER BY similarity DESC LIMIT %s"
+        query += " ORDER BY pe.embedding <=> %s LIMIT %s"
+        params.append(query_embedding)
         params.append(top_k)
     
         # Return the tuple with query and parameters
         return (query, params)
         
-    def _execute_query(self, query: str, params: list):
+    def _build_filter_clause(self, filters: Optional[dict]) -> Tuple[str, List]:
+        """
+        Build the WHERE clause for the structured filters.
+
+        Args:
+            filters (Optional[dict]): Dictionary of filter criteria (min_price, max_price, gender, brand, color).
+
+        Returns:
+            Tuple[str, List]: The WHERE clause (empty string when no filters) and its parameters.
+        """
+        if not filters:
+            return "", []
+
+        clause = " WHERE 1=1"
+        params = []
+        if filters.get('min_price'):
+            clause += " AND price_inr >= %s"
+            params.append(filters['min_price'])
+        if filters.get('max_price'):
+            clause += " AND price_inr <= %s"
+            params.append(filters['max_price'])
+        if filters.get('gender'):
+            clause += " AND gender = %s"
+            params.append(filters['gender'])
+        if filters.get('brand'):
+            clause += " AND product_brand = %s"
+            params.append(filters['brand'])
+        if filters.get('color'):
+            clause += " AND primary_color = %s"
+            params.append(filters['color'])
+        return clause, params
+
+    @staticmethod
+    def _has_active_filters(filters: Optional[dict]) -> bool:
+        return bool(filters) and any(filters.values())
+
+    def plan_search(self, top_k: int, filters: Optional[SearchFilters] = None) -> SearchPlan:
+        """
+        Choose how a filtered search should run, based on estimated filter selectivity.
+
+        - Selective filters (few matching rows): exact scan over the filtered subset.
+          The ANN index would return mostly non-matching neighbours.
+        - Broad filters: ANN scan with an over-fetch factor of roughly 1 / selectivity,
+          filtering the candidates afterwards.
+
+        Args:
+            top_k (int): Number of results wanted.
+            filters (Optional[SearchFilters]): Structured filters.
+
+        Returns:
+            SearchPlan: The chosen plan (no query is executed beyond loading statistics).
+        """
+        filters_dict = filters.__dict__ if filters else None
+        return self._plan_for_filters(top_k, filters_dict)
+
+    def _plan_for_filters(self, top_k: int, filters: Optional[dict]) -> SearchPlan:
+        if not self._has_active_filters(filters):
+            return SearchPlan(strategy="unfiltered", reason="no filters")
+
+        stats = self.get_filter_statistics()
+        selectivity = stats.estimate_selectivity(filters)
+        estimated_rows = int(round(selectivity * stats.total_rows))
+
+        if estimated_rows <= self.exact_scan_max_rows:
+            return SearchPlan(
+                strategy="exact",
+                estimated_selectivity=selectivity,
+                estimated_rows=estimated_rows,
+                reason=f"~{estimated_rows} matching rows <= exact_scan_max_rows ({self.exact_scan_max_rows})"
+            )
+
+        overfetch_factor = max(2, math.ceil(1 / selectivity))
+        if top_k * overfetch_factor > self.max_overfetch_candidates:
+            return SearchPlan(
+                strategy="exact",
+                estimated_selectivity=selectivity,
+                estimated_rows=estimated_rows,
+                reason="required over-fetch exceeds max_overfetch_candidates"
+            )
+
+        return SearchPlan(
+            strategy="ann_overfetch",
+            estimated_selectivity=selectivity,
+            estimated_rows=estimated_rows,
+            overfetch_factor=overfetch_factor,
+            reason=f"broad filter, over-fetching x{overfetch_factor}"
+        )
+
+    def _planned_search(self, query_embedding, top_k: int, filters: dict) -> List[SearchResult]:
+        """Run a filtered search according to the planner, growing the over-fetch until top_k is reached."""
+        plan = self._plan_for_filters(top_k, filters)
+        self.last_plan = plan
+
+        if plan.strategy == "ann_overfetch":
+            while True:
+                candidates = top_k * plan.overfetch_factor
+                query, params = self._build_overfetch_query(query_embedding, top_k, candidates, filters)
+                results = self._fetch_results(self._execute_query(query, params, min_ef_search=candidates))
+                if len(results) >= top_k:
+                    return results
+                next_factor = min(plan.overfetch_factor * 2, self.max_overfetch_candidates // top_k)
+                if next_factor <= plan.overfetch_factor:
+                    break
+                plan.attempts += 1
+                plan.overfetch_factor = next_factor
+            # Statistics were too optimistic: fall back to an exact scan
+            plan.strategy = "exact"
+            plan.attempts += 1
+            plan.reason = "over-fetch exhausted before reaching top_k"
+
+        query, params = self._build_exact_query(query_embedding, top_k, filters)
+        return self._fetch_results(self._execute_query(query, params))
+
+    def _build_exact_query(self, query_embedding, top_k: int, filters: Optional[dict]) -> Tuple[str, List]:
+        """
+        Exact nearest-neighbour query over the filtered subset.
+
+        The filtered rows are materialized first, so the vector index cannot be used
+        and every matching row is scored - correct and fast when few rows match.
+        """
+        where_sql, filter_params = self._build_filter_clause(filters)
+        query = f"""
+            WITH candidates AS MATERIALIZED (
+                SELECT {self._projection.select_list("p")}, pe.embedding
+                FROM products p
+                JOIN product_embeddings pe ON p.product_id = pe.product_id
+                {where_sql}
+            )
+            SELECT {self._projection.column_list()},
+                1 - (embedding <=> %s) AS similarity
+            FROM candidates
+            ORDER BY embedding <=> %s LIMIT %s
+        """
+        return query, filter_params + [query_embedding, query_embedding, top_k]
+
+    def _hybrid_search(self, query: str, query_embedding, top_k: int, filters: Optional[dict]) -> List[SearchResult]:
+        """Lexical + vector retrieval fused with reciprocal rank fusion in one round trip."""
+        vector_candidates = self.vector_candidates or 2 * top_k
+        self.last_plan = SearchPlan(
+            strategy="hybrid_rrf",
+            reason=f"{vector_candidates} vector + {self.lexical_candidates} lexical candidates, rrf_k={self.rrf_k}"
+        )
+        sql, params = self._build_hybrid_query(query, query_embedding, top_k, vector_candidates, filters)
+        return self._fetch_results(self._execute_query(sql, params, min_ef_search=vector_candidates))
+
+    def _build_hybrid_query(
+        self,
+        query: str,
+        query_embedding,
+        top_k: int,
+        vector_candidates: int,
+        filters: Optional[dict]
+    ) -> Tuple[str, List]:
+        """
+        Both candidate lists apply the structured filters. Each product scores
+        sum(1 / (rrf_k + rank)) over the lists it appears in; the similarity column
+        stays the cosine similarity (0 for lexical-only hits without an embedding).
+        """
+        where_sql, filter_params = self._build_filter_clause(filters)
+        lexical_where = f"{where_sql} AND" if where_sql else " WHERE"
+        sql = f"""
+            WITH vector_hits AS (
+                SELECT product_id, row_number() OVER (ORDER BY distance) AS rank
+                FROM (
+                    SELECT p.product_id, pe.embedding <=> %s AS distance
+                    FROM products p
+                    JOIN product_embeddings pe ON p.product_id = pe.product_id
+                    {where_sql}
+                    ORDER BY distance LIMIT %s
+                ) v
+            ),
+            lexical_hits AS (
+                SELECT product_id, row_number() OVER (ORDER BY score DESC, product_id) AS rank
+                FROM (
+                    SELECT p.product_id, ts_rank_cd(p.search_tsv, tsq) AS score
+                    FROM products p, websearch_to_tsquery('english', %s) tsq
+                    {lexical_where} p.search_tsv @@ tsq
+                    ORDER BY score DESC LIMIT %s
+                ) l
+            ),
+            fused AS (
+                SELECT product_id, SUM(1.0 / (%s + rank)) AS rrf_score
+                FROM (SELECT * FROM vector_hits UNION ALL SELECT * FROM lexical_hits) hits
+                GROUP BY product_id
+            )
+            SELECT {self._projection.select_list("p")},
+                COALESCE(1 - (pe.embedding <=> %s), 0.0) AS similarity
+            FROM fused f
+            JOIN products p ON p.product_id = f.product_id
+            LEFT JOIN product_embeddings pe ON pe.product_id = f.product_id
+            ORDER BY f.rrf_score DESC, p.product_id
+            LIMIT %s
+        """
+        params = (
+            [query_embedding] + filter_params + [vector_candidates]
+            + [query] + filter_params + [self.lexical_candidates]
+            + [self.rrf_k, query_embedding, top_k]
+        )
+        return sql, params
+
+    def _quantized_search(self, query_embedding, top_k: int, filters: Optional[dict]) -> List[SearchResult]:
+        """Candidate retrieval on the compact index, then an exact full-precision rerank."""
+        candidates = min(top_k * self.rerank_factor, self.max_overfetch_candidates)
+        self.last_plan = SearchPlan(
+            strategy="quantized_rerank",
+            overfetch_factor=self.rerank_factor,
+            reason=f"{candidates} {self.quantization} candidates rescored at full precision"
+        )
+        query, params = self._build_quantized_query(query_embedding, top_k, candidates, filters)
+        return self._fetch_results(self._execute_query(query, params, min_ef_search=candidates))
+
+    def _build_quantized_query(
+        self,
+        query_embedding,
+        top_k: int,
+        candidates: int,
+        filters: Optional[dict]
+    ) -> Tuple[str, List]:
+        """
+        Two-stage query: the candidate CTE orders by the quantized distance so the
+        expression index is used; the outer query rescores those candidates with the
+        full-precision embedding and keeps the best top_k.
+        """
+        where_sql, filter_params = self._build_filter_clause(filters)
+        query = f"""
+            WITH candidates AS MATERIALIZED (
+                SELECT {self._projection.select_list("p")}, pe.embedding
+                FROM products p
+                JOIN product_embeddings pe ON p.product_id = pe.product_id
+                {where_sql}
+                ORDER BY {QUANTIZED_DISTANCES[self.quantization]} LIMIT %s
+            )
+            SELECT {self._projection.column_list()},
+                1 - (embedding <=> %s) AS similarity
+            FROM candidates
+            ORDER BY embedding <=> %s LIMIT %s
+        """
+        return query, filter_params + [query_embedding, candidates, query_embedding, query_embedding, top_k]
+
+    def _build_overfetch_query(
+        self,
+        query_embedding,
+        top_k: int,
+        candidates: int,
+        filters: Optional[dict]
+    ) -> Tuple[str, List]:
+        """
+        ANN query that fetches `candidates` nearest neighbours via the index,
+        then applies the filters and keeps the best top_k. Only ids and distances
+        come out of the index scan; product columns are joined for the candidates.
+        """
+        where_sql, filter_params = self._build_filter_clause(filters)
+        query = f"""
+            SELECT {self._projection.select_list("p")},
+                1 - c.distance AS similarity
+            FROM (
+                SELECT pe.product_id, pe.embedding <=> %s AS distance
+                FROM product_embeddings pe
+                ORDER BY distance LIMIT %s
+            ) c
+            JOIN products p ON p.product_id = c.product_id
+            {where_sql}
+            ORDER BY c.distance LIMIT %s
+        """
+        return query, [query_embedding, candidates] + filter_params + [top_k]
+
+    def get_filter_statistics(self, refresh: bool = False) -> FilterStatistics:
+        """
+        Return cached filter statistics, reloading them when stale or when refresh=True.
+        """
+        stats = self._filter_stats
+        if refresh or stats is None or time.monotonic() - stats.loaded_at > self.stats_ttl_seconds:
+            stats = self._load_filter_statistics()
+            self._filter_stats = stats
+        return stats
+
+    def _load_filter_statistics(self) -> FilterStatistics:
+        """Load row counts per gender/brand/color and price quantiles for embedded products."""
+        cursor = self.db.cursor()
+        from_sql = "FROM products p JOIN product_embeddings pe ON p.product_id = pe.product_id"
+
+        cursor.execute(f"SELECT COUNT(*) {from_sql}")
+        total_rows = cursor.fetchone()[0]
+
+        counts = {}
+        for column in ("gender", "product_brand", "primary_color"):
+            cursor.execute(f"SELECT p.{column}, COUNT(*) {from_sql} GROUP BY p.{column}")
+            counts[column] = {value: count for value, count in cursor.fetchall() if value is not None}
+
+        cursor.execute(
+            f"SELECT percentile_disc(%s::float8[]) WITHIN GROUP (ORDER BY p.price_inr) "
+            f"{from_sql} WHERE p.price_inr IS NOT NULL",
+            ([i / 100 for i in range(101)],)
+        )
+        price_quantiles = cursor.fetchone()[0] or []
+
+        return FilterStatistics(
+            total_rows=total_rows,
+            gender_counts=counts["gender"],
+            brand_counts=counts["product_brand"],
+            color_counts=counts["primary_color"],
+            price_quantiles=price_quantiles,
+            loaded_at=time.monotonic()
+        )
+
+    def _execute_query(self, query: str, params: list, min_ef_search: Optional[int] = None):
         """
         Execute the given SQL query with parameters using the stored database connection.
 
@@ -143,19 +1476,159 @@ class ProductSearchEngine:
         Args:
             query: The complete SQL query string to execute, including joins, filters, ordering, and limits
             params: List of parameters to pass to the query, including the query embedding vector and filter values
+            min_ef_search: Lower bound for hnsw.ef_search, so an over-fetching ANN scan can return enough candidates
 
         Returns:
             Raw database cursor after executing the query, which can be used to fetch the search results
         """
+        started = time.perf_counter()
+
         # Create a cursor from the database connection
         cursor = self.db.cursor()
-        
-        # Execute the query with parameters
-        cursor.execute(query, params)
+
+        # ANN recall knobs for this query only, sent in the same round trip as the query
+        settings_sql, settings_params = self._index_settings(min_ef_search)
+        batch = [settings_sql] if settings_sql else []
+
+        # Execute the query with parameters, through a prepared statement when enabled
+        executed, prepare_sql = query, None
+        if self.prepare_statements:
+            name, prepare_sql = self._prepare(cursor, query)
+            arguments = f" ({', '.join(_execute_arguments(query))})" if params else ""
+            executed = f"EXECUTE {name}{arguments}"
+            if prepare_sql:
+                batch.append(prepare_sql)
+        batch.append(executed)
+        try:
+            # psycopg2 returns the result of the last statement of the batch
+            cursor.execute(";\n".join(batch), settings_params + list(params))
+        except Exception:
+            if prepare_sql:
+                # Whether the PREPARE ran is unknown; re-read the session's statements next time
+                self._forget_prepared_connection()
+            raise
+        if prepare_sql:
+            self._mark_prepared(name)
+        self._record_stage("execute", started)
+        if self.slow_query_log is not None:
+            self.slow_query_log.observe(
+                self.db, query, params, (time.perf_counter() - started) * 1000, explain_query=executed
+            )
         
         # Return the cursor
         return cursor
 
+    def _prepare(self, cursor, query: str) -> Tuple[str, Optional[str]]:
+        """
+        Return (name, PREPARE statement) for this query shape on the current connection;
+        the PREPARE is None once the shape is prepared there, otherwise the caller sends
+        it ahead of the EXECUTE and calls _mark_prepared() when that succeeded.
+        Connections are told apart by object id and backend pid, as the pool does, so
+        a reconnect never reuses stale names.
+
+        Tracked connections are kept in least-recently-used order. A connection seen for
+        the first time, or again after being evicted, reads back the statements its
+        session already holds from pg_prepared_statements (one query per connection,
+        not per search), so it never PREPAREs a duplicate name.
+        """
+        name = "search_" + hashlib.md5(query.encode("utf-8")).hexdigest()[:16]
+        prepared, counts, lock = self._shared["prepared"], self._shared["prepare_counts"], self._shared["lock"]
+        key = self._prepared_key()
+        with lock:
+            statements = prepared.get(key)
+            if statements is not None:
+                prepared.move_to_end(key)
+                known = name in statements
+        if statements is None:
+            # Read outside the lock; only this thread uses the connection meanwhile
+            cursor.execute("SELECT name FROM pg_prepared_statements WHERE starts_with(name, 'search_')")
+            held = {row[0] for row in cursor.fetchall()}
+            with lock:
+                statements = prepared.setdefault(key, set())
+                statements.update(held)
+                known = name in statements
+                self._evict_prepared_connections()
+
+        if known:
+            with lock:
+                counts["hits"] += 1
+            if self._stats is not None:
+                self._stats.prepare_hits += 1
+            return name, None
+        return name, f"PREPARE {name} AS {numbered_placeholders(query)}"
+
+    def _prepared_key(self) -> Tuple[int, int]:
+        return id(self.db), self.db.get_backend_pid()
+
+    def _mark_prepared(self, name: str) -> None:
+        """Record a statement PREPAREd on the current connection."""
+        prepared, counts = self._shared["prepared"], self._shared["prepare_counts"]
+        key = self._prepared_key()
+        with self._shared["lock"]:
+            prepared.setdefault(key, set()).add(name)
+            prepared.move_to_end(key)
+            counts["prepares"] += 1
+            self._evict_prepared_connections()
+        if self._stats is not None:
+            self._stats.prepares += 1
+
+    def _evict_prepared_connections(self) -> None:
+        """Drop the least recently used connections beyond the limit; hold the shared lock."""
+        prepared = self._shared["prepared"]
+        while len(prepared) > self.max_prepared_connections:
+            prepared.popitem(last=False)
+
+    def _forget_prepared_connection(self) -> None:
+        key = self._prepared_key()
+        with self._shared["lock"]:
+            self._shared["prepared"].pop(key, None)
+
+    def prepared_statement_stats(self) -> Dict[str, int]:
+        """Prepare hits, statements prepared and connections tracked (shared with using() copies)."""
+        counts = self._shared["prepare_counts"]
+        with self._shared["lock"]:
+            return {
+                "hits": counts["hits"],
+                "prepares": counts["prepares"],
+                "connections": len(self._shared["prepared"]),
+                "statements": sum(len(names) for names in self._shared["prepared"].values()),
+            }
+
+    def _index_settings(self, min_ef_search: Optional[int] = None) -> Tuple[Optional[str], list]:
+        """
+        One statement applying the configured hnsw.ef_search / ivfflat.probes /
+        plan_cache_mode settings, or (None, []) when there is nothing to set.
+
+        set_config(..., true) is SET LOCAL: it is scoped to the current transaction, so
+        it never leaks into other users of the same connection once the transaction ends.
+        Callers such as the CLI and the benchmark run many searches in one transaction,
+        so once a query has raised hnsw.ef_search on a connection, the next query that
+        does not set it resets it to the default instead of inheriting the raised value.
+        """
+        raised = self._shared["ef_search_raised"]
+        ef_search = self.ef_search
+        if min_ef_search is not None:
+            # hnsw.ef_search also bounds how many rows an HNSW scan returns (max 1000)
+            ef_search = min(1000, max(ef_search or 0, min_ef_search))
+        calls, params = [], []
+        if ef_search is not None:
+            calls.append("set_config('hnsw.ef_search', %s, true)")
+            params.append(str(int(ef_search)))
+            raised.add(id(self.db))
+        elif id(self.db) in raised:
+            calls.append("set_config('hnsw.ef_search', "
+                         "(SELECT reset_val FROM pg_settings WHERE name = 'hnsw.ef_search'), true)")
+            raised.discard(id(self.db))
+        if self.probes is not None:
+            calls.append("set_config('ivfflat.probes', %s, true)")
+            params.append(str(int(self.probes)))
+        if self.plan_cache_mode is not None:
+            calls.append("set_config('plan_cache_mode', %s, true)")
+            params.append(self.plan_cache_mode)
+        if not calls:
+            return None, []
+        return f"SELECT {', '.join(calls)}", params
+
     def _fetch_results(self, cursor) -> List[SearchResult]:
         """
         Fetch all results from the executed query cursor and return them in a suitable format.
@@ -166,21 +1639,27 @@ class ProductSearchEngine:
         Returns:
             List of SearchResult objects with product data and similarity scores
         """
+        started = time.perf_counter()
+
         # Fetch all rows from the cursor
         rows = cursor.fetchall()
         
-        # Return the rows as a search result
-        return [
-        SearchResult(
-            product_id=row[0],
-            product_name=row[1],
-            product_brand=row[2],
-            gender=row[3],
-            price_inr=row[4],
-            num_images=row[5],
-            description=row[6],
-            primary_color=row[7],
-            similarity_score=row[8]
+        # Return the rows as search results, in the shape of the current projection
+        to_result = self._projection.to_result
+        results = [to_result(row) for row in rows]
+        self._record_stage("hydrate", started)
+        return results
+
+    def fetch_descriptions(self, product_ids: Sequence[int]) -> Dict[int, Optional[str]]:
+        """
+        Full descriptions for a few products, e.g. the results a user expands after a
+        search that left descriptions out of its projection or truncated them.
+        """
+        if not product_ids:
+            return {}
+        cursor = self.db.cursor()
+        cursor.execute(
+            "SELECT product_id, description FROM products WHERE product_id = ANY(%s)",
+            (list(product_ids),)
         )
-        for row in rows
-        ]
\ No newline at end of file
+        return dict(cursor.fetchall())
@@ -0,0 +1,126 @@
+"""
+Recall@k report for quantized search (ProductSearchEngine(quantization=...)) against
+the unquantized full-precision path.
+
+ensure_quantized_index drops the full-precision ANN index by default, in which case
+the baseline is an exact sequential scan; the report labels the baseline row with
+the index it actually ran on ("hnsw", "ivfflat" or "exact (seq scan)"), so its
+latency is not mistaken for an indexed full-precision search.
+
+Query vectors are sampled from the stored embeddings, so no model needs to be loaded.
+Requires the quantized indexes (ann_index.ensure_quantized_index).
+
+Usage:
+    python src/quantization_recall.py --queries 200 --top-k 10 --rerank-factors 2 4 8
+"""
+
+import argparse
+import time
+from typing import List
+
+from ann_index import HNSW_INDEX_NAME, IVFFLAT_INDEX_NAME
+from product_search_engine import ProductSearchEngine, QUANTIZED_DISTANCES
+from utils import db_connection
+
+
+def recall_at_k(reference: List[int], candidate: List[int]) -> float:
+    """Fraction of the reference top-k ids also returned by the candidate search."""
+    if not reference:
+        return 1.0
+    return len(set(reference) & set(candidate)) / len(reference)
+
+
+def sample_query_embeddings(conn, count: int, seed: float = 0.42) -> list:
+    """Reproducible sample of stored embeddings to use as query vectors."""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT setseed(%s)", (seed,))
+        cursor.execute("SELECT embedding FROM product_embeddings ORDER BY random() LIMIT %s", (count,))
+        embeddings = [row[0] for row in cursor.fetchall()]
+    conn.rollback()
+    return embeddings
+
+
+def baseline_label(conn) -> str:
+    """Which full-precision path the baseline runs on: the ANN index in place, or an exact scan."""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL, to_regclass(%s) IS NOT NULL",
+                       (HNSW_INDEX_NAME, IVFFLAT_INDEX_NAME))
+        hnsw, ivfflat = cursor.fetchone()
+    conn.rollback()
+    if hnsw:
+        return "hnsw"
+    if ivfflat:
+        return "ivfflat"
+    return "exact (seq scan)"
+
+
+def _timed_ids(engine: ProductSearchEngine, embeddings: list, top_k: int):
+    ids, start = [], time.perf_counter()
+    for embedding in embeddings:
+        ids.append([r.product_id for r in engine._search_embedding(embedding, top_k, None)])
+        engine.db.rollback()
+    return ids, (time.perf_counter() - start) * 1000 / max(1, len(embeddings))
+
+
+def measure_recall(
+    conn,
+    embeddings: list,
+    top_k: int,
+    quantizations: List[str],
+    rerank_factors: List[int],
+    ef_search=None
+) -> List[dict]:
+    """
+    Run every query through the full-precision engine and each quantized configuration.
+    The baseline row is labelled by baseline_label().
+
+    Returns:
+        List[dict]: One row per configuration with mean recall@k and mean latency (ms).
+    """
+    baseline = ProductSearchEngine(conn, None, ef_search=ef_search)
+    reference, baseline_ms = _timed_ids(baseline, embeddings, top_k)
+    rows = [{"quantization": baseline_label(conn), "rerank_factor": None, "recall": 1.0, "mean_ms": baseline_ms}]
+
+    for quantization in quantizations:
+        for rerank_factor in rerank_factors:
+            engine = ProductSearchEngine(
+                conn, None, ef_search=ef_search, quantization=quantization, rerank_factor=rerank_factor
+            )
+            ids, mean_ms = _timed_ids(engine, embeddings, top_k)
+            recall = sum(recall_at_k(r, c) for r, c in zip(reference, ids)) / max(1, len(ids))
+            rows.append({
+                "quantization": quantization,
+                "rerank_factor": rerank_factor,
+                "recall": recall,
+                "mean_ms": mean_ms,
+            })
+    return rows
+
+
+def format_report(rows: List[dict], top_k: int) -> str:
+    lines = [f"{'quantization':<18}{'rerank':>8}{f'recall@{top_k}':>12}{'mean ms':>10}"]
+    for row in rows:
+        rerank = "-" if row["rerank_factor"] is None else f"x{row['rerank_factor']}"
+        lines.append(f"{row['quantization']:<18}{rerank:>8}{row['recall']:>12.3f}{row['mean_ms']:>10.2f}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare quantized search recall against full precision.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--quantizations", nargs="+", default=sorted(QUANTIZED_DISTANCES),
+                        choices=sorted(QUANTIZED_DISTANCES))
+    parser.add_argument("--rerank-factors", nargs="+", type=int, default=[2, 4, 8])
+    parser.add_argument("--ef-search", type=int, default=None)
+    args = parser.parse_args()
+
+    with db_connection() as conn:
+        embeddings = sample_query_embeddings(conn, args.queries)
+        rows = measure_recall(conn, embeddings, args.top_k, args.quantizations, args.rerank_factors, args.ef_search)
+    print(f"📊 {len(embeddings)} sampled queries")
+    print(format_report(rows, args.top_k))
+
+
+if __name__ == "__main__":
+    main()
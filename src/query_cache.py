@@ -0,0 +1,326 @@
+"""
+Query embedding and search result caches for the Product Search Engine.
+
+Encoding the query is the most CPU-heavy step of a search, and many queries
+repeat ("casual shoes", "blue jeans"). EmbeddingCache keeps a bounded,
+thread-safe LRU map of normalized query string -> float32 embedding, so one
+instance can be shared by the engine, the CLI and all Streamlit sessions.
+
+SearchResultCache goes one step further and keeps the full result list for a
+(normalized query, filters, top_k) key. Entries are tagged with the catalog
+version (the catalog_version table, bumped by the pipeline scripts), so a
+reload or re-embed invalidates them without any explicit purge.
+
+Usage:
+    cache = EmbeddingCache(max_size=10_000, ttl_seconds=24 * 3600, persist_path="query_cache.npz")
+    engine = ProductSearchEngine(conn, model, embedding_cache=cache, result_cache=SearchResultCache())
+    ...
+    cache.save()
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+from config import MODEL_ID
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query for cache lookups: lowercase and collapse whitespace.
+
+    all-MiniLM-L6-v2 uses an uncased tokenizer, so this does not change the embedding.
+    """
+    return " ".join(query.lower().split())
+
+
+def embedding_cache_from_env() -> "EmbeddingCache":
+    """
+    Build an EmbeddingCache configured from environment variables:
+        QUERY_CACHE_SIZE (default 10000), QUERY_CACHE_TTL_SECONDS (default: no expiry),
+        QUERY_CACHE_PATH (default: no persistence).
+    The persisted file is tagged with config.MODEL_ID and the QUERY_ENCODER backend.
+    """
+    ttl = os.getenv("QUERY_CACHE_TTL_SECONDS")
+    return EmbeddingCache(
+        max_size=int(os.getenv("QUERY_CACHE_SIZE", 10_000)),
+        ttl_seconds=float(ttl) if ttl else None,
+        persist_path=os.getenv("QUERY_CACHE_PATH") or None,
+        model_id=MODEL_ID,
+        encoder=os.getenv("QUERY_ENCODER", "sentence-transformers")
+    )
+
+
+@dataclass
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    max_size: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class EmbeddingCache:
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        ttl_seconds: Optional[float] = None,
+        persist_path: Optional[str] = None,
+        model_id: Optional[str] = None,
+        encoder: Optional[str] = None
+    ):
+        """
+        Args:
+            max_size (int): Maximum number of cached queries; least recently used entries are evicted first.
+            ttl_seconds (Optional[float]): Entries older than this are treated as misses. None disables expiry.
+            persist_path (Optional[str]): .npz file the cache is loaded from on start-up and written to by save().
+            model_id (Optional[str]): Model the vectors come from, saved with them; a file
+                saved for another model (or encoder) is ignored on load.
+            encoder (Optional[str]): Encoder backend (QUERY_ENCODER) the vectors come from.
+        """
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self.model_id = model_id
+        self.encoder = encoder
+        self._entries = OrderedDict()  # normalized query -> (embedding, created_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if persist_path and os.path.exists(persist_path):
+            self.load(persist_path)
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        """Return the cached embedding for the query, or None on a miss (or expired entry)."""
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry[1]):
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, query: str, embedding) -> np.ndarray:
+        """Store the embedding for the query as a read-only float32 array and return that array."""
+        vector = np.array(embedding, dtype=np.float32)
+        vector.setflags(write=False)
+        self._store(normalize_query(query), vector, time.time())
+        return vector
+
+    def get_or_encode(self, query: str, encode_fn) -> np.ndarray:
+        """
+        Return the cached embedding or compute it with encode_fn(query) and cache it.
+
+        encode_fn runs outside the lock, so concurrent misses for the same query may both encode.
+        """
+        embedding = self.get(query)
+        if embedding is None:
+            embedding = self.put(query, encode_fn(query))
+        return embedding
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                size=len(self._entries),
+                max_size=self.max_size
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write the non-expired entries to an .npz file (atomically, via a temporary file)."""
+        path = path or self.persist_path
+        if not path:
+            raise ValueError("No persist_path configured")
+
+        with self._lock:
+            items = [(k, v, t) for k, (v, t) in self._entries.items() if not self._is_expired(t)]
+
+        queries = np.array([k for k, _, _ in items], dtype=str)
+        vectors = np.stack([v for _, v, _ in items]) if items else np.empty((0, 0), dtype=np.float32)
+        created_at = np.array([t for _, _, t in items], dtype=np.float64)
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, queries=queries, vectors=vectors, created_at=created_at,
+                     model_id=np.array(self.model_id or ""), encoder=np.array(self.encoder or ""))
+        os.replace(tmp_path, path)
+
+    def load(self, path: Optional[str] = None) -> int:
+        """
+        Load entries from an .npz file written by save(). Returns the number of entries
+        loaded; a file saved for a different model_id or encoder loads nothing.
+        """
+        path = path or self.persist_path
+        with np.load(path) as data:
+            # Files written before the model was recorded read as "" and only match an untagged cache
+            saved_for = tuple(str(data[name]) if name in data else "" for name in ("model_id", "encoder"))
+            if saved_for != (self.model_id or "", self.encoder or ""):
+                return 0
+            queries, vectors, created_at = data["queries"], data["vectors"], data["created_at"]
+
+        loaded = 0
+        for query, vector, timestamp in zip(queries, vectors, created_at):
+            if self._is_expired(float(timestamp)):
+                continue
+            vector = vector.astype(np.float32)
+            vector.setflags(write=False)
+            self._store(str(query), vector, float(timestamp))
+            loaded += 1
+        return loaded
+
+    def _store(self, key: str, vector: np.ndarray, created_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (vector, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+
+class SearchResultCache:
+    def __init__(self, max_size: int = 1_000, version_check_seconds: float = 5.0):
+        """
+        Args:
+            max_size (int): Maximum number of cached result lists (LRU eviction).
+            version_check_seconds (float): How long a catalog version read is trusted before
+                re-reading it, so a cache hit normally costs no database round trip.
+        """
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        self.max_size = max_size
+        self.version_check_seconds = version_check_seconds
+        self._entries = OrderedDict()  # key -> (catalog_version, results or (results, facets))
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_read_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(query: str, filters, top_k: int, projection=None) -> tuple:
+        """
+        Cache key for a search. Filters are reduced to their set (truthy) fields, matching
+        how the engine builds the WHERE clause, so SearchFilters() and None share a key.
+        The (hashable) result projection is part of the key, so lean and full results never mix.
+        """
+        filter_items = tuple(sorted((k, v) for k, v in vars(filters).items() if v)) if filters else ()
+        return normalize_query(query), filter_items, top_k, projection
+
+    def current_version(self, read_version) -> int:
+        """Return the catalog version, calling read_version() at most once per version_check_seconds."""
+        now = time.monotonic()
+        with self._lock:
+            if self._version is not None and now - self._version_read_at < self.version_check_seconds:
+                return self._version
+        version = read_version()
+        with self._lock:
+            if version != self._version:
+                # Everything cached under an older version is stale
+                self._entries.clear()
+            self._version = version
+            self._version_read_at = now
+        return version
+
+    def get(self, query: str, filters, top_k: int, version, projection=None) -> Optional[List]:
+        """
+        Return a copy of the cached results, or None on a miss or version mismatch.
+        The results themselves are copied too, so callers may modify them freely.
+        """
+        key = self.make_key(query, filters, top_k, projection)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return [copy.copy(result) for result in entry[1]]
+
+    def put(self, query: str, filters, top_k: int, version, results: List, projection=None) -> None:
+        key = self.make_key(query, filters, top_k, projection)
+        with self._lock:
+            self._entries[key] = (version, [copy.copy(result) for result in results])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_faceted(self, query: str, filters, top_k: int, facet_candidates: int, version, projection=None):
+        """
+        Like get(), for search_with_facets(): return a copy of the cached (results, facets)
+        pair, or None. Faceted entries share the versioned cache but never a key with plain
+        result lists, and the candidate-set size is part of the key.
+        """
+        key = self.make_key(query, filters, top_k, projection) + ("facets", facet_candidates)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            results, facets = entry[1]
+            return [copy.copy(result) for result in results], copy.deepcopy(facets)
+
+    def put_faceted(
+        self, query: str, filters, top_k: int, facet_candidates: int, version, results: List, facets, projection=None
+    ) -> None:
+        key = self.make_key(query, filters, top_k, projection) + ("facets", facet_candidates)
+        with self._lock:
+            self._entries[key] = (version, ([copy.copy(result) for result in results], copy.deepcopy(facets)))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self) -> None:
+        """Drop all entries and force the next lookup to re-read the catalog version."""
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                size=len(self._entries),
+                max_size=self.max_size
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -23,18 +23,31 @@ Example queries:
     - "blue jeans"
     - "black leather bag"
     - "running shoes"
+
+Start-up:
+    The encoder (QUERY_ENCODER, loaded from the local MODEL_PATH snapshot) is imported,
+    loaded and warmed up on a background thread while the database pool connects.
+    Set MODEL_PRELOAD=0 to load it in the foreground instead. A start-up timing
+    report is printed before the first prompt.
 """
 
+import time
+_STARTED_AT = time.perf_counter()
+
+import os
 from dotenv import load_dotenv
 load_dotenv(".env.local")
 
-from sentence_transformers import SentenceTransformer
-from pgvector.psycopg2 import register_vector
-from utils import db_connection
+from utils import db_connection, get_pool
 from product_search_engine import ProductSearchEngine, SearchResult, SearchFilters
+from query_cache import embedding_cache_from_env
+from slow_query_log import slow_query_log_from_env
+from startup import StartupTimer, preload_encoder
 from typing import List, Optional
 import psycopg2
 
+_IMPORTED_AT = time.perf_counter()
+
 def format_results(results: List[SearchResult]) -> str:
     if not results:
         return "No results found. Try a different search query."
@@ -108,6 +121,9 @@ def get_filters() -> Optional[SearchFilters]:
 
 def main():
     print("🔍 Initializing Product Search Engine...")
+    timer = StartupTimer(started_at=_STARTED_AT)
+    timer.record("imports", _IMPORTED_AT - _STARTED_AT)
+    preloader = preload_encoder(timer=timer, background=os.getenv("MODEL_PRELOAD", "1") != "0")
     print("\nWelcome! Type 'exit' or 'quit' to stop.")
     print("\nExample queries you can try:")
     print("  • red dress for summer")
@@ -116,12 +132,18 @@ def main():
     print("  • blue jeans")
     print("  • black leather bag")
 
-    model = SentenceTransformer("all-MiniLM-L6-v2")
+    embedding_cache = embedding_cache_from_env()
 
     try:
+        with timer.stage("db connect"):
+            get_pool()
         with db_connection() as conn:
-            register_vector(conn)
-            search_engine = ProductSearchEngine(conn, model)
+            model = preloader.get()
+            print(timer.report())
+            search_engine = ProductSearchEngine(
+                conn, model, adaptive_filtering=True, embedding_cache=embedding_cache,
+                slow_query_log=slow_query_log_from_env()
+            )
             
             while True:
                 query = input("\nEnter search query: ")
@@ -148,7 +170,8 @@ def main():
                         print(f"  • Max price: ₹{filters.max_price}")
                 print(f"{'='*60}")
                 
-                results = search_engine.search(processed_query, top_k=3, filters=filters)
+                # format_results shows 100 characters; one more tells it to add "..."
+                results = search_engine.search(processed_query, top_k=3, filters=filters, description_chars=101)
                 print(format_results(results))
     except psycopg2.OperationalError as e:
         print(f"❌ Database connection failed: {e}")
@@ -156,6 +179,9 @@ def main():
         print("  docker-compose up -d")
     except Exception as e:
         print(f"❌ An error occurred: {e}")
+    finally:
+        if embedding_cache.persist_path:
+            embedding_cache.save()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
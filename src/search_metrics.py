@@ -0,0 +1,172 @@
+"""
+Aggregated search metrics for ProductSearchEngine(metrics=SearchMetrics()).
+
+The engine hands every call's SearchStats to record(); SearchMetrics keeps
+fixed-bucket histograms of the stage durations and end-to-end latency plus
+counters for requests (by filter combination and strategy), rows returned,
+cache hits and errors. Read them back with snapshot() or export them in the
+Prometheus text exposition format with to_prometheus(). Prepared statement hits
+and prepares are counted when the engine runs with prepare_statements=True.
+"""
+
+import bisect
+import threading
+from collections import Counter
+from typing import Dict, Optional, Sequence
+
+# Seconds; roughly exponential from 1 ms to 5 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+STAGES = ("encode", "build", "execute", "hydrate")
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """(upper bound, cumulative count) pairs as exported to Prometheus; the last bound is +Inf."""
+        running, pairs = 0, []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            pairs.append((bound, running))
+        return pairs
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by linear interpolation inside its bucket (like histogram_quantile)."""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        lower, previous = 0.0, 0
+        for bound, running in self.cumulative():
+            if running >= rank:
+                if bound == float("inf"):
+                    return self.buckets[-1]
+                in_bucket = running - previous
+                return lower + (bound - lower) * ((rank - previous) / in_bucket if in_bucket else 0.0)
+            lower, previous = bound, running
+        return self.buckets[-1]
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class SearchMetrics:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stage_seconds: Dict[str, Histogram] = {stage: Histogram(self.buckets) for stage in STAGES}
+            self.request_seconds = Histogram(self.buckets)
+            self.requests = Counter()  # (filters, strategy) -> calls
+            self.queries = 0
+            self.rows_returned = 0
+            self.embedding_cache_hits = 0
+            self.result_cache_hits = 0
+            self.prepare_hits = 0
+            self.prepares = 0
+            self.errors = Counter()  # exception type -> calls
+
+    def record(self, stats) -> None:
+        """Fold one SearchStats into the aggregates."""
+        with self._lock:
+            for stage, seconds in stats.stages.items():
+                if stage not in self.stage_seconds:
+                    self.stage_seconds[stage] = Histogram(self.buckets)
+                self.stage_seconds[stage].observe(seconds)
+            self.request_seconds.observe(stats.total_seconds)
+            self.requests[(stats.filters, stats.strategy or "none")] += 1
+            self.queries += stats.queries
+            self.rows_returned += stats.rows
+            self.embedding_cache_hits += stats.embedding_cache_hits
+            self.result_cache_hits += stats.result_cache_hits
+            self.prepare_hits += stats.prepare_hits
+            self.prepares += stats.prepares
+            if stats.error:
+                self.errors[stats.error] += 1
+
+    def snapshot(self) -> dict:
+        """Histogram aggregates and counters as plain data."""
+        with self._lock:
+            return {
+                "requests": self.request_seconds.count,
+                "queries": self.queries,
+                "request_seconds": self.request_seconds.as_dict(),
+                "stage_seconds": {stage: h.as_dict() for stage, h in self.stage_seconds.items()},
+                "requests_by_filters": {
+                    f"{filters}/{strategy}": count for (filters, strategy), count in sorted(self.requests.items())
+                },
+                "rows_returned": self.rows_returned,
+                "embedding_cache_hits": self.embedding_cache_hits,
+                "result_cache_hits": self.result_cache_hits,
+                "prepare_hits": self.prepare_hits,
+                "prepares": self.prepares,
+                "errors": dict(self.errors),
+            }
+
+    def to_prometheus(self, prefix: str = "product_search") -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            lines = [
+                f"# HELP {prefix}_stage_seconds Time spent in each search stage.",
+                f"# TYPE {prefix}_stage_seconds histogram",
+            ]
+            for stage, histogram in self.stage_seconds.items():
+                lines += _histogram_lines(f"{prefix}_stage_seconds", histogram, f'stage="{stage}"')
+            lines += [
+                f"# HELP {prefix}_request_seconds End-to-end search latency.",
+                f"# TYPE {prefix}_request_seconds histogram",
+            ]
+            lines += _histogram_lines(f"{prefix}_request_seconds", self.request_seconds, "")
+
+            lines += [f"# HELP {prefix}_requests_total Search calls by filter combination and strategy.",
+                      f"# TYPE {prefix}_requests_total counter"]
+            for (filters, strategy), count in sorted(self.requests.items()):
+                lines.append(f'{prefix}_requests_total{{filters="{filters}",strategy="{strategy}"}} {count}')
+
+            for name, value, help_text in (
+                ("queries_total", self.queries, "Queries searched (search_many counts each query)."),
+                ("rows_returned_total", self.rows_returned, "Result rows returned."),
+                ("embedding_cache_hits_total", self.embedding_cache_hits, "Query embeddings served from cache."),
+                ("result_cache_hits_total", self.result_cache_hits, "Result lists served from cache."),
+                ("prepare_hits_total", self.prepare_hits, "Queries executed from an already prepared statement."),
+                ("prepares_total", self.prepares, "Statements prepared (first use of a query shape on a connection)."),
+            ):
+                lines += [f"# HELP {prefix}_{name} {help_text}", f"# TYPE {prefix}_{name} counter",
+                          f"{prefix}_{name} {value}"]
+
+            lines += [f"# HELP {prefix}_errors_total Failed search calls by exception type.",
+                      f"# TYPE {prefix}_errors_total counter"]
+            for error, count in sorted(self.errors.items()):
+                lines.append(f'{prefix}_errors_total{{error="{error}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(name: str, histogram: Histogram, labels: str) -> list:
+    separator = "," if labels else ""
+    lines = []
+    for bound, running in histogram.cumulative():
+        le = "+Inf" if bound == float("inf") else repr(bound)
+        lines.append(f'{name}_bucket{{{labels}{separator}le="{le}"}} {running}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {histogram.sum}")
+    lines.append(f"{name}_count{suffix} {histogram.count}")
+    return lines
@@ -0,0 +1,173 @@
+"""
+Multi-process, resumable embedding for embed_batch_to_pgvector.py --workers N.
+
+The product_id space of the rows needing (re-)embedding is split into shards of
+roughly equal size. A pool of worker processes (spawned, each with its own model
+copy and torch thread budget) embeds one shard at a time and commits the shard's
+embeddings together with its checkpoint row in embedding_checkpoints. A rerun
+with the same run_id only processes shards without a completed_at, so a crash
+near the end no longer throws away the finished work.
+"""
+
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import List, Optional
+
+from embed_batch_to_pgvector import STALE_ROWS_SELECT, write_embeddings
+from utils import db_connection
+
+# Per-process state populated by _init_worker
+_worker_model = None
+_worker_model_id = None
+
+
+@dataclass
+class Shard:
+    shard_id: int
+    lo: int  # inclusive
+    hi: int  # exclusive
+
+
+@dataclass
+class ShardResult:
+    shard_id: int
+    worker: str
+    rows: int
+    seconds: float
+
+
+def shard_boundaries(sorted_ids: List[int], num_shards: int) -> List[Shard]:
+    """
+    Split sorted product ids into at most num_shards contiguous [lo, hi) ranges
+    with roughly equal row counts.
+    """
+    if not sorted_ids:
+        return []
+    num_shards = max(1, min(num_shards, len(sorted_ids)))
+    starts = sorted({sorted_ids[(i * len(sorted_ids)) // num_shards] for i in range(num_shards)})
+    ends = starts[1:] + [sorted_ids[-1] + 1]
+    return [Shard(shard_id=i, lo=lo, hi=hi) for i, (lo, hi) in enumerate(zip(starts, ends))]
+
+
+def plan_shards(conn, run_id: str, model_id: str, num_shards: int) -> List[Shard]:
+    """
+    Load the shard plan for run_id, creating it from the current stale rows if this
+    is a new run. Returns only the shards that still need work.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM embedding_checkpoints WHERE run_id = %s", (run_id,))
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f"SELECT product_id FROM ({STALE_ROWS_SELECT}) stale ORDER BY product_id", (model_id,))
+            shards = shard_boundaries([row[0] for row in cursor.fetchall()], num_shards)
+            for shard in shards:
+                cursor.execute(
+                    "INSERT INTO embedding_checkpoints (run_id, shard_id, lo, hi) VALUES (%s, %s, %s, %s)",
+                    (run_id, shard.shard_id, shard.lo, shard.hi)
+                )
+        cursor.execute("""
+            SELECT shard_id, lo, hi FROM embedding_checkpoints
+            WHERE run_id = %s AND completed_at IS NULL
+            ORDER BY shard_id
+        """, (run_id,))
+        pending = [Shard(*row) for row in cursor.fetchall()]
+    conn.commit()
+    return pending
+
+
+def _init_worker(model_path: str, model_id: str, torch_threads: int) -> None:
+    global _worker_model, _worker_model_id
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(torch_threads)
+    _worker_model = SentenceTransformer(model_path)
+    _worker_model_id = model_id
+
+
+def _embed_shard(args) -> ShardResult:
+    run_id, shard = args
+    start = time.perf_counter()
+    worker = f"pid-{os.getpid()}"
+
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"{STALE_ROWS_SELECT} AND p.product_id >= %s AND p.product_id < %s",
+                (_worker_model_id, shard.lo, shard.hi)
+            )
+            rows = cursor.fetchall()
+            if rows:
+                product_ids = [row[0] for row in rows]
+                descriptions = [row[1] for row in rows]
+                embeddings = _worker_model.encode(descriptions, batch_size=64)
+                write_embeddings(cursor, product_ids, descriptions, embeddings, _worker_model_id)
+            # Checkpoint commits atomically with the shard's embeddings
+            cursor.execute("""
+                UPDATE embedding_checkpoints
+                SET rows_embedded = %s, worker = %s, completed_at = now()
+                WHERE run_id = %s AND shard_id = %s
+            """, (len(rows), worker, run_id, shard.shard_id))
+        conn.commit()
+
+    return ShardResult(shard.shard_id, worker, len(rows), time.perf_counter() - start)
+
+
+def embed_sharded(
+    model_path: str,
+    model_id: str,
+    workers: int,
+    run_id: str,
+    shards_per_worker: int = 4,
+    torch_threads: Optional[int] = None
+) -> List[ShardResult]:
+    """
+    Embed all stale rows across `workers` processes. Several shards per worker keep
+    the pool busy when shards finish unevenly.
+
+    Args:
+        model_path (str): SentenceTransformer path loaded by every worker.
+        model_id (str): Identifier stored with each embedding.
+        workers (int): Number of worker processes.
+        run_id (str): Checkpoint key; rerun with the same id to resume.
+        shards_per_worker (int): Shards planned per worker for a new run.
+        torch_threads (Optional[int]): Torch intra-op threads per worker (default: cores / workers).
+
+    Returns:
+        List[ShardResult]: One entry per shard processed in this invocation.
+    """
+    torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+    with db_connection() as conn:
+        pending = plan_shards(conn, run_id, model_id, workers * shards_per_worker)
+    if not pending:
+        print(f"✅ Run {run_id}: no pending shards")
+        return []
+    print(f"🧩 Run {run_id}: {len(pending)} pending shards across {workers} workers ({torch_threads} torch threads each)")
+
+    # spawn (not fork) so children never inherit the parent's pooled sockets
+    context = multiprocessing.get_context("spawn")
+    results = []
+    with context.Pool(workers, initializer=_init_worker, initargs=(model_path, model_id, torch_threads)) as pool:
+        for result in pool.imap_unordered(_embed_shard, [(run_id, shard) for shard in pending]):
+            results.append(result)
+            print(f"⏳ Shard {result.shard_id} done by {result.worker}: {result.rows} rows in {result.seconds:.1f}s "
+                  f"({len(results)}/{len(pending)})")
+    return results
+
+
+def summarize(results: List[ShardResult]) -> str:
+    """Per-worker throughput summary."""
+    by_worker = defaultdict(lambda: [0, 0, 0.0])  # shards, rows, seconds
+    for result in results:
+        stats = by_worker[result.worker]
+        stats[0] += 1
+        stats[1] += result.rows
+        stats[2] += result.seconds
+
+    lines = [f"{'worker':<14}{'shards':>8}{'rows':>10}{'rows/sec':>12}"]
+    for worker, (shards, rows, seconds) in sorted(by_worker.items()):
+        rate = rows / seconds if seconds else 0.0
+        lines.append(f"{worker:<14}{shards:>8}{rows:>10}{rate:>12,.1f}")
+    return "\n".join(lines)
@@ -0,0 +1,228 @@
+"""
+Slow-query log for the SQL generated by ProductSearchEngine.
+
+The filter combinations produce dozens of SQL shapes, and some of them can get bad
+plans (sequential scans instead of the vector index, sorts spilling to disk).
+ProductSearchEngine(slow_query_log=SlowQueryLog(...)) reports every query slower
+than the threshold; the log writes one JSON line per slow query - shape id,
+normalized SQL, a summary of the bind parameters and the duration - to a
+rotating file, and for a sample of them re-runs the query under
+EXPLAIN (ANALYZE, BUFFERS) and stores the plan alongside.
+
+Usage:
+    SLOW_QUERY_MS=100 streamlit run src/ui/streamlit_app.py
+    python src/slow_query_log.py report --top 10
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import random
+import time
+from collections import defaultdict
+from typing import List, Optional
+
+import numpy as np
+
+DEFAULT_LOG_PATH = "logs/slow_queries.jsonl"
+
+# Plan fragments worth flagging in the report
+PLAN_FLAGS = {
+    "seq_scan": "Seq Scan",
+    "disk_sort": "Disk:",
+    "external_sort": "external merge",
+}
+
+
+def slow_query_log_from_env() -> Optional["SlowQueryLog"]:
+    """
+    Build a SlowQueryLog from environment variables, or None when SLOW_QUERY_MS is unset:
+        SLOW_QUERY_MS (threshold), SLOW_QUERY_EXPLAIN_RATE (default 0.1),
+        SLOW_QUERY_LOG_PATH (default logs/slow_queries.jsonl).
+    """
+    threshold = os.getenv("SLOW_QUERY_MS")
+    if not threshold:
+        return None
+    return SlowQueryLog(
+        threshold_ms=float(threshold),
+        explain_sample_rate=float(os.getenv("SLOW_QUERY_EXPLAIN_RATE", 0.1)),
+        path=os.getenv("SLOW_QUERY_LOG_PATH", DEFAULT_LOG_PATH)
+    )
+
+
+def normalize_sql(query: str) -> str:
+    """Collapse whitespace; placeholders are already %s, so this is the query's shape."""
+    return " ".join(query.split())
+
+
+def shape_id(query: str) -> str:
+    return hashlib.md5(normalize_sql(query).encode("utf-8")).hexdigest()[:12]
+
+
+def summarize_param(value) -> str:
+    """Short description of one bind parameter; vectors are reduced to their dimension."""
+    if isinstance(value, (list, tuple)) and value and hasattr(value[0], "__len__") and not isinstance(value[0], str):
+        return f"vector[{len(value)}]({len(value[0])})"
+    if isinstance(value, np.ndarray) or (isinstance(value, (list, tuple)) and len(value) > 8):
+        return f"vector({len(value)})"
+    if isinstance(value, str):
+        return repr(value if len(value) <= 40 else value[:37] + "...")
+    return repr(value)
+
+
+def plan_flags(plan: str) -> List[str]:
+    return [flag for flag, fragment in PLAN_FLAGS.items() if fragment in plan]
+
+
+class SlowQueryLog:
+    def __init__(
+        self,
+        threshold_ms: float = 200.0,
+        explain_sample_rate: float = 0.1,
+        path: str = DEFAULT_LOG_PATH,
+        max_bytes: int = 10_000_000,
+        backup_count: int = 5,
+        rng: Optional[random.Random] = None
+    ):
+        """
+        Args:
+            threshold_ms (float): Queries at least this slow are logged.
+            explain_sample_rate (float): Fraction of slow queries re-run under EXPLAIN (ANALYZE, BUFFERS).
+            path (str): JSON lines file, rotated at max_bytes with backup_count old files kept.
+            rng: Random source for the EXPLAIN sampling.
+        """
+        self.threshold_ms = threshold_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.path = path
+        self.rng = rng or random.Random()
+        self.logged = 0
+        self.explained = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._logger = logging.getLogger(f"{__name__}.{os.path.abspath(path)}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        if not self._logger.handlers:
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger.addHandler(handler)
+
+    def observe(
+        self,
+        conn,
+        query: str,
+        params: list,
+        duration_ms: float,
+        explain_query: Optional[str] = None
+    ) -> bool:
+        """
+        Called by the engine after every query. Logs the query when it is over the
+        threshold, with a sampled EXPLAIN run on `conn` in the same transaction (so
+        the same SET LOCAL index settings apply). Returns True when logged.
+
+        `explain_query` is the statement actually executed when it differs from
+        `query`, e.g. the EXECUTE of a prepared statement; it is what gets EXPLAINed,
+        so the plan is the (possibly generic) one the query ran with.
+        """
+        if duration_ms < self.threshold_ms:
+            return False
+
+        plan, explain_error = None, None
+        if self.rng.random() < self.explain_sample_rate:
+            plan, explain_error = self._explain(conn, explain_query or query, params)
+
+        entry = {
+            "ts": time.time(),
+            "shape": shape_id(query),
+            "sql": normalize_sql(query),
+            "params": [summarize_param(p) for p in params],
+            "duration_ms": round(duration_ms, 3),
+            "plan": plan,
+            "flags": plan_flags(plan) if plan else [],
+        }
+        if explain_error:
+            entry["explain_error"] = explain_error
+        self._logger.info(json.dumps(entry))
+        self.logged += 1
+        return True
+
+    def _explain(self, conn, query: str, params: list):
+        # A savepoint keeps a failing EXPLAIN (e.g. statement timeout) from aborting the caller's transaction
+        cursor = conn.cursor()
+        cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, params)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            return None, f"{type(e).__name__}: {e}"
+        cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        self.explained += 1
+        return plan, None
+
+
+def read_entries(path: str = DEFAULT_LOG_PATH) -> List[dict]:
+    """Entries from the log and its rotated backups (path.1, path.2, ...)."""
+    entries = []
+    for file_path in [path] + sorted(glob.glob(f"{glob.escape(path)}.[0-9]*")):
+        with open(file_path) as f:
+            entries.extend(json.loads(line) for line in f if line.strip())
+    return entries
+
+
+def aggregate(entries: List[dict]) -> List[dict]:
+    """Group entries by SQL shape, worst total time first."""
+    by_shape = defaultdict(list)
+    for entry in entries:
+        by_shape[entry["shape"]].append(entry)
+
+    shapes = []
+    for shape, group in by_shape.items():
+        durations = np.asarray([e["duration_ms"] for e in group])
+        plans = [e for e in group if e.get("plan")]
+        shapes.append({
+            "shape": shape,
+            "count": len(group),
+            "total_ms": float(durations.sum()),
+            "p50_ms": float(np.percentile(durations, 50)),
+            "p95_ms": float(np.percentile(durations, 95)),
+            "max_ms": float(durations.max()),
+            "flags": sorted({flag for e in group for flag in e.get("flags", [])}),
+            "sql": group[-1]["sql"],
+            "params": group[-1]["params"],
+            "latest_plan": plans[-1]["plan"] if plans else None,
+        })
+    return sorted(shapes, key=lambda s: s["total_ms"], reverse=True)
+
+
+def format_report(shapes: List[dict], top: int = 10, show_plans: bool = False) -> str:
+    lines = [f"{'shape':<14}{'count':>7}{'total ms':>11}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}  flags"]
+    for s in shapes[:top]:
+        lines.append(f"{s['shape']:<14}{s['count']:>7}{s['total_ms']:>11.0f}{s['p50_ms']:>9.1f}"
+                     f"{s['p95_ms']:>9.1f}{s['max_ms']:>9.1f}  {','.join(s['flags']) or '-'}")
+        lines.append(f"    {s['sql'][:160]}")
+        lines.append(f"    params: {', '.join(s['params'])}")
+        if show_plans and s["latest_plan"]:
+            lines.extend(f"      {line}" for line in s["latest_plan"].splitlines())
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the search slow-query log.")
+    parser.add_argument("command", choices=["report"])
+    parser.add_argument("--path", default=os.getenv("SLOW_QUERY_LOG_PATH", DEFAULT_LOG_PATH))
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--plans", action="store_true", help="Print the latest captured plan per shape.")
+    args = parser.parse_args()
+
+    entries = read_entries(args.path)
+    print(f"📊 {len(entries)} slow queries in {args.path}")
+    print(format_report(aggregate(entries), args.top, args.plans))
+
+
+if __name__ == "__main__":
+    main()
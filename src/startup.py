@@ -0,0 +1,109 @@
+"""
+Cold-start helpers for the search entry points.
+
+Heavy dependencies (torch, onnxruntime) are only imported when the encoder is built,
+and EncoderPreloader does that - import, model load from the local snapshot and a
+warm-up encode - on a background thread, so it overlaps with connecting to the
+database or rendering the first page. StartupTimer records each stage for the
+start-up report.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+from encoders import import_backend, load_encoder
+
+WARM_UP_TEXT = "warm up"
+
+
+class StartupTimer:
+    """Wall-clock durations of named start-up stages, measured from process start."""
+
+    def __init__(self, started_at: Optional[float] = None):
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self.stages: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages.append((name, seconds))
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            stages = dict(self.stages)
+        stages["total"] = self.elapsed()
+        return stages
+
+    def report(self) -> str:
+        """One line, e.g. '⏱️ Startup: imports 0.21s | db connect 0.05s | ... | total 1.92s'."""
+        parts = [f"{name} {seconds:.2f}s" for name, seconds in self.as_dict().items()]
+        return "⏱️ Startup: " + " | ".join(parts)
+
+
+def warm_up(encoder) -> None:
+    """Run one throwaway encode so the first real query doesn't pay lazy initialization."""
+    encoder.encode([WARM_UP_TEXT])
+
+
+class EncoderPreloader(threading.Thread):
+    """
+    Import, load and warm up the query encoder, in the background after start()
+    or synchronously via run(). get() waits for the encoder and re-raises any
+    loading error in the caller's thread.
+    """
+
+    def __init__(self, backend: Optional[str] = None, timer: Optional[StartupTimer] = None):
+        super().__init__(name="encoder-preload", daemon=True)
+        self.backend = backend
+        self.timer = timer or StartupTimer()
+        self.encoder = None
+        self.error = None
+        self._done = threading.Event()
+
+    def run(self):
+        try:
+            with self.timer.stage("model import"):
+                import_backend(self.backend)
+            with self.timer.stage("model load"):
+                encoder = load_encoder(self.backend)
+            with self.timer.stage("warm-up"):
+                warm_up(encoder)
+            self.encoder = encoder
+        except Exception as e:
+            self.error = e
+        finally:
+            self._done.set()
+
+    def get(self, timeout: Optional[float] = None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("Query encoder is still loading")
+        if self.error is not None:
+            raise self.error
+        return self.encoder
+
+
+def preload_encoder(
+    backend: Optional[str] = None,
+    timer: Optional[StartupTimer] = None,
+    background: bool = True
+) -> EncoderPreloader:
+    """Start loading the encoder; in the background unless background=False."""
+    preloader = EncoderPreloader(backend, timer)
+    if background:
+        preloader.start()
+    else:
+        preloader.run()
+    return preloader
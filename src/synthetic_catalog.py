@@ -0,0 +1,204 @@
+"""
+Synthetic catalog scaler for load testing at production-like sizes.
+
+Every synthetic product is derived from a randomly chosen real product of the
+shipped CSV, so the joint distribution of gender, colour, brand, price and text is
+preserved: the price is jittered, the brand is occasionally resampled from the
+brand frequencies, and the embedding is the real product's vector plus small
+Gaussian noise (re-normalized) - no encoding needed. Rows go through the same
+COPY staging/merge and binary embedding COPY as the pipeline.
+
+Synthetic product ids start at SYNTHETIC_ID_OFFSET and are generated
+deterministically, so growing from 100k to 1M only adds the missing rows.
+
+Usage (after the regular pipeline has loaded and embedded the real catalog):
+    python src/synthetic_catalog.py generate --rows 100000
+    python src/synthetic_catalog.py generate --rows 1000000
+    python src/synthetic_catalog.py delete
+"""
+
+import argparse
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from ann_index import HNSW_INDEX_NAME, ensure_ann_index
+from binary_copy import copy_embeddings
+from clean_data import clean_raw_csv
+from config import MODEL_ID
+from embed_batch_to_pgvector import content_hash
+from load_to_postgres import CSV_PATH, PRODUCT_COLUMNS, copy_chunk, create_staging_table, merge_staging
+from utils import bump_catalog_version, db_connection
+
+SYNTHETIC_ID_OFFSET = 1_000_000_000
+
+
+@dataclass
+class CatalogProfile:
+    """Real products (with their embeddings) that synthetic rows are sampled from."""
+    products: pd.DataFrame  # PRODUCT_COLUMNS, aligned with embeddings
+    embeddings: np.ndarray  # (rows, dim) float32
+    brands: np.ndarray
+    brand_weights: np.ndarray
+
+    @classmethod
+    def load(cls, conn, csv_path: str = CSV_PATH) -> "CatalogProfile":
+        products = clean_raw_csv(csv_path)[PRODUCT_COLUMNS]
+        products = products[products["description"].notna()].drop_duplicates("product_id")
+
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT product_id, embedding FROM product_embeddings WHERE product_id < %s",
+                           (SYNTHETIC_ID_OFFSET,))
+            rows = cursor.fetchall()
+        conn.rollback()
+        if not rows:
+            raise RuntimeError("No real embeddings found; run the pipeline before generating a synthetic catalog")
+
+        embedding_by_id = {product_id: embedding for product_id, embedding in rows}
+        products = products[products["product_id"].isin(embedding_by_id)].reset_index(drop=True)
+        embeddings = np.asarray([embedding_by_id[pid] for pid in products["product_id"]], dtype=np.float32)
+
+        brand_counts = products["product_brand"].value_counts()
+        return cls(
+            products=products,
+            embeddings=embeddings,
+            brands=brand_counts.index.to_numpy(),
+            brand_weights=(brand_counts / brand_counts.sum()).to_numpy(),
+        )
+
+
+def generate_chunk(
+    profile: CatalogProfile,
+    start: int,
+    count: int,
+    seed: int = 0,
+    price_jitter: float = 0.15,
+    brand_swap_rate: float = 0.2,
+    noise: float = 0.05
+):
+    """
+    Synthetic rows start .. start + count - 1 (as offsets from SYNTHETIC_ID_OFFSET).
+    The RNG is seeded from (seed, start), so a chunk is always generated identically.
+
+    Returns:
+        Tuple[pd.DataFrame, np.ndarray]: Product rows and their (normalized) embeddings.
+    """
+    rng = np.random.default_rng([seed, start])
+    sources = rng.integers(0, len(profile.products), size=count)
+
+    frame = profile.products.iloc[sources].reset_index(drop=True).copy()
+    frame["product_id"] = SYNTHETIC_ID_OFFSET + np.arange(start, start + count)
+
+    prices = frame["price_inr"].astype("float64").to_numpy()
+    jittered = np.round(prices * rng.lognormal(0.0, price_jitter, size=count))
+    frame["price_inr"] = pd.array(np.where(np.isnan(prices), np.nan, jittered), dtype="Int64")
+
+    swap = rng.random(count) < brand_swap_rate
+    frame.loc[swap, "product_brand"] = rng.choice(profile.brands, size=int(swap.sum()), p=profile.brand_weights)
+
+    vectors = profile.embeddings[sources]
+    dim = vectors.shape[1]
+    vectors = vectors + rng.normal(0.0, noise / np.sqrt(dim), size=vectors.shape).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return frame, vectors
+
+
+def synthetic_row_count(conn) -> int:
+    """Number of synthetic rows already generated (ids are contiguous from the offset)."""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(MAX(product_id) - %s + 1, 0) FROM products WHERE product_id >= %s",
+                       (SYNTHETIC_ID_OFFSET, SYNTHETIC_ID_OFFSET))
+        count = cursor.fetchone()[0]
+    conn.rollback()
+    return count
+
+
+def load_chunk(conn, frame: pd.DataFrame, vectors: np.ndarray) -> None:
+    """Products through the pipeline's staging COPY + merge, embeddings through binary COPY."""
+    with conn.cursor() as cursor:
+        create_staging_table(cursor)
+        copy_chunk(cursor, frame)
+        merge_staging(cursor)
+        hashes = [content_hash(description) for description in frame["description"]]
+        copy_embeddings(cursor, frame["product_id"].tolist(), vectors, hashes, MODEL_ID)
+    conn.commit()
+
+
+def generate(conn, rows: int, chunk_size: int = 50_000, seed: int = 0, rebuild_index: bool = True) -> int:
+    """
+    Grow the synthetic catalog to `rows` products. The ANN index is dropped first and
+    rebuilt once at the end (rebuild_index), which is far cheaper than maintaining it
+    row by row during a bulk load.
+
+    Returns:
+        int: Number of rows added.
+    """
+    existing = synthetic_row_count(conn)
+    if existing >= rows:
+        print(f"✅ Already {existing} synthetic rows")
+        return 0
+
+    profile = CatalogProfile.load(conn)
+    print(f"📐 Sampling from {len(profile.products)} real products ({len(profile.brands)} brands)")
+
+    if rebuild_index:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP INDEX IF EXISTS {HNSW_INDEX_NAME};")
+        conn.commit()
+
+    start_time = time.time()
+    for start in range(existing, rows, chunk_size):
+        count = min(chunk_size, rows - start)
+        frame, vectors = generate_chunk(profile, start, count, seed=seed)
+        load_chunk(conn, frame, vectors)
+        done = start + count - existing
+        print(f"⏳ Loaded {start + count}/{rows} synthetic rows "
+              f"({done / (time.time() - start_time):,.0f} rows/sec)...")
+
+    with conn.cursor() as cursor:
+        version = bump_catalog_version(cursor)
+    conn.commit()
+    print(f"🔖 Catalog version is now {version}")
+
+    index_method = os.getenv("ANN_INDEX_METHOD", "hnsw")
+    print(f"🧭 Ensuring {index_method} index on product_embeddings...")
+    print(f"✅ Index ready: {ensure_ann_index(conn, method=index_method)}")
+    return rows - existing
+
+
+def delete(conn) -> int:
+    """Remove every synthetic product and embedding. Returns the number of products deleted."""
+    with conn.cursor() as cursor:
+        cursor.execute("DELETE FROM product_embeddings WHERE product_id >= %s", (SYNTHETIC_ID_OFFSET,))
+        cursor.execute("DELETE FROM products WHERE product_id >= %s", (SYNTHETIC_ID_OFFSET,))
+        deleted = cursor.rowcount
+        bump_catalog_version(cursor)
+    conn.commit()
+    return deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate or remove a synthetic product catalog.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    generate_parser = subparsers.add_parser("generate", help="Grow the synthetic catalog to --rows products.")
+    generate_parser.add_argument("--rows", type=int, required=True, help="Target synthetic row count, e.g. 100000.")
+    generate_parser.add_argument("--chunk-size", type=int, default=50_000)
+    generate_parser.add_argument("--seed", type=int, default=0)
+    generate_parser.add_argument("--keep-index", action="store_true",
+                                 help="Keep the HNSW index during the load instead of rebuilding it afterwards.")
+    subparsers.add_parser("delete", help="Remove all synthetic rows.")
+    args = parser.parse_args()
+
+    with db_connection() as conn:
+        if args.command == "generate":
+            added = generate(conn, args.rows, args.chunk_size, args.seed, rebuild_index=not args.keep_index)
+            print(f"✅ Added {added} synthetic products")
+        else:
+            print(f"🧹 Deleted {delete(conn)} synthetic products")
+
+
+if __name__ == "__main__":
+    main()
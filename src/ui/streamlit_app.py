@@ -17,45 +17,136 @@ Usage:
 """
 import sys
 import os
+import atexit
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 
 from dotenv import load_dotenv
 load_dotenv(".env.local")
 
 import streamlit as st
-from sentence_transformers import SentenceTransformer
-from pgvector.psycopg2 import register_vector
-import psycopg2
+from utils import db_connection
 from product_search_engine import ProductSearchEngine
 from product_search_engine import SearchFilters
-from config import MODEL_PATH
+from query_cache import embedding_cache_from_env, SearchResultCache
+from search_metrics import SearchMetrics
+from slow_query_log import slow_query_log_from_env
+from startup import StartupTimer, preload_encoder
 
 
+@st.cache_resource
+def start_model_preload():
+    """
+    Start loading the query encoder (backend chosen by QUERY_ENCODER) in the background
+    on the first page run, so the page renders while torch/onnxruntime load.
+    """
+    return preload_encoder(timer=StartupTimer())
+
 @st.cache_resource
 def load_model():
-    """Load and cache the embedding model."""
-    return SentenceTransformer(MODEL_PATH)
+    """Wait for the preloaded encoder and log the start-up report once."""
+    preloader = start_model_preload()
+    try:
+        model = preloader.get()
+    except Exception:
+        # Drop the failed preload so the next page run starts a fresh one
+        start_model_preload.clear()
+        raise
+    print(preloader.timer.report())
+    return model
+
+@st.cache_resource
+def load_embedding_cache():
+    """Query embedding cache shared by all sessions."""
+    cache = embedding_cache_from_env()
+    if cache.persist_path:
+        atexit.register(cache.save)
+    return cache
+
+@st.cache_resource
+def load_metrics():
+    """Search metrics aggregated across all sessions."""
+    return SearchMetrics()
 
 @st.cache_resource
-def get_db_connection():
-    conn_kwargs = dict(
-        dbname=os.getenv("DB_NAME"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
-        host=os.getenv("DB_HOST"),
-        port=int(os.getenv("DB_PORT", 5432))
+def load_engine_template():
+    """
+    Model-less engine holding everything shared by all sessions (caches, filter
+    statistics, prepared-statement tracking), so the sidebar can use it before the
+    encoder preload finishes.
+    """
+    return ProductSearchEngine(
+        None,
+        None,
+        adaptive_filtering=True,
+        embedding_cache=load_embedding_cache(),
+        result_cache=SearchResultCache(),
+        metrics=load_metrics(),
+        slow_query_log=slow_query_log_from_env(),
+        prepare_statements=os.getenv("PREPARE_STATEMENTS", "0") == "1",
+        plan_cache_mode=os.getenv("PLAN_CACHE_MODE") or None
     )
-    if sslmode := os.getenv("DB_SSLMODE"):
-        conn_kwargs["sslmode"] = sslmode
-    conn = psycopg2.connect(**conn_kwargs)
-    register_vector(conn)
-    return conn
 
 @st.cache_resource
 def load_search_engine():
-    model = load_model()
-    conn = get_db_connection()
-    return ProductSearchEngine(conn, model)
+    """
+    The shared template with the query encoder attached. Each search binds it to a
+    connection borrowed from the pool via using().
+    """
+    engine = load_engine_template().using(None)
+    engine.model = load_model()
+    return engine
+
+@st.cache_resource
+def load_facet_vocabularies():
+    """
+    Catalog-wide filter values for the sidebar, loaded once at startup. The filter
+    statistics they come from are shared with load_search_engine(), so this also warms
+    the adaptive-filtering planner.
+    """
+    with db_connection() as conn:
+        return load_engine_template().using(conn).facet_vocabularies()
+
+def format_price_bucket(low, high):
+    if low is None:
+        return f"< ₹{high}"
+    if high is None:
+        return f"₹{low}+"
+    return f"₹{low}–{high - 1}"
+
+
+def render_facets(facets):
+    """Value counts over the closest matches, so refinements that return nothing are visible."""
+    st.markdown(f"**Refine** (counts over the {facets.candidates} closest matches)")
+    cols = st.columns(4)
+    for col, (title, counts) in zip(cols, [("Brand", facets.brand), ("Color", facets.color), ("Gender", facets.gender)]):
+        col.caption(title)
+        col.markdown("\n".join(f"- {value} ({count})" for value, count in list(counts.items())[:8]))
+    cols[3].caption("Price")
+    cols[3].markdown("\n".join(
+        f"- {format_price_bucket(low, high)} ({count})" for low, high, count in facets.price
+    ))
+
+
+def render_debug_panel(stats):
+    """Stage timings of the last search and the aggregated metrics."""
+    with st.expander("🐞 Debug: search timings"):
+        if stats is not None:
+            st.markdown(
+                f"**Last search**: {stats.total_seconds * 1000:.1f} ms, {stats.rows} rows, "
+                f"strategy `{stats.strategy}`, filters `{stats.filters}`, "
+                f"embedding cache hits {stats.embedding_cache_hits}, result cache hits {stats.result_cache_hits}, "
+                f"prepared statement hits {stats.prepare_hits}"
+            )
+            st.table({stage: [f"{seconds * 1000:.2f} ms"] for stage, seconds in stats.stages.items()})
+        snapshot = load_metrics().snapshot()
+        st.markdown(f"**All sessions**: {snapshot['requests']} searches")
+        st.table({
+            stage: [f"{h['p50'] * 1000:.1f}", f"{h['p95'] * 1000:.1f}", f"{h['p99'] * 1000:.1f}"]
+            for stage, h in {**snapshot["stage_seconds"], "total": snapshot["request_seconds"]}.items()
+            if h["count"]
+        })
+        st.caption("p50 / p95 / p99 in ms (bucket estimates)")
+        st.code(load_metrics().to_prometheus(), language="text")
 
 
 def main():
@@ -65,19 +156,25 @@ def main():
         layout="wide"
     )
 
+    start_model_preload()
+
+    # Filter options come from the catalog instead of hard-coded lists
+    vocabularies = load_facet_vocabularies()
+    price_ceiling = int(vocabularies["price_range"][1]) if vocabularies["price_range"] else 10000
+
     with st.sidebar:
         st.header("Filters")
-        price_range = st.slider("Price range (INR)", 0, 10000, (0, 10000))
-        gender = st.selectbox("Gender", ["All", "Men", "Women", "Boys", "Girls", "Unisex"])
-        color = st.selectbox("Color", ["All", "Black", "White", "Red", "Blue", "Green", "Yellow", "Pink", "Grey", "Brown", "Navy Blue"])
-
-    search_engine = load_search_engine()
+        price_range = st.slider("Price range (INR)", 0, price_ceiling, (0, price_ceiling))
+        gender = st.selectbox("Gender", ["All"] + vocabularies["gender"])
+        color = st.selectbox("Color", ["All"] + vocabularies["color"])
+        brand = st.selectbox("Brand", ["All"] + vocabularies["brand"])
 
     # Build filters from sidebar widgets
     filters = SearchFilters(
         min_price=price_range[0] if price_range[0] > 0 else None,
-        max_price=price_range[1] if price_range[1] < 10000 else None,
+        max_price=price_range[1] if price_range[1] < price_ceiling else None,
         gender=gender if gender != "All" else None,
+        brand=brand if brand != "All" else None,
         color=color if color != "All" else None
     )
     
@@ -95,7 +192,13 @@ def main():
     if st.button("🔍 Search", type="primary"):
         if query.strip():
             with st.spinner("Searching..."):
-                results = search_engine.search(query, filters=filters)
+                search_engine = load_search_engine()
+                with db_connection() as conn:
+                    bound_engine = search_engine.using(conn)
+                    # Results and facet counts in one round trip (or none, from the result cache)
+                    faceted = bound_engine.search_with_facets(query, filters=filters)
+                    results, facets = faceted.results, faceted.facets
+                    stats = bound_engine.last_stats
             if results:
                 for r in results:
                     with st.container(border=True):
@@ -107,8 +210,10 @@ def main():
                         cols[3].metric("Similarity", f"{r.similarity_score:.2%}")
                         if r.description:
                             st.caption(r.description)
+                render_facets(facets)
             else:
                 st.info("No results found.")
+            render_debug_panel(stats)
         else:
             st.warning("Please enter a search query")
 
@@ -1,24 +1,232 @@
 import os
+import threading
+import time
 import psycopg2
+import psycopg2.pool
+from psycopg2 import extensions
+from typing import Optional
 from contextlib import contextmanager
 from dotenv import load_dotenv
+from pgvector.psycopg2 import register_vector
 
 # Load env variables
 load_dotenv(dotenv_path=".env")
 
-@contextmanager
-def db_connection():
+
+def connection_kwargs() -> dict:
+    """psycopg2.connect keyword arguments built from the DB_* environment variables."""
     conn_kwargs = dict(
         dbname=os.getenv("DB_NAME"),
         user=os.getenv("DB_USER"),
         password=os.getenv("DB_PASSWORD"),
         host=os.getenv("DB_HOST"),
-        port=int(os.getenv("DB_PORT"))
+        port=int(os.getenv("DB_PORT", 5432))
     )
     if sslmode := os.getenv("DB_SSLMODE"):
         conn_kwargs["sslmode"] = sslmode
-    conn = psycopg2.connect(**conn_kwargs)
-    try:
+    return conn_kwargs
+
+
+class PoolTimeout(psycopg2.pool.PoolError):
+    """Raised when no pooled connection became available within acquire_timeout."""
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        min_size: int = 1,
+        max_size: int = 10,
+        statement_timeout_ms: Optional[int] = None,
+        health_check_interval: float = 30.0,
+        acquire_timeout: float = 30.0,
+        **conn_kwargs
+    ):
+        """
+        Thread-safe pool of psycopg2 connections.
+
+        Args:
+            min_size (int): Connections opened up front.
+            max_size (int): Maximum physical connections; borrowers block (up to acquire_timeout) beyond it.
+            statement_timeout_ms (Optional[int]): Server-side statement_timeout set on every connection. None = no limit.
+            health_check_interval (float): Connections idle longer than this are pinged before being handed out.
+            acquire_timeout (float): Seconds to wait for a free connection before raising PoolTimeout.
+            **conn_kwargs: Passed to psycopg2.connect.
+        """
+        if statement_timeout_ms:
+            conn_kwargs["options"] = f"-c statement_timeout={int(statement_timeout_ms)}"
+        self.conn_kwargs = conn_kwargs
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle = []  # (connection, last_used) pairs, most recently used last
+        self._vector_registered = set()  # id() of connections with pgvector registered
+        self.created = 0
+        self.discarded = 0
+
+        for _ in range(min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; it is rolled back to a clean state and returned on exit."""
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise PoolTimeout(f"No database connection available after {self.acquire_timeout}s")
+        try:
+            conn = self._checkout()
+            try:
+                yield conn
+            finally:
+                self._checkin(conn)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            conn.close()
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.conn_kwargs)
+        self.created += 1
+        return conn
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                conn = self._connect()
+                break
+            conn, last_used = entry
+            if self._is_healthy(conn, last_used):
+                break
+            self._discard(conn)
+
+        self._ensure_vector_registered(conn)
+        return conn
+
+    def _checkin(self, conn) -> None:
+        if not conn.closed:
+            status = conn.info.transaction_status
+            try:
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    # Server connection lost
+                    conn.close()
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                conn.close()
+        if conn.closed:
+            self._discard(conn)
+            return
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+
+    def _is_healthy(self, conn, last_used: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn) -> None:
+        self._vector_registered.discard(id(conn))
+        self.discarded += 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _ensure_vector_registered(self, conn) -> None:
+        """Register pgvector once per physical connection (skipped until the extension exists)."""
+        if id(conn) in self._vector_registered:
+            return
+        try:
+            register_vector(conn)
+            self._vector_registered.add(id(conn))
+        except psycopg2.ProgrammingError:
+            # vector extension not created yet (e.g. during init_db.py); retry on a later borrow
+            pass
+        conn.rollback()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Process-wide connection pool, created on first use from the environment:
+        DB_POOL_MIN_SIZE (default 1), DB_POOL_MAX_SIZE (default 10),
+        DB_STATEMENT_TIMEOUT_MS (default: no timeout).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            timeout = os.getenv("DB_STATEMENT_TIMEOUT_MS")
+            _pool = ConnectionPool(
+                min_size=int(os.getenv("DB_POOL_MIN_SIZE", 1)),
+                max_size=int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+                statement_timeout_ms=int(timeout) if timeout else None,
+                **connection_kwargs()
+            )
+        return _pool
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+@contextmanager
+def db_connection():
+    """Borrow a pooled connection (pgvector registered, rolled back and returned on exit)."""
+    with get_pool().connection() as conn:
         yield conn
-    finally:
-        conn.close()
+
+
+def wait_for_database(timeout: float = 60.0, interval: float = 1.0) -> float:
+    """
+    Block until the database accepts connections and answers a query.
+
+    Returns:
+        float: Seconds spent waiting.
+
+    Raises:
+        psycopg2.OperationalError: If the database is still unreachable after `timeout` seconds.
+    """
+    start = time.monotonic()
+    while True:
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            return time.monotonic() - start
+        except psycopg2.OperationalError:
+            if time.monotonic() - start + interval > timeout:
+                raise
+            time.sleep(interval)
+
+
+def bump_catalog_version(cursor) -> int:
+    """
+    Increment the catalog/embedding version so cached search results are invalidated.
+    Call it in the same transaction as the write it describes.
+    """
+    cursor.execute("""
+        UPDATE catalog_version SET version = version + 1, updated_at = now()
+        RETURNING version;
+    """)
+    return cursor.fetchone()[0]
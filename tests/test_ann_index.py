@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.append(os.path.abspath("src"))
+from unittest.mock import MagicMock
+import pytest
+from ann_index import (
+    ivfflat_lists_for_rows, ivfflat_probes_for_lists, ensure_quantized_index,
+    HNSW_INDEX_NAME, IVFFLAT_INDEX_NAME
+)
+
+def test_ivfflat_lists_scale_with_rows():
+    assert ivfflat_lists_for_rows(0) == 1
+    assert ivfflat_lists_for_rows(12_000) == 12
+    assert ivfflat_lists_for_rows(1_000_000) == 1000
+    assert ivfflat_lists_for_rows(4_000_000) == 2000
+
+def test_ivfflat_probes_default_to_sqrt_lists():
+    assert ivfflat_probes_for_lists(1) == 1
+    assert ivfflat_probes_for_lists(100) == 10
+
+def test_ensure_quantized_index_creates_expression_index():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchone.return_value = (False,)
+
+    name = ensure_quantized_index(conn, quantization="binary")
+
+    statements = [c[0][0] for c in cursor.execute.call_args_list]
+    assert name == "product_embeddings_embedding_binary_hnsw_idx"
+    assert any("(binary_quantize(embedding)::bit(384)) bit_hamming_ops" in s for s in statements)
+    conn.commit.assert_called_once()
+
+def test_ensure_quantized_index_replaces_full_precision_index():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchone.return_value = (False,)
+
+    ensure_quantized_index(conn, quantization="halfvec")
+
+    statements = [c[0][0] for c in cursor.execute.call_args_list]
+    create = next(i for i, s in enumerate(statements) if s.startswith("CREATE INDEX"))
+    assert statements.index(f"DROP INDEX IF EXISTS {HNSW_INDEX_NAME};") < create
+    assert statements.index(f"DROP INDEX IF EXISTS {IVFFLAT_INDEX_NAME};") < create
+
+def test_ensure_quantized_index_rejects_unknown_quantization():
+    with pytest.raises(ValueError):
+        ensure_quantized_index(MagicMock(), quantization="pq")
@@ -0,0 +1,79 @@
+import sys
+import os
+import asyncio
+sys.path.append(os.path.abspath("src"))
+from async_search_engine import AsyncProductSearchEngine, to_asyncpg_placeholders
+from product_search_engine import SearchFilters, SearchResult
+
+class StubEmbeddingModel:
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts: list) -> list:
+        self.calls += 1
+        return [[0.1, 0.2, 0.3]]
+
+class FakeTransaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    async def fetch(self, query, *args):
+        self.executed.append((query, args))
+        return self.rows
+
+    async def execute(self, query, *args):
+        self.executed.append((query, args))
+
+    def transaction(self):
+        return FakeTransaction()
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def acquire(self):
+        pool = self
+
+        class Acquire:
+            async def __aenter__(self):
+                return pool.conn
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return Acquire()
+
+def test_to_asyncpg_placeholders_numbers_in_order():
+    assert to_asyncpg_placeholders("a = %s AND b = %s LIMIT %s") == "a = $1 AND b = $2 LIMIT $3"
+
+def test_async_search_returns_search_results():
+    conn = FakeConnection(rows=[
+        (1, "Blue Denim Jeans", "Levi's", "Men", 2999.0, 3, "Classic straight fit denim jeans", "Blue", 0.95),
+    ])
+    engine = AsyncProductSearchEngine(FakePool(conn), StubEmbeddingModel())
+
+    results = asyncio.run(engine.search("blue jeans", top_k=3, filters=SearchFilters(gender="Men")))
+
+    assert isinstance(results[0], SearchResult)
+    assert results[0].product_name == "Blue Denim Jeans"
+    query, args = conn.executed[0]
+    assert "%s" not in query
+    assert "gender = $2" in query
+    assert "ORDER BY pe.embedding <=> $3 LIMIT $4" in query
+    assert args[1:] == ("Men", [0.1, 0.2, 0.3], 3)
+
+def test_async_search_applies_index_settings_in_transaction():
+    conn = FakeConnection(rows=[])
+    engine = AsyncProductSearchEngine(FakePool(conn), StubEmbeddingModel(), ef_search=100)
+
+    asyncio.run(engine.search("blue jeans"))
+
+    assert conn.executed[0] == ("SELECT set_config('hnsw.ef_search', $1, true)", ("100",))
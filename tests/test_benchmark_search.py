@@ -0,0 +1,45 @@
+import sys
+import os
+from unittest.mock import Mock
+sys.path.append(os.path.abspath("src"))
+from benchmark_search import summarize, compare, format_comparison, measure_stages
+from product_search_engine import ProductSearchEngine
+
+def test_summarize_reports_percentiles():
+    summary = summarize([float(i) for i in range(1, 101)])
+
+    assert summary["n"] == 100
+    assert summary["p50"] == 50.5
+    assert round(summary["p99"], 2) == 99.01
+    assert summary["max"] == 100.0
+    assert summarize([]) == {"n": 0}
+
+def _report(e2e_p95, sql_p95):
+    return {"results": [{
+        "scenario": "filters=none,top_k=5",
+        "end_to_end_ms": {"p95": e2e_p95},
+        "stages": {"sql_ms": {"p95": sql_p95}},
+    }]}
+
+def test_compare_flags_slowdowns_over_threshold():
+    rows = compare(_report(10.0, 4.0), _report(10.5, 6.0), metric="p95", threshold=0.10)
+
+    by_series = {row["series"]: row for row in rows}
+    assert not by_series["end_to_end_ms"]["regression"]
+    assert by_series["sql_ms"]["regression"]
+    assert by_series["sql_ms"]["change"] == 0.5
+    assert "❌" in format_comparison(rows, "p95").splitlines()[2]
+
+def test_measure_stages_times_each_stage():
+    db = Mock()
+    model = Mock()
+    model.encode.return_value = [[0.1, 0.2]]
+    db.cursor.return_value.fetchall.return_value = [
+        (1, "Red Shoes", "Nike", "Men", 2500, 5, "Stylish red shoes", "Red", 0.95)
+    ]
+
+    stages = measure_stages(ProductSearchEngine(db, model), "red shoes", 5, None)
+
+    assert set(stages) == {"encode_ms", "sql_ms", "hydrate_ms"}
+    assert all(value >= 0 for value in stages.values())
+    db.rollback.assert_called_once()
@@ -0,0 +1,69 @@
+import sys
+import os
+import struct
+import numpy as np
+sys.path.append(os.path.abspath("src"))
+from binary_copy import COPY_HEADER, encode_embeddings_copy, copy_embeddings
+
+def parse_copy(payload: bytes):
+    """Minimal binary COPY reader used to check the writer's output."""
+    assert payload.startswith(b"PGCOPY\n\xff\r\n\x00")
+    offset = len(COPY_HEADER)
+    rows = []
+    while True:
+        (field_count,) = struct.unpack_from(">h", payload, offset)
+        offset += 2
+        if field_count == -1:
+            break
+        fields = []
+        for _ in range(field_count):
+            (length,) = struct.unpack_from(">i", payload, offset)
+            offset += 4
+            fields.append(payload[offset:offset + length])
+            offset += length
+        rows.append(fields)
+    assert offset == len(payload)
+    return rows
+
+def test_encode_embeddings_copy_round_trips():
+    embeddings = np.array([[0.5, -1.25, 3.0], [1.0, 2.0, 4.0]], dtype=np.float32)
+    hashes = ["a" * 32, "b" * 32]
+
+    rows = parse_copy(encode_embeddings_copy([10017413, 7], embeddings, hashes, "model@abc"))
+
+    assert len(rows) == 2
+    product_id, vector, content_hash, model_id = rows[0]
+    assert struct.unpack(">i", product_id) == (10017413,)
+    dim, unused = struct.unpack_from(">hh", vector)
+    assert (dim, unused) == (3, 0)
+    assert struct.unpack_from(">3f", vector, 4) == (0.5, -1.25, 3.0)
+    assert content_hash == b"a" * 32
+    assert model_id == b"model@abc"
+    assert struct.unpack(">i", rows[1][0]) == (7,)
+
+class RecordingCursor:
+    def __init__(self):
+        self.executed = []
+        self.copied = []
+        self.rowcount = 2
+
+    def execute(self, sql, params=None):
+        self.executed.append(sql)
+
+    def copy_expert(self, sql, file):
+        self.copied.append((sql, file.read()))
+
+def test_copy_embeddings_stages_and_merges_once():
+    cursor = RecordingCursor()
+
+    merged = copy_embeddings(cursor, [1, 2], np.zeros((2, 4), dtype=np.float32), ["x" * 32] * 2, "m")
+
+    assert merged == 2
+    assert "FORMAT binary" in cursor.copied[0][0]
+    assert len(parse_copy(cursor.copied[0][1])) == 2
+    assert "ON CONFLICT (product_id) DO UPDATE" in cursor.executed[-1]
+
+def test_copy_embeddings_skips_empty_chunks():
+    cursor = RecordingCursor()
+    assert copy_embeddings(cursor, [], np.zeros((0, 4)), [], "m") == 0
+    assert cursor.executed == []
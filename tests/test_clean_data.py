@@ -26,3 +26,14 @@ def test_clean_data_renames_columns(tmp_path):
     cleaned_df.to_csv(cleaned_path, index=False)
 
     assert os.path.exists(cleaned_path), "Cleaned CSV was not saved"
+
+def test_iter_clean_chunks_matches_full_clean():
+    from clean_data import iter_clean_chunks
+    raw_path = "data/myntra_products_catalog.csv"
+    full_df = clean_raw_csv(raw_path)
+
+    chunks = list(iter_clean_chunks(raw_path, chunksize=5000))
+
+    assert len(chunks) == -(-len(full_df) // 5000)
+    assert list(chunks[0].columns) == list(full_df.columns)
+    assert sum(len(chunk) for chunk in chunks) == len(full_df)
@@ -0,0 +1,124 @@
+import sys
+import os
+sys.path.append(os.path.abspath("src"))
+from embed_batch_to_pgvector import content_hash, fetch_stale_rows
+from config import MODEL_ID
+
+class RecordingCursor:
+    def __init__(self, rows=None):
+        self.rows = rows or []
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return self.rows
+
+def test_content_hash_matches_postgres_md5():
+    # SELECT md5('abc') in Postgres
+    assert content_hash("abc") == "900150983cd24fb0d6963f7d28e17f72"
+    assert content_hash("Blue jeans") == content_hash("Blue jeans")
+    assert content_hash("Blue jeans") != content_hash("Blue jeans ")
+
+def test_fetch_stale_rows_compares_hash_and_model_server_side():
+    cursor = RecordingCursor(rows=[(1, "Stylish red shoes")])
+
+    rows = fetch_stale_rows(cursor, MODEL_ID)
+
+    sql, params = cursor.executed[0]
+    assert rows == [(1, "Stylish red shoes")]
+    assert "md5(p.description)" in sql
+    assert params == (MODEL_ID,)
+
+def test_model_id_tracks_snapshot():
+    assert MODEL_ID.startswith("sentence-transformers/all-MiniLM-L6-v2@c9745ed1")
+
+class FakeNamedCursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.itersize = None
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+class FakeConnection:
+    def __init__(self, rows=()):
+        self.named_cursor = FakeNamedCursor(rows)
+        self.commits = 0
+
+    def cursor(self, name=None):
+        return self.named_cursor if name else FakeNamedCursor([])
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+class StubModel:
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, batch_size=64):
+        self.batches.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+def test_embed_streaming_encodes_and_writes_in_chunks(monkeypatch):
+    import contextlib
+    import embed_batch_to_pgvector
+
+    read_conn = FakeConnection(rows=[(i, f"desc {i}") for i in range(5)])
+    write_conn = FakeConnection()
+    connections = iter([read_conn, write_conn])
+    written = []
+
+    @contextlib.contextmanager
+    def fake_db_connection():
+        yield next(connections)
+
+    monkeypatch.setattr(embed_batch_to_pgvector, "db_connection", fake_db_connection)
+    monkeypatch.setattr(
+        embed_batch_to_pgvector, "write_embeddings",
+        lambda cursor, ids, descriptions, embeddings, model_id: written.append((ids, model_id))
+    )
+    model = StubModel()
+
+    total = embed_batch_to_pgvector.embed_streaming(model, MODEL_ID, chunk_size=2)
+
+    assert total == 5
+    assert [len(batch) for batch in model.batches] == [2, 2, 1]
+    assert written == [([0, 1], MODEL_ID), ([2, 3], MODEL_ID), ([4], MODEL_ID)]
+    assert write_conn.commits == 3
+    assert read_conn.named_cursor.itersize == 2
+
+def test_embed_streaming_surfaces_writer_errors(monkeypatch):
+    import contextlib
+    import pytest
+    import embed_batch_to_pgvector
+
+    connections = iter([FakeConnection(rows=[(1, "a"), (2, "b")]), FakeConnection()])
+
+    @contextlib.contextmanager
+    def fake_db_connection():
+        yield next(connections)
+
+    def failing_write(*args):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(embed_batch_to_pgvector, "db_connection", fake_db_connection)
+    monkeypatch.setattr(embed_batch_to_pgvector, "write_embeddings", failing_write)
+
+    with pytest.raises(RuntimeError, match="disk full"):
+        embed_batch_to_pgvector.embed_streaming(StubModel(), MODEL_ID, chunk_size=1)
@@ -0,0 +1,41 @@
+import sys
+import os
+import numpy as np
+import pytest
+sys.path.append(os.path.abspath("src"))
+from encoders import mean_pool, l2_normalize, parity_report, load_encoder
+
+def test_mean_pool_ignores_padding_tokens():
+    tokens = np.array([[[1.0, 2.0], [3.0, 4.0], [100.0, 100.0]]])
+    mask = np.array([[1, 1, 0]])
+
+    np.testing.assert_allclose(mean_pool(tokens, mask), [[2.0, 3.0]])
+
+def test_l2_normalize_returns_unit_rows():
+    vectors = l2_normalize(np.array([[3.0, 4.0], [0.0, 0.0]]))
+
+    np.testing.assert_allclose(vectors[0], [0.6, 0.8])
+    np.testing.assert_allclose(vectors[1], [0.0, 0.0])
+
+class FixedEncoder:
+    def __init__(self, vectors):
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+
+    def encode(self, texts):
+        return self.vectors[:len(texts)]
+
+def test_parity_report_compares_against_reference():
+    reference = FixedEncoder([[1.0, 0.0], [0.0, 1.0]])
+    candidate = FixedEncoder([[1.0, 0.0], [0.6, 0.8]])
+
+    report = parity_report("onnx", reference, candidate, texts=["a", "b"])
+
+    assert report.backend == "onnx"
+    assert report.min_cosine == pytest.approx(0.8)
+    assert report.mean_cosine == pytest.approx(0.9)
+    assert report.max_abs_diff == pytest.approx(0.6)
+    assert report.single_query_ms >= 0
+
+def test_load_encoder_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        load_encoder("tensorrt")
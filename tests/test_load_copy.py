@@ -0,0 +1,55 @@
+import sys
+import os
+import pandas as pd
+sys.path.append(os.path.abspath("src"))
+from load_to_postgres import copy_chunk, merge_staging
+
+class RecordingCursor:
+    def __init__(self):
+        self.copied = []
+        self.executed = []
+        self.rowcount = 0
+
+    def copy_expert(self, sql, file):
+        self.copied.append((sql, file.read()))
+
+    def execute(self, sql, params=None):
+        self.executed.append(sql)
+
+def test_copy_chunk_writes_csv_with_nulls_and_integer_columns():
+    cursor = RecordingCursor()
+    chunk = pd.DataFrame({
+        "product_id": [1.0, 2.0],
+        "product_name": ["Red Shoes", 'Blue "Denim" Jeans'],
+        "product_brand": ["Nike", "Levi's"],
+        "gender": ["Men", "Women"],
+        "price_inr": [2500.0, None],
+        "num_images": [5, 3],
+        "description": ["Stylish, red", None],
+        "primary_color": ["Red", None],
+        "unused": ["x", "y"],
+    })
+
+    copied = copy_chunk(cursor, chunk)
+
+    assert copied == 2
+    sql, data = cursor.copied[0]
+    assert sql.startswith("COPY products_staging (product_id, product_name")
+    assert "FORMAT csv" in sql
+    assert data.splitlines() == [
+        '1,Red Shoes,Nike,Men,2500,5,"Stylish, red",Red',
+        '2,"Blue ""Denim"" Jeans",Levi\'s,Women,,3,,',
+    ]
+
+def test_merge_staging_is_a_single_guarded_upsert():
+    cursor = RecordingCursor()
+
+    merge_staging(cursor)
+
+    assert len(cursor.executed) == 1
+    sql = cursor.executed[0]
+    assert "FROM products_staging" in sql
+    assert "ON CONFLICT (product_id) DO UPDATE" in sql
+    assert "products.description IS DISTINCT FROM EXCLUDED.description" in sql
+    # Duplicate ids keep the last staged row
+    assert "ORDER BY product_id, staged_seq DESC" in sql
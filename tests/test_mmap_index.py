@@ -0,0 +1,194 @@
+import sys
+import os
+import glob
+import numpy as np
+sys.path.append(os.path.abspath("src"))
+import mmap_index
+from mmap_index import export, MmapVectorIndex
+from product_search_engine import ProductSearchEngine, SearchFilters, SearchProjection
+
+ROWS = [
+    (1, "Red Kurta", "Biba", "Women", 1200, 5, "A red cotton kurta", "Red", [1.0, 0.0, 0.0]),
+    (2, "Blue Jeans", "Levis", "Men", 2500, 4, "Slim fit jeans", "Blue", [0.0, 2.0, 0.0]),
+    (3, "Red Dress", "Biba", "Women", None, None, None, "Red", [0.6, 0.8, 0.0]),
+    (4, "Black Tee", "HRX", "Men", 600, 3, "Plain tee ✓", None, [0.0, 0.0, 1.0]),
+]
+
+class FakeCursor:
+    def __init__(self, rows, log=None):
+        self.rows = rows
+        self.pending = []
+        self.log = log if log is not None else []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.log.append(query)
+        if "COUNT(*)" in query:
+            self.pending = [(len(self.rows),)]
+        elif "catalog_version" in query:
+            self.pending = [(7,)]
+        else:
+            self.pending = list(self.rows)
+
+    def fetchone(self):
+        return self.pending.pop(0)
+
+    def fetchmany(self, size):
+        chunk, self.pending = self.pending[:size], self.pending[size:]
+        return chunk
+
+class FakeConnection:
+    def __init__(self):
+        self.log = []
+
+    def cursor(self, name=None):
+        return FakeCursor(ROWS, self.log)
+
+    def rollback(self):
+        self.log.append("ROLLBACK")
+
+def build_index(tmp_path):
+    directory = str(tmp_path / "index")
+    manifest = export(FakeConnection(), directory, chunk_size=3)
+    return manifest, MmapVectorIndex.open(directory)
+
+def test_export_writes_manifest_and_round_trips_rows(tmp_path):
+    manifest, index = build_index(tmp_path)
+
+    assert manifest["rows"] == 4
+    assert manifest["dim"] == 3
+    assert index.catalog_version == 7
+    assert os.path.islink(str(tmp_path / "index"))
+
+    results = index.search([0.0, 0.0, 1.0], top_k=1)
+    assert results[0].product_id == 4
+    assert results[0].description == "Plain tee ✓"
+    assert results[0].primary_color is None
+    assert abs(results[0].similarity_score - 1.0) < 1e-6
+
+def test_reexport_swaps_the_symlink_and_keeps_one_previous_version(tmp_path):
+    directory = str(tmp_path / "index")
+    versions = []
+    for _ in range(3):
+        export(FakeConnection(), directory, chunk_size=3)
+        versions.append(os.path.realpath(directory))
+    index = MmapVectorIndex.open(directory)
+
+    assert len(set(versions)) == 3
+    assert index.directory == versions[-1]
+    assert sorted(glob.glob(directory + ".v*")) == sorted(versions[1:])
+    assert not os.path.lexists(directory + ".link.tmp")
+
+def test_export_reads_count_version_and_rows_in_one_snapshot(tmp_path):
+    conn = FakeConnection()
+
+    export(conn, str(tmp_path / "index"), chunk_size=3)
+
+    assert conn.log[:2] == ["ROLLBACK", "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY"]
+    # No rollback between the count and the streamed rows
+    assert conn.log[2:].index("ROLLBACK") == len(conn.log[2:]) - 1
+
+def test_search_ranks_by_cosine_similarity(tmp_path):
+    _, index = build_index(tmp_path)
+
+    results = index.search([1.0, 1.0, 0.0], top_k=3)
+
+    # Stored vectors are normalized, so the un-normalized [0, 2, 0] scores like [0, 1, 0]
+    assert [r.product_id for r in results] == [3, 1, 2]
+    assert abs(results[0].similarity_score - 1.4 / np.sqrt(2)) < 1e-6
+    assert abs(results[1].similarity_score - results[2].similarity_score) < 1e-6
+
+def test_filters_mirror_sql_semantics(tmp_path):
+    _, index = build_index(tmp_path)
+
+    women = index.search([1.0, 1.0, 1.0], top_k=5, filters={"gender": "Women", "brand": None})
+    assert sorted(r.product_id for r in women) == [1, 3]
+
+    # NULL prices never satisfy a price filter
+    priced = index.search([1.0, 1.0, 1.0], top_k=5, filters={"min_price": 500, "max_price": 2000})
+    assert sorted(r.product_id for r in priced) == [1, 4]
+
+    assert index.search([1.0, 0.0, 0.0], top_k=5, filters={"brand": "Unknown"}) == []
+
+    # Falsy filter values are ignored, as in _build_filter_clause
+    assert index.filter_mask({"min_price": 0, "color": ""}) is None
+
+def test_selective_and_broad_filters_rank_alike(tmp_path, monkeypatch):
+    _, index = build_index(tmp_path)
+    filters = {"gender": "Women"}
+
+    def ranked():
+        return ([(r.product_id, round(r.similarity_score, 6)) for r in index.search([1.0, 1.0, 0.0], 5, filters)],
+                [(r.product_id, round(d, 6)) for r, d in index.search_after([1.0, 1.0, 0.0], 5, None, filters)])
+
+    # Half the rows match, so the mapped matrix is scored in place with the rest masked out
+    scored_in_place = ranked()
+    monkeypatch.setattr(mmap_index, "GATHER_MAX_FRACTION", 1.0)
+    gathered = ranked()
+
+    assert scored_in_place == gathered
+    assert [product_id for product_id, _ in scored_in_place[0]] == [3, 1]
+
+def test_engine_delegates_to_vector_index(tmp_path):
+    _, index = build_index(tmp_path)
+
+    class Model:
+        def encode(self, texts):
+            return np.array([[1.0, 0.1, 0.0] for _ in texts])
+
+    engine = ProductSearchEngine(None, Model(), vector_index=index)
+
+    results = engine.search("kurta", top_k=2, filters=SearchFilters(brand="Biba"))
+    assert [r.product_id for r in results] == [1, 3]
+    assert engine.last_plan.strategy == "vector_index"
+
+    batches = engine.search_many(["kurta", "dress"], top_k=1)
+    assert [[r.product_id for r in batch] for batch in batches] == [[1], [1]]
+    assert engine._read_catalog_version() == 7
+
+def test_projection_limits_hydrated_columns(tmp_path):
+    _, index = build_index(tmp_path)
+
+    (result,) = index.search([0.0, 0.0, 1.0], top_k=1,
+                             projection=SearchProjection.of(["description"], description_chars=5))
+
+    assert result.product_id == 4
+    assert result.description == "Plain"
+    assert result.product_name is None and result.price_inr is None
+
+def test_search_after_pages_in_distance_then_id_order(tmp_path):
+    _, index = build_index(tmp_path)
+
+    first = index.search_after([1.0, 1.0, 0.0], 2)
+    second = index.search_after([1.0, 1.0, 0.0], 2, after=(first[-1][1], first[-1][0].product_id))
+
+    assert [r.product_id for r, _ in first + second] == [r.product_id for r in index.search([1.0, 1.0, 0.0], 4)]
+    assert len(second) == 2
+
+def test_search_after_breaks_distance_ties_by_id_at_page_boundary(tmp_path):
+    _, index = build_index(tmp_path)
+
+    (top,) = index.search_after([1.0, 1.0, 0.0], 1)
+    # Products 1 and 2 are equidistant from this query and rank right after the top hit
+    (first,) = index.search_after([1.0, 1.0, 0.0], 1, after=(top[1], top[0].product_id))
+    (second,) = index.search_after([1.0, 1.0, 0.0], 1, after=(first[1], first[0].product_id))
+
+    assert [first[0].product_id, second[0].product_id] == [1, 2]
+    assert first[1] == second[1]
+
+def test_engine_search_iter_over_vector_index(tmp_path):
+    _, index = build_index(tmp_path)
+
+    class Model:
+        def encode(self, texts):
+            return np.array([[1.0, 1.0, 0.0] for _ in texts])
+
+    engine = ProductSearchEngine(None, Model(), vector_index=index)
+
+    streamed = [r.product_id for r in engine.search_iter("kurta", page_size=1)]
+    assert streamed == [r.product_id for r in engine.search("kurta", top_k=4)]
@@ -65,7 +65,7 @@ def test_product_search_engine():
     assert "gender = %s" in executed_query
 
     # Add to existing assertions:
-    assert "ORDER BY similarity DESC" in executed_query
+    assert "ORDER BY pe.embedding <=> %s" in executed_query
     assert "LIMIT %s" in executed_query
     assert "JOIN product_embeddings pe" in executed_query
 
@@ -0,0 +1,29 @@
+import sys
+import os
+sys.path.append(os.path.abspath("src"))
+from unittest.mock import MagicMock
+from quantization_recall import recall_at_k, format_report, baseline_label
+
+def test_recall_at_k_counts_shared_ids():
+    assert recall_at_k([1, 2, 3, 4], [4, 3, 9, 8]) == 0.5
+    assert recall_at_k([1, 2], [2, 1]) == 1.0
+    assert recall_at_k([], [1]) == 1.0
+
+def test_format_report_lists_every_configuration():
+    report = format_report([
+        {"quantization": "none", "rerank_factor": None, "recall": 1.0, "mean_ms": 3.2},
+        {"quantization": "binary", "rerank_factor": 8, "recall": 0.912, "mean_ms": 1.1},
+    ], top_k=10)
+
+    lines = report.splitlines()
+    assert "recall@10" in lines[0]
+    assert lines[2].split() == ["binary", "x8", "0.912", "1.10"]
+
+def test_baseline_is_labelled_exact_without_a_full_precision_index():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+
+    cursor.fetchone.return_value = (False, False)
+    assert baseline_label(conn) == "exact (seq scan)"
+    cursor.fetchone.return_value = (True, False)
+    assert baseline_label(conn) == "hnsw"
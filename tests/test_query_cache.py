@@ -0,0 +1,132 @@
+import sys
+import os
+import numpy as np
+import pytest
+sys.path.append(os.path.abspath("src"))
+from query_cache import EmbeddingCache, SearchResultCache, normalize_query
+from product_search_engine import SearchFilters, SearchProjection, SearchResult
+
+def test_normalize_query_lowercases_and_collapses_whitespace():
+    assert normalize_query("  Casual   SHOES ") == "casual shoes"
+
+def test_get_or_encode_hits_after_first_call():
+    cache = EmbeddingCache(max_size=10)
+    calls = []
+
+    def encode(query):
+        calls.append(query)
+        return [0.1, 0.2, 0.3]
+
+    first = cache.get_or_encode("Blue Jeans", encode)
+    second = cache.get_or_encode("blue  jeans", encode)
+
+    assert calls == ["Blue Jeans"]
+    assert first.dtype == np.float32
+    assert second is first
+    stats = cache.stats()
+    assert (stats.hits, stats.misses) == (1, 1)
+    assert stats.hit_rate == 0.5
+
+def test_lru_eviction_keeps_recently_used_entries():
+    cache = EmbeddingCache(max_size=2)
+    cache.put("a", [1.0])
+    cache.put("b", [2.0])
+    cache.get("a")
+    cache.put("c", [3.0])
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats().evictions == 1
+
+def test_ttl_expiry(monkeypatch):
+    cache = EmbeddingCache(max_size=10, ttl_seconds=60)
+    now = [1000.0]
+    monkeypatch.setattr("query_cache.time.time", lambda: now[0])
+    cache.put("red dress", [1.0, 2.0])
+    now[0] += 61
+
+    assert cache.get("red dress") is None
+    assert len(cache) == 0
+
+def test_cached_vectors_are_read_only():
+    cache = EmbeddingCache(max_size=10)
+    vector = cache.put("formal wear", [1.0, 2.0])
+    with pytest.raises(ValueError):
+        vector[0] = 5.0
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / "query_cache.npz")
+    cache = EmbeddingCache(max_size=10, persist_path=path)
+    cache.put("casual shoes", [0.5, 0.25])
+    cache.save()
+
+    restored = EmbeddingCache(max_size=10, persist_path=path)
+
+    np.testing.assert_array_equal(restored.get("casual shoes"), np.array([0.5, 0.25], dtype=np.float32))
+
+def test_saved_vectors_are_ignored_for_another_model(tmp_path):
+    path = str(tmp_path / "query_cache.npz")
+    cache = EmbeddingCache(max_size=10, persist_path=path, model_id="minilm@a", encoder="onnx")
+    cache.put("casual shoes", [0.5, 0.25])
+    cache.save()
+
+    assert len(EmbeddingCache(max_size=10, persist_path=path, model_id="minilm@a", encoder="onnx")) == 1
+    assert len(EmbeddingCache(max_size=10, persist_path=path, model_id="minilm@b", encoder="onnx")) == 0
+    assert len(EmbeddingCache(max_size=10, persist_path=path, model_id="minilm@a",
+                              encoder="sentence-transformers")) == 0
+
+def test_result_cache_key_ignores_unset_filters():
+    assert SearchResultCache.make_key("Blue Jeans", None, 5) == SearchResultCache.make_key("blue jeans", SearchFilters(), 5)
+    assert SearchResultCache.make_key("blue jeans", SearchFilters(gender="Men"), 5) != SearchResultCache.make_key("blue jeans", None, 5)
+    assert SearchResultCache.make_key("blue jeans", None, 5) != SearchResultCache.make_key("blue jeans", None, 10)
+    lean = SearchProjection.of(["product_name", "price_inr"])
+    assert SearchResultCache.make_key("blue jeans", None, 5, lean) != SearchResultCache.make_key("blue jeans", None, 5)
+
+def test_result_cache_misses_on_version_change():
+    cache = SearchResultCache(max_size=10, version_check_seconds=0)
+    version = cache.current_version(lambda: 1)
+    cache.put("casual shoes", None, 5, version, ["result"])
+
+    assert cache.get("casual shoes", None, 5, version) == ["result"]
+
+    new_version = cache.current_version(lambda: 2)
+    assert cache.get("casual shoes", None, 5, new_version) is None
+    assert len(cache) == 0
+
+def test_result_cache_hands_out_copies():
+    cache = SearchResultCache(max_size=10, version_check_seconds=0)
+    version = cache.current_version(lambda: 1)
+    results = [SearchResult(1, "Red Shoes", similarity_score=0.9)]
+    cache.put("red shoes", None, 5, version, results)
+
+    results[0].product_name = "changed by the caller"
+    cache.get("red shoes", None, 5, version)[0].price_inr = 1
+
+    assert cache.get("red shoes", None, 5, version) == [SearchResult(1, "Red Shoes", similarity_score=0.9)]
+
+def test_result_cache_throttles_version_reads():
+    cache = SearchResultCache(max_size=10, version_check_seconds=60)
+    reads = []
+
+    def read_version():
+        reads.append(1)
+        return 7
+
+    assert cache.current_version(read_version) == 7
+    assert cache.current_version(read_version) == 7
+    assert len(reads) == 1
+
+def test_faceted_entries_are_keyed_apart_from_plain_results():
+    cache = SearchResultCache(max_size=10, version_check_seconds=0)
+    version = cache.current_version(lambda: 1)
+    cache.put("red shoes", None, 5, version, [SearchResult(1)])
+    cache.put_faceted("red shoes", None, 5, 200, version, [SearchResult(2)], {"brand": {"Nike": 3}})
+
+    results, facets = cache.get_faceted("red shoes", None, 5, 200, version)
+    facets["brand"]["Nike"] = 0
+
+    assert results == [SearchResult(2)]
+    assert cache.get_faceted("red shoes", None, 5, 200, version)[1] == {"brand": {"Nike": 3}}
+    assert cache.get_faceted("red shoes", None, 5, 100, version) is None
+    assert cache.get("red shoes", None, 5, version) == [SearchResult(1)]
@@ -1,6 +1,13 @@
+import threading
 import unittest
 from unittest.mock import Mock
-from src.product_search_engine import ProductSearchEngine, SearchResult
+from src.product_search_engine import ProductSearchEngine, SearchResult, SearchFilters, FilterStatistics, RESULT_FIELDS, \
+    SearchFacets, DEFAULT_PRICE_BUCKETS
+
+
+def sent_statements(cursor):
+    """Statements sent through the cursor, with each batched execute split into its statements."""
+    return [sql for c in cursor.execute.call_args_list for sql in c[0][0].split(";\n")]
 
 
 class TestProductSearchEngine(unittest.TestCase):
@@ -51,7 +58,7 @@ class TestProductSearchEngine(unittest.TestCase):
         self.assertIn('gender = %s', query)
         self.assertIn('product_brand = %s', query)
         self.assertIn('primary_color = %s', query)
-        self.assertEqual(len(params), 7)  # embedding + 5 filters + top_k
+        self.assertEqual(len(params), 8)  # embedding + 5 filters + order-by embedding + top_k
 
     def test_build_query_with_partial_filters(self):
         """Test that _build_query_with_filters_and_params works with partial filters."""
@@ -67,7 +74,7 @@ class TestProductSearchEngine(unittest.TestCase):
         self.assertIn('WHERE', query)
         self.assertIn('Women', params)
         self.assertIn(3000, params)
-        self.assertEqual(len(params), 4)
+        self.assertEqual(len(params), 5)
 
     def test_build_query_with_empty_filters(self):
         """Test that empty filters dict doesn't modify query."""
@@ -79,7 +86,148 @@ class TestProductSearchEngine(unittest.TestCase):
         )
 
         self.assertNotIn('WHERE', query)
-        self.assertEqual(len(params), 2)
+        self.assertEqual(len(params), 3)
+
+    def test_build_query_orders_by_distance_operator(self):
+        """Ordering must use the raw distance operator so the ANN index can be used."""
+        query, params = self.search_engine._build_query_with_filters_and_params(
+            base_query="SELECT * FROM products",
+            query_embedding=[0.1, 0.2, 0.3],
+            top_k=5,
+            filters=None
+        )
+
+        self.assertIn('ORDER BY pe.embedding <=> %s LIMIT %s', query)
+        self.assertNotIn('ORDER BY similarity', query)
+        self.assertEqual(params, [[0.1, 0.2, 0.3], [0.1, 0.2, 0.3], 5])
+
+    def test_execute_query_applies_index_settings(self):
+        """ef_search and probes are applied transaction-locally ahead of the search query."""
+        engine = ProductSearchEngine(self.mock_db, self.mock_model, ef_search=80, probes=10)
+        mock_cursor = Mock()
+        self.mock_db.cursor.return_value = mock_cursor
+
+        engine._execute_query("SELECT 1", [])
+
+        # One round trip: the settings ride in the same execute as the query
+        mock_cursor.execute.assert_called_once_with(
+            "SELECT set_config('hnsw.ef_search', %s, true), set_config('ivfflat.probes', %s, true);\nSELECT 1",
+            ["80", "10"]
+        )
+
+    def test_search_uses_embedding_cache(self):
+        """Repeated queries are encoded once when an embedding cache is configured."""
+        cache = {}
+        mock_cache = Mock()
+        mock_cache.get_or_encode.side_effect = lambda q, fn: cache[q] if q in cache else cache.setdefault(q, fn(q))
+        engine = ProductSearchEngine(self.mock_db, self.mock_model, embedding_cache=mock_cache)
+        self.mock_model.encode.return_value = [[0.1, 0.2, 0.3]]
+        self.mock_db.cursor.return_value.fetchall.return_value = []
+
+        engine.search("casual shoes")
+        engine.search("casual shoes")
+
+        self.mock_model.encode.assert_called_once_with(["casual shoes"])
+
+    def test_search_result_cache_hit_skips_encode_and_query(self):
+        """A result cache hit returns the cached list without encoding or running the search SQL."""
+        cached = [SearchResult(1, "Red Shoes", "Nike", "Men", 2500.0, 5, "Stylish red shoes", "Red", 0.95)]
+        mock_result_cache = Mock()
+        mock_result_cache.current_version.return_value = 3
+        mock_result_cache.get.return_value = cached
+        engine = ProductSearchEngine(self.mock_db, self.mock_model, result_cache=mock_result_cache)
+
+        results = engine.search("red shoes", top_k=1)
+
+        self.assertEqual(results, cached)
+        self.mock_model.encode.assert_not_called()
+        mock_result_cache.get.assert_called_once_with("red shoes", None, 1, 3, engine.projection)
+        self.assertEqual(engine.last_plan.strategy, "result_cache")
+
+    def test_search_result_cache_miss_stores_results(self):
+        """On a miss the computed results are stored under the current catalog version."""
+        mock_result_cache = Mock()
+        mock_result_cache.current_version.return_value = 3
+        mock_result_cache.get.return_value = None
+        engine = ProductSearchEngine(self.mock_db, self.mock_model, result_cache=mock_result_cache)
+        self.mock_model.encode.return_value = [[0.1, 0.2, 0.3]]
+        self.mock_db.cursor.return_value.fetchall.return_value = []
+
+        engine.search("red shoes", top_k=1)
+
+        mock_result_cache.put.assert_called_once_with("red shoes", None, 1, 3, [], engine.projection)
+
+    def test_using_binds_connection_and_shares_state(self):
+        """using() returns an engine on another connection that shares model and filter statistics."""
+        other_db = Mock()
+        bound = self.search_engine.using(other_db)
+
+        self.assertIs(bound.db, other_db)
+        self.assertIs(bound.model, self.mock_model)
+        self.assertIs(self.search_engine.db, self.mock_db)
+        bound._filter_stats = FilterStatistics(total_rows=10)
+        self.assertEqual(self.search_engine._filter_stats.total_rows, 10)
+
+    def test_quantized_search_reranks_compact_candidates(self):
+        """Candidates come from the halfvec expression, the outer query rescores at full precision."""
+        engine = ProductSearchEngine(self.mock_db, self.mock_model, quantization="halfvec", rerank_factor=5)
+        mock_cursor = Mock()
+        mock_cursor.fetchall.return_value = []
+        self.mock_db.cursor.return_value = mock_cursor
+        embedding = [0.1, 0.2, 0.3]
+
+        engine._search_embedding(embedding, top_k=4, filters_dict={"brand": "Nike"})
+
+        query, params = mock_cursor.execute.call_args_list[-1][0]
+        self.assertIn("pe.embedding::halfvec(384) <=> %s::halfvec(384) LIMIT %s", query)
+        self.assertIn("ORDER BY embedding <=> %s LIMIT %s", query)
+        # ef_search is raised so the HNSW scan can return every candidate
+        self.assertTrue(query.startswith("SELECT set_config('hnsw.ef_search', %s, true);"))
+        self.assertEqual(params, ["20", "Nike", embedding, 20, embedding, embedding, 4])
+        self.assertEqual(engine.last_plan.strategy, "quantized_rerank")
+
+    def test_hybrid_search_fuses_lexical_and_vector_candidates(self):
+        """Hybrid mode sends one RRF query with the filters applied to both candidate lists."""
+        engine = ProductSearchEngine(self.mock_db, self.mock_model, hybrid=True, lexical_candidates=30, rrf_k=60)
+        self.mock_model.encode.return_value = [[0.1, 0.2, 0.3]]
+        mock_cursor = Mock()
+        mock_cursor.fetchall.return_value = []
+        self.mock_db.cursor.return_value = mock_cursor
+
+        engine.search("DKNY trolley", top_k=5, filters=SearchFilters(gender="Women"))
+
+        query, params = mock_cursor.execute.call_args_list[-1][0]
+        self.assertIn("websearch_to_tsquery('english', %s)", query)
+        self.assertIn("WHERE 1=1 AND gender = %s AND p.search_tsv @@ tsq", query)
+        self.assertIn("SUM(1.0 / (%s + rank))", query)
+        self.assertEqual(
+            params,
+            ["10", [0.1, 0.2, 0.3], "Women", 10, "DKNY trolley", "Women", 30, 60, [0.1, 0.2, 0.3], 5]
+        )
+        self.assertEqual(engine.last_plan.strategy, "hybrid_rrf")
+
+    def test_hybrid_query_without_filters_only_matches_tsquery(self):
+        query, params = self.search_engine._build_hybrid_query("dkny", [0.1], 3, 6, None)
+
+        self.assertRegex(query, r"tsq\s+WHERE p\.search_tsv @@ tsq")
+        self.assertEqual(params, [[0.1], 6, "dkny", 50, 60, [0.1], 3])
+
+    def test_unknown_quantization_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ProductSearchEngine(self.mock_db, self.mock_model, quantization="int4")
+
+    def test_execute_query_resets_raised_ef_search(self):
+        """A raised ef_search from an over-fetching query does not carry over to the next query."""
+        mock_cursor = Mock()
+        self.mock_db.cursor.return_value = mock_cursor
+
+        self.search_engine._execute_query("SELECT 1", [], min_ef_search=500)
+        self.search_engine._execute_query("SELECT 2", [])
+
+        calls = [c[0] for c in mock_cursor.execute.call_args_list]
+        self.assertEqual(calls[0], ("SELECT set_config('hnsw.ef_search', %s, true);\nSELECT 1", ["500"]))
+        self.assertIn("reset_val FROM pg_settings WHERE name = 'hnsw.ef_search'", calls[1][0])
+        self.assertEqual((calls[1][0].split(";\n")[-1], calls[1][1]), ("SELECT 2", []))
 
     def test_execute_query_returns_cursor(self):
         """Test that _execute_query creates a cursor, executes it with correct query and params, and returns it."""
@@ -181,6 +329,481 @@ class TestProductSearchEngine(unittest.TestCase):
 
         self.assertEqual(results, [])
 
+    def test_search_projection_selects_only_requested_columns(self):
+        """A field projection narrows the SELECT list and the hydrated results."""
+        self.mock_model.encode.return_value = [[0.1, 0.2, 0.3]]
+        mock_cursor = Mock()
+        mock_cursor.fetchall.return_value = [(1, "Red Shoes", 2500.0, "Stylish", 0.95)]
+        self.mock_db.cursor.return_value = mock_cursor
+
+        results = self.search_engine.search(
+            "red shoes", top_k=1, fields=("price_inr", "product_name", "description"), description_chars=40
+        )
+
+        query = mock_cursor.execute.call_args[0][0]
+        self.assertIn("SELECT p.product_id, p.product_name, p.price_inr, left(p.description, 40) AS description,", query)
+        self.assertNotIn("p.num_images", query)
+        self.assertEqual(results, [SearchResult(1, "Red Shoes", price_inr=2500.0, description="Stylish",
+                                                similarity_score=0.95)])
+        self.assertIsNone(results[0].product_brand)
+        # The engine's default projection is restored after the call
+        self.assertEqual(self.search_engine._projection.fields, RESULT_FIELDS)
+
+    def test_overfetch_query_joins_projected_columns_after_index_scan(self):
+        """The over-fetch scan reads only ids and distances; filters apply to the joined products."""
+        engine = ProductSearchEngine(self.mock_db, self.mock_model, fields=["product_name"])
+        query, params = engine._build_overfetch_query([0.1], 5, 50, {"gender": "Men"})
+
+        self.assertRegex(query, r"SELECT pe\.product_id, pe\.embedding <=> %s AS distance\s+FROM product_embeddings pe")
+        self.assertIn("SELECT p.product_id, p.product_name,", query)
+        self.assertIn("WHERE 1=1 AND gender = %s", query)
+        self.assertEqual(params, [[0.1], 50, "Men", 5])
+
+    def test_unknown_projection_field_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ProductSearchEngine(self.mock_db, self.mock_model, fields=["embedding"])
+
+    def test_fetch_descriptions_loads_full_text(self):
+        mock_cursor = Mock()
+        mock_cursor.fetchall.return_value = [(1, "Full description")]
+        self.mock_db.cursor.return_value = mock_cursor
+
+        self.assertEqual(self.search_engine.fetch_descriptions([1]), {1: "Full description"})
+        self.assertEqual(mock_cursor.execute.call_args[0][1], ([1],))
+
+    def test_search_page_resumes_from_cursor_without_reencoding(self):
+        """The cursor carries the last (distance, product_id); the next page starts after it."""
+        self.mock_model.encode.return_value = [[0.1, 0.2, 0.3]]
+        mock_cursor = Mock()
+        mock_cursor.fetchall.side_effect = [
+            [(1, "A", None, "Men", 100, 1, "a", "Red", 0.9, 0.1),
+             (2, "B", None, "Men", 100, 1, "b", "Red", 0.8, 0.2),
+             (3, "C", None, "Men", 100, 1, "c", "Red", 0.7, 0.3)],
+            [(3, "C", None, "Men", 100, 1, "c", "Red", 0.7, 0.3)],
+            [(3, "C", None, "Men", 100, 1, "c", "Red", 0.7, 0.3)],
+        ]
+        self.mock_db.cursor.return_value = mock_cursor
+
+        first = self.search_engine.search_page("shoes", page_size=2, filters=SearchFilters(gender="Men"))
+        second = self.search_engine.search_page(page_size=2, cursor=first.cursor)
+
+        self.assertEqual([r.product_id for r in first.results], [1, 2])
+        self.assertEqual([r.product_id for r in second.results], [3])
+        self.assertIsNone(second.cursor)
+        self.mock_model.encode.assert_called_once_with(["shoes"])
+
+        # The short index page is confirmed by an exact scan before pagination ends
+        exact_query, exact_params = mock_cursor.execute.call_args[0]
+        self.assertIn("WITH candidates AS MATERIALIZED", exact_query)
+        self.assertIn("ORDER BY distance, product_id", exact_query)
+        self.assertEqual(exact_params[1:], ["Men", exact_params[0], 0.2, 2, 3])
+        query, params = [c[0] for c in mock_cursor.execute.call_args_list if "LIMIT" in c[0][0]][-2]
+        # ef_search covers the two rows already paged past plus this page and one more
+        self.assertEqual(params[0], "5")
+        params = params[1:]
+        self.assertIn("AND (pe.embedding <=> %s, pe.product_id) > (%s::float8, %s)", query)
+        self.assertIn("ORDER BY pe.embedding <=> %s, pe.product_id", query)
+        self.assertEqual([params[2], params[4], params[5], params[7]], ["Men", 0.2, 2, 3])
+        self.assertIs(params[3], params[0])  # the stored query vector is reused
+        self.assertEqual(self.search_engine.last_plan.strategy, "keyset_page")
+
+    def test_search_page_rejects_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            self.search_engine.search_page(cursor="not-a-cursor")
+        with self.assertRaises(ValueError):
+            self.search_engine.search_page()
+
+    def test_search_iter_streams_across_pages(self):
+        """search_iter keeps fetching pages until the results run out."""
+        self.mock_model.encode.return_value = [[0.1, 0.2, 0.3]]
+        rows = [(i, f"P{i}", None, None, None, None, None, None, 1 - i / 10, i / 10) for i in range(1, 6)]
+        mock_cursor = Mock()
+        mock_cursor.fetchall.side_effect = [rows[0:3], rows[2:5], rows[4:5], rows[4:5]]
+        self.mock_db.cursor.return_value = mock_cursor
+
+        results = list(self.search_engine.search_iter("shoes", page_size=2))
+
+        self.assertEqual([r.product_id for r in results], [1, 2, 3, 4, 5])
+        self.assertEqual(mock_cursor.fetchall.call_count, 4)  # the last page is confirmed exactly
+
+    def test_search_iter_continues_past_a_short_index_scan(self):
+        """A filtered HNSW page that runs short is re-read exactly instead of ending the iteration."""
+        self.mock_model.encode.return_value = [[0.1, 0.2, 0.3]]
+        rows = [(i, f"P{i}", None, None, None, None, None, None, 1 - i / 10, i / 10) for i in range(1, 6)]
+        mock_cursor = Mock()
+        mock_cursor.fetchall.side_effect = [rows[0:1], rows[0:3], rows[2:5], rows[4:5], rows[4:5]]
+        self.mock_db.cursor.return_value = mock_cursor
+
+        results = list(self.search_engine.search_iter("shoes", page_size=2, filters=SearchFilters(brand="Nike")))
+
+        self.assertEqual([r.product_id for r in results], [1, 2, 3, 4, 5])
+
+    def test_search_with_facets_reads_counts_from_first_row(self):
+        """Results and facet counts come back from one statement."""
+        self.mock_model.encode.return_value = [[0.1, 0.2, 0.3]]
+        payload = {"candidates": 100, "counts": [
+            ["brand", "Nike", 1], ["brand", "Puma", 2], ["color", "Red", 3], ["gender", "Men", 3],
+            ["price", "0", 1], ["price", "2", 2],
+        ]}
+        mock_cursor = Mock()
+        mock_cursor.fetchall.return_value = [
+            (1, "A", 0.9, payload),
+            (2, "B", 0.8, None),
+        ]
+        self.mock_db.cursor.return_value = mock_cursor
+
+        faceted = self.search_engine.search_with_facets(
+            "shoes", top_k=2, filters=SearchFilters(gender="Men"), facet_candidates=100, fields=["product_name"]
+        )
+
+        self.assertEqual([r.product_id for r in faceted.results], [1, 2])
+        mock_cursor.fetchall.assert_called_once()
+        self.assertEqual(faceted.facets.brand, {"Puma": 2, "Nike": 1})
+        self.assertEqual(faceted.facets.color, {"Red": 3})
+        self.assertEqual(faceted.facets.price, [(None, 500, 1), (500, 1000, 0), (1000, 2000, 2),
+                                                (2000, 5000, 0), (5000, None, 0)])
+
+        query, params = mock_cursor.execute.call_args[0]
+        # Facet columns are selected into the candidates even when not projected
+        self.assertIn("p.product_name, p.product_brand, p.primary_color, p.gender, p.price_inr", query)
+        self.assertIn("width_bucket(price_inr::float8, %s::float8[])", query)
+        # The facet-bearing row and the result order agree, even across equal distances
+        self.assertIn("row_number() OVER (ORDER BY distance, product_id) = 1", query)
+        self.assertRegex(query, r"FROM candidates\s+ORDER BY distance, product_id\s+LIMIT %s")
+        self.assertEqual(params[0], "100")  # ef_search raised to the candidate count
+        self.assertEqual(params[2:], ["Men", params[1], 100, [500, 1000, 2000, 5000], 2])
+
+    def test_short_faceted_candidate_set_falls_back_to_exact_scan(self):
+        """A filtered candidate set the index scan left short is re-read with an exact scan."""
+        self.mock_model.encode.return_value = [[0.1, 0.2, 0.3]]
+        mock_cursor = Mock()
+        mock_cursor.fetchall.side_effect = [
+            [(1, "A", 0.9, {"candidates": 1, "counts": []})],
+            [(1, "A", 0.9, {"candidates": 40, "counts": []}), (2, "B", 0.8, None)],
+        ]
+        self.mock_db.cursor.return_value = mock_cursor
+
+        faceted = self.search_engine.search_with_facets(
+            "shoes", top_k=2, filters=SearchFilters(brand="Nike"), facet_candidates=100, fields=["product_name"]
+        )
+
+        self.assertEqual([r.product_id for r in faceted.results], [1, 2])
+        self.assertEqual(faceted.facets.candidates, 40)
+        self.assertEqual(self.search_engine.last_plan.attempts, 2)
+        exact_query, params = mock_cursor.execute.call_args[0]
+        self.assertIn("OFFSET 0) matching ORDER BY distance LIMIT %s", exact_query)
+        self.assertEqual(params[1:], ["Nike", 100, [500, 1000, 2000, 5000], 2])
+
+    def test_search_with_facets_uses_the_result_cache(self):
+        """Faceted answers are served from, and stored in, the versioned result cache."""
+        mock_result_cache = Mock()
+        mock_result_cache.current_version.return_value = 3
+        mock_result_cache.get_faceted.return_value = ([SearchResult(1)], SearchFacets(candidates=1))
+        engine = ProductSearchEngine(self.mock_db, self.mock_model, result_cache=mock_result_cache)
+
+        faceted = engine.search_with_facets("red shoes", top_k=1, facet_candidates=50)
+
+        self.assertEqual(faceted.results, [SearchResult(1)])
+        self.assertEqual(faceted.facets.candidates, 1)
+        self.mock_model.encode.assert_not_called()
+        mock_result_cache.get_faceted.assert_called_once_with("red shoes", None, 1, 50, 3, engine.projection)
+        self.assertEqual(engine.last_plan.strategy, "result_cache")
+
+        mock_result_cache.get_faceted.return_value = None
+        self.mock_model.encode.return_value = [[0.1, 0.2, 0.3]]
+        self.mock_db.cursor.return_value.fetchall.return_value = [(1, "A", "B", "Men", 10.0, 1, "D", "Red", 0.9,
+                                                                  {"candidates": 50, "counts": []})]
+        faceted = engine.search_with_facets("red shoes", top_k=1, facet_candidates=50)
+
+        mock_result_cache.put_faceted.assert_called_once_with(
+            "red shoes", None, 1, 50, 3, faceted.results, faceted.facets, engine.projection
+        )
+
+    def test_vector_index_facets_return_only_projected_fields(self):
+        """Facet columns hydrated for counting are not handed back on the results."""
+        mock_index = Mock()
+        mock_index.search.return_value = [
+            SearchResult(1, "A", product_brand="Nike", price_inr=600, similarity_score=0.9),
+            SearchResult(2, "B", product_brand="Puma", price_inr=700, similarity_score=0.8),
+        ]
+        engine = ProductSearchEngine(self.mock_db, self.mock_model, vector_index=mock_index)
+        self.mock_model.encode.return_value = [[0.1, 0.2, 0.3]]
+
+        faceted = engine.search_with_facets("shoes", top_k=1, fields=["product_name"])
+
+        self.assertEqual(faceted.results, [SearchResult(1, "A", similarity_score=0.9)])
+        self.assertEqual(faceted.facets.brand, {"Nike": 1, "Puma": 1})
+
+    def test_facets_from_results_match_sql_buckets(self):
+        results = [SearchResult(1, product_brand="Nike", price_inr=500), SearchResult(2, product_brand="Nike"),
+                   SearchResult(3, gender="Women", price_inr=4999)]
+
+        facets = SearchFacets.from_results(results, DEFAULT_PRICE_BUCKETS)
+
+        self.assertEqual(facets.candidates, 3)
+        self.assertEqual(facets.brand, {"Nike": 2})
+        self.assertEqual(facets.gender, {"Women": 1})
+        self.assertEqual([count for _, _, count in facets.price], [0, 1, 0, 1, 0])
+
+    def test_facet_vocabularies_use_cached_statistics(self):
+        self.search_engine._filter_stats = FilterStatistics(
+            total_rows=10, gender_counts={"Women": 6, "Men": 4}, brand_counts={"Nike": 1, "Biba": 3},
+            color_counts={}, price_quantiles=[199, 999, 4999], loaded_at=float("inf")
+        )
+
+        vocabularies = self.search_engine.facet_vocabularies()
+
+        self.assertEqual(vocabularies["gender"], ["Women", "Men"])
+        self.assertEqual(vocabularies["brand"], ["Biba", "Nike"])
+        self.assertEqual(vocabularies["price_range"], (199, 4999))
+        self.mock_db.cursor.assert_not_called()
+
+    def test_prepared_statements_are_prepared_once_per_shape_and_connection(self):
+        """The first search of a shape PREPAREs it; later ones only EXECUTE the prepared handle."""
+        engine = ProductSearchEngine(self.mock_db, self.mock_model, prepare_statements=True,
+                                     plan_cache_mode="force_generic_plan")
+        self.mock_model.encode.return_value = [[0.1, 0.2, 0.3]]
+        mock_cursor = Mock()
+        rows = [(product_id,) for product_id in range(1, 6)]
+        mock_cursor.fetchall.side_effect = \
+            lambda: [] if "pg_prepared_statements" in mock_cursor.execute.call_args[0][0] else rows
+        self.mock_db.cursor.return_value = mock_cursor
+
+        engine.search("red shoes", filters=SearchFilters(gender="Men"))
+        engine.search("blue jeans", filters=SearchFilters(gender="Women"))
+        engine.search("blue jeans", filters=SearchFilters(brand="Nike"))
+
+        statements = sent_statements(mock_cursor)
+        prepares = [sql for sql in statements if sql.startswith("PREPARE")]
+        executes = [sql for sql in statements if sql.startswith("EXECUTE")]
+        self.assertEqual(len(prepares), 2)  # gender and brand shapes
+        self.assertIn("gender = $2", prepares[0])
+        self.assertNotIn("%s", prepares[0])
+        self.assertEqual(executes[1], executes[0])
+        self.assertRegex(executes[0], r"^EXECUTE search_\w+ \(%s, %s, %s, %s\)$")
+        # Settings, PREPARE and EXECUTE of a new shape go out in one round trip
+        batch, params = mock_cursor.execute.call_args_list[1][0]
+        self.assertEqual([sql.split()[0] for sql in batch.split(";\n")], ["SELECT", "PREPARE", "EXECUTE"])
+        self.assertIn("set_config('plan_cache_mode', %s, true)", batch)
+        second_params = mock_cursor.execute.call_args_list[2][0][1]
+        self.assertEqual(second_params[0], "force_generic_plan")
+        self.assertEqual(second_params[2:], ["Women", second_params[1], 5])
+        self.assertEqual(engine.prepared_statement_stats(),
+                         {"hits": 1, "prepares": 2, "connections": 1, "statements": 2})
+
+        # Another connection prepares its own copy
+        other_db = Mock()
+        other_db.cursor.return_value = mock_cursor
+        engine.using(other_db).search("red shoes", filters=SearchFilters(gender="Men"))
+        self.assertEqual(engine.prepared_statement_stats()["prepares"], 3)
+
+    def test_evicted_connection_reuses_statements_its_session_holds(self):
+        """Eviction is least-recently-used, and a reused evicted connection does not PREPARE again."""
+        engine = ProductSearchEngine(self.mock_db, self.mock_model, prepare_statements=True,
+                                     max_prepared_connections=2)
+        self.mock_model.encode.return_value = [[0.1, 0.2, 0.3]]
+        connections = {}
+        for label in "abc":
+            db = Mock()
+            db.get_backend_pid.return_value = ord(label)
+            db.cursor.return_value = Mock()
+            db.cursor.return_value.fetchall.return_value = []
+            connections[label] = db
+
+        def search_on(label):
+            engine.using(connections[label]).search("red shoes")
+            return sent_statements(connections[label].cursor.return_value)
+
+        search_on("a")
+        name = next(sql for sql in search_on("b") if sql.startswith("PREPARE")).split()[1]
+        search_on("a")  # a is now the most recently used
+        search_on("c")  # evicts b
+        self.assertEqual(engine.prepared_statement_stats()["connections"], 2)
+        self.assertEqual(engine.prepared_statement_stats()["hits"], 1)
+        search_on("a")
+        self.assertEqual(engine.prepared_statement_stats()["hits"], 2)
+
+        # b's session still holds the statement; it is read back instead of prepared again
+        b_cursor = connections["b"].cursor.return_value
+        b_cursor.reset_mock()
+        b_cursor.fetchall.return_value = [(name,)]
+        statements = search_on("b")
+        self.assertFalse(any(sql.startswith("PREPARE") for sql in statements))
+        self.assertTrue(any(sql.startswith(f"EXECUTE {name}") for sql in statements))
+
+    def test_prepared_statement_tracking_is_thread_safe(self):
+        """Sessions sharing the engine through using() can prepare and evict concurrently."""
+        engine = ProductSearchEngine(self.mock_db, self.mock_model, prepare_statements=True,
+                                     max_prepared_connections=3)
+        self.mock_model.encode.return_value = [[0.1, 0.2, 0.3]]
+        errors = []
+
+        def session(worker):
+            try:
+                for i in range(200):
+                    db = Mock()
+                    db.get_backend_pid.return_value = (worker * 7 + i) % 10
+                    db.cursor.return_value.fetchall.return_value = []
+                    engine.using(db)._prepare(db.cursor(), f"SELECT {i % 4}")
+                    engine.using(db)._mark_prepared(f"search_{i % 4}")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=session, args=(worker,)) for worker in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertLessEqual(engine.prepared_statement_stats()["connections"], 3)
+        self.assertEqual(engine.prepared_statement_stats()["prepares"], 8 * 200)
+
+    def test_prepared_search_many_casts_execute_arguments(self):
+        """EXECUTE repeats the placeholder casts, so the vector list is not passed as text[]."""
+        engine = ProductSearchEngine(self.mock_db, self.mock_model, prepare_statements=True)
+        self.mock_model.encode.return_value = [[0.1, 0.2, 0.3], [0.3, 0.2, 0.1]]
+        mock_cursor = Mock()
+        mock_cursor.fetchall.return_value = []
+        self.mock_db.cursor.return_value = mock_cursor
+
+        engine.search_many(["blue jeans", "formal wear"], top_k=2, filters=SearchFilters(gender="Men"))
+
+        statements = sent_statements(mock_cursor)
+        prepare = next(sql for sql in statements if sql.startswith("PREPARE"))
+        execute = next(sql for sql in statements if sql.startswith("EXECUTE"))
+        self.assertIn("unnest($1::vector[])", prepare)
+        self.assertRegex(execute, r"^EXECUTE search_\w+ \(%s::vector\[\], %s, %s\)$")
+
+    def test_underfilled_inline_filtered_search_falls_back_to_exact_scan(self):
+        """An HNSW scan whose candidates the filters mostly reject is re-run exactly."""
+        self.mock_model.encode.return_value = [[0.1, 0.2, 0.3]]
+        mock_cursor = Mock()
+        mock_cursor.fetchall.side_effect = [
+            [(1, "A", "Nike", "Men", 999, 1, "d", "Red", 0.9)],
+            [(1, "A", "Nike", "Men", 999, 1, "d", "Red", 0.9), (2, "B", "Nike", "Men", 899, 1, "d", "Red", 0.8)],
+        ]
+        self.mock_db.cursor.return_value = mock_cursor
+
+        results = self.search_engine.search("shoes", top_k=2, filters=SearchFilters(brand="Nike"))
+
+        self.assertEqual([r.product_id for r in results], [1, 2])
+        self.assertEqual(self.search_engine.last_plan.strategy, "exact")
+        self.assertIn("AS MATERIALIZED", mock_cursor.execute.call_args[0][0])
+
+    def test_unknown_plan_cache_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ProductSearchEngine(self.mock_db, self.mock_model, plan_cache_mode="generic")
+
+    def test_search_many_batches_encode_and_sql(self):
+        """search_many encodes all queries in one call and resolves them in one statement."""
+        self.mock_model.encode.return_value = [[0.1, 0.2, 0.3], [0.3, 0.2, 0.1], [0.0, 0.0, 1.0]]
+        mock_cursor = Mock()
+        mock_cursor.fetchall.return_value = [
+            (1, 10, "Blue Jeans", "Levi's", "Men", 2999.0, 3, "Denim", "Blue", 0.95),
+            (1, 11, "Black Jeans", "Levi's", "Men", 2499.0, 3, "Denim", "Black", 0.90),
+            (3, 30, "Formal Shirt", "Arrow", "Men", 1999.0, 4, "Cotton shirt", "White", 0.80),
+        ]
+        self.mock_db.cursor.return_value = mock_cursor
+
+        results = self.search_engine.search_many(["blue jeans", "unmatched", "formal wear"], top_k=2)
+
+        self.mock_model.encode.assert_called_once_with(["blue jeans", "unmatched", "formal wear"])
+        mock_cursor.execute.assert_called_once()
+        query, params = mock_cursor.execute.call_args.args
+        self.assertIn('WITH ORDINALITY', query)
+        self.assertIn('CROSS JOIN LATERAL', query)
+        self.assertEqual(len(params[0]), 3)
+        self.assertEqual(params[-1], 2)
+        self.assertEqual([[r.product_id for r in group] for group in results], [[10, 11], [], [30]])
+
+    def test_search_many_applies_filters_inside_lateral(self):
+        """Filters are applied per query inside the LATERAL subquery."""
+        self.mock_model.encode.return_value = [[0.1, 0.2, 0.3]]
+        mock_cursor = Mock()
+        mock_cursor.fetchall.return_value = []
+        self.mock_db.cursor.return_value = mock_cursor
+
+        self.search_engine.search_many(["blue jeans"], top_k=5, filters=SearchFilters(gender='Men'))
+
+        query, params = mock_cursor.execute.call_args.args
+        self.assertLess(query.index('gender = %s'), query.index(') r'))
+        self.assertEqual(params[1:], ['Men', 5])
+
+    def test_search_many_empty_input(self):
+        """No queries means no encode and no SQL."""
+        self.assertEqual(self.search_engine.search_many([]), [])
+        self.mock_model.encode.assert_not_called()
+        self.mock_db.cursor.assert_not_called()
+
+
+class TestAdaptiveFilterPlanner(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_db = Mock()
+        self.mock_model = Mock()
+        self.mock_model.encode.return_value = [[0.1, 0.2, 0.3]]
+        self.search_engine = ProductSearchEngine(
+            self.mock_db, self.mock_model, adaptive_filtering=True, exact_scan_max_rows=1000
+        )
+        self.search_engine._filter_stats = FilterStatistics(
+            total_rows=100_000,
+            gender_counts={'Men': 50_000, 'Women': 50_000},
+            brand_counts={'Nike': 200, 'Roadster': 30_000},
+            color_counts={'Blue': 20_000},
+            price_quantiles=list(range(0, 10_100, 100)),
+            loaded_at=float('inf')
+        )
+
+    def test_estimate_selectivity_multiplies_filters(self):
+        """Selectivity is the product of the per-column fractions."""
+        stats = self.search_engine._filter_stats
+        self.assertEqual(stats.estimate_selectivity(None), 1.0)
+        self.assertAlmostEqual(stats.estimate_selectivity({'gender': 'Men', 'color': 'Blue'}), 0.1)
+        self.assertEqual(stats.estimate_selectivity({'brand': 'Unknown'}), 0.0)
+        self.assertAlmostEqual(stats.estimate_selectivity({'max_price': 4950}), 50 / 101)
+
+    def test_selective_brand_filter_plans_exact_scan(self):
+        """A brand matching few rows is answered with an exact scan over the filtered subset."""
+        plan = self.search_engine.plan_search(top_k=5, filters=SearchFilters(brand='Nike'))
+
+        self.assertEqual(plan.strategy, 'exact')
+        self.assertEqual(plan.estimated_rows, 200)
+
+    def test_broad_filter_plans_ann_overfetch(self):
+        """A broad filter uses the ANN index with an over-fetch factor of ~1/selectivity."""
+        plan = self.search_engine.plan_search(top_k=5, filters=SearchFilters(gender='Men', color='Blue'))
+
+        self.assertEqual(plan.strategy, 'ann_overfetch')
+        self.assertEqual(plan.overfetch_factor, 10)
+
+    def test_overfetch_grows_then_falls_back_to_exact(self):
+        """When the over-fetched candidates never yield top_k rows, the planner falls back to an exact scan."""
+        mock_cursor = Mock()
+        mock_cursor.fetchall.return_value = []
+        self.mock_db.cursor.return_value = mock_cursor
+
+        self.search_engine.search("blue jeans", top_k=5, filters=SearchFilters(gender='Men', color='Blue'))
+
+        plan = self.search_engine.last_plan
+        self.assertEqual(plan.strategy, 'exact')
+        self.assertEqual(plan.attempts, 7)  # x10, x20, x40, x80, x160, x200 (1000 candidates), then exact
+        queries = [c.args[0] for c in mock_cursor.execute.call_args_list if not c.args[0].startswith('SET')]
+        self.assertIn('MATERIALIZED', queries[-1])
+        self.assertTrue(all('MATERIALIZED' not in q for q in queries[:-1]))
+
+    def test_unfiltered_search_skips_planner(self):
+        """Searches without filters never touch the statistics."""
+        self.search_engine._filter_stats = None
+        mock_cursor = Mock()
+        mock_cursor.fetchall.return_value = []
+        self.mock_db.cursor.return_value = mock_cursor
+
+        self.search_engine.search("blue jeans", top_k=5)
+
+        self.assertEqual(self.search_engine.last_plan.strategy, 'unfiltered')
+        self.assertIsNone(self.search_engine._filter_stats)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
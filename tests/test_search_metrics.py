@@ -0,0 +1,88 @@
+import sys
+import os
+from unittest.mock import Mock
+import pytest
+sys.path.append(os.path.abspath("src"))
+from search_metrics import Histogram, SearchMetrics
+from product_search_engine import ProductSearchEngine, SearchFilters, SearchStats
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    for value in (0.005, 0.05, 0.05, 0.5, 2.0):
+        histogram.observe(value)
+
+    assert histogram.cumulative() == [(0.01, 1), (0.1, 3), (1.0, 4), (float("inf"), 5)]
+    assert histogram.quantile(0.5) == pytest.approx(0.01 + 0.09 * 0.75)
+    assert histogram.quantile(0.99) == 1.0
+    assert Histogram().quantile(0.5) is None
+
+def make_engine(metrics):
+    db = Mock()
+    model = Mock()
+    model.encode.return_value = [[0.1, 0.2]]
+    db.cursor.return_value.fetchall.return_value = [
+        (1, "Red Shoes", "Nike", "Men", 2500, 5, "Stylish red shoes", "Red", 0.95)
+    ]
+    return ProductSearchEngine(db, model, metrics=metrics)
+
+def test_engine_records_stage_timings_when_enabled():
+    metrics = SearchMetrics()
+    engine = make_engine(metrics)
+
+    engine.search("red shoes", top_k=1, filters=SearchFilters(gender="Men", brand="Nike"))
+
+    stats = engine.last_stats
+    assert set(stats.stages) == {"encode", "build", "execute", "hydrate"}
+    assert stats.total_seconds == pytest.approx(sum(stats.stages.values()))
+    assert (stats.rows, stats.filters, stats.strategy) == (1, "brand+gender", "inline_filters")
+
+    snapshot = metrics.snapshot()
+    assert snapshot["requests"] == 1
+    assert snapshot["rows_returned"] == 1
+    assert snapshot["stage_seconds"]["execute"]["count"] == 1
+    assert snapshot["requests_by_filters"] == {"brand+gender/inline_filters": 1}
+
+def test_engine_without_metrics_keeps_no_stats():
+    engine = make_engine(None)
+
+    engine.search("red shoes")
+
+    assert engine.last_stats is None
+
+def test_errors_are_counted_and_reraised():
+    metrics = SearchMetrics()
+    engine = make_engine(metrics)
+    engine.db.cursor.return_value.execute.side_effect = TimeoutError("statement timeout")
+
+    with pytest.raises(TimeoutError):
+        engine.search("red shoes")
+
+    assert metrics.snapshot()["errors"] == {"TimeoutError": 1}
+
+def test_prepared_statement_counters():
+    metrics = SearchMetrics()
+    engine = make_engine(metrics)
+    engine.prepare_statements = True
+
+    engine.search("red shoes")
+    engine.search("blue jeans")
+
+    assert (engine.last_stats.prepares, engine.last_stats.prepare_hits) == (0, 1)
+    snapshot = metrics.snapshot()
+    assert (snapshot["prepares"], snapshot["prepare_hits"]) == (1, 1)
+    assert "product_search_prepare_hits_total 1" in metrics.to_prometheus()
+
+def test_prometheus_export():
+    metrics = SearchMetrics(buckets=(0.1, 1.0))
+    metrics.record(SearchStats(top_k=5, filters="none", stages={"encode": 0.05}, total_seconds=0.2,
+                               rows=5, strategy="unfiltered", embedding_cache_hits=1))
+
+    text = metrics.to_prometheus()
+
+    assert '# TYPE product_search_stage_seconds histogram' in text
+    assert 'product_search_stage_seconds_bucket{stage="encode",le="0.1"} 1' in text
+    assert 'product_search_request_seconds_bucket{le="+Inf"} 1' in text
+    assert 'product_search_request_seconds_count 1' in text
+    assert 'product_search_requests_total{filters="none",strategy="unfiltered"} 1' in text
+    assert 'product_search_embedding_cache_hits_total 1' in text
+    assert text.endswith("\n")
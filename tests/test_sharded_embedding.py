@@ -0,0 +1,33 @@
+import sys
+import os
+sys.path.append(os.path.abspath("src"))
+from sharded_embedding import Shard, ShardResult, shard_boundaries, summarize
+
+def test_shard_boundaries_cover_all_ids_without_overlap():
+    ids = [3, 5, 8, 13, 21, 34, 55, 89, 144, 233]
+
+    shards = shard_boundaries(ids, 3)
+
+    assert [s.shard_id for s in shards] == [0, 1, 2]
+    assert shards[0].lo == 3 and shards[-1].hi == 234
+    for left, right in zip(shards, shards[1:]):
+        assert left.hi == right.lo
+    counts = [sum(s.lo <= i < s.hi for i in ids) for s in shards]
+    assert sum(counts) == len(ids)
+    assert max(counts) - min(counts) <= 1
+
+def test_shard_boundaries_edge_cases():
+    assert shard_boundaries([], 4) == []
+    assert shard_boundaries([7], 4) == [Shard(0, 7, 8)]
+    assert len(shard_boundaries([1, 2], 8)) == 2
+
+def test_summarize_reports_per_worker_throughput():
+    summary = summarize([
+        ShardResult(0, "pid-1", 100, 2.0),
+        ShardResult(1, "pid-1", 100, 2.0),
+        ShardResult(2, "pid-2", 50, 1.0),
+    ])
+
+    lines = summary.splitlines()
+    assert lines[1].split() == ["pid-1", "2", "200", "50.0"]
+    assert lines[2].split() == ["pid-2", "1", "50", "50.0"]
@@ -0,0 +1,103 @@
+import sys
+import os
+import json
+from unittest.mock import Mock
+import numpy as np
+sys.path.append(os.path.abspath("src"))
+from slow_query_log import SlowQueryLog, read_entries, aggregate, format_report, summarize_param, shape_id
+from product_search_engine import ProductSearchEngine
+
+PLAN = ["Limit  (actual time=0.1..9.0 rows=5 loops=1)", "  ->  Seq Scan on products p", "Sort Method: external merge  Disk: 4096kB"]
+
+def make_conn(plan=PLAN):
+    conn = Mock()
+    cursor = conn.cursor.return_value
+    cursor.fetchall.return_value = [(line,) for line in plan]
+    return conn, cursor
+
+def test_fast_queries_are_not_logged(tmp_path):
+    log = SlowQueryLog(threshold_ms=100, path=str(tmp_path / "slow.jsonl"))
+    conn, _ = make_conn()
+
+    assert not log.observe(conn, "SELECT 1", [], duration_ms=5)
+    conn.cursor.assert_not_called()
+
+def test_slow_query_logged_with_sampled_explain(tmp_path):
+    path = str(tmp_path / "slow.jsonl")
+    log = SlowQueryLog(threshold_ms=100, explain_sample_rate=1.0, path=path)
+    conn, cursor = make_conn()
+    query = "SELECT *  FROM products\n WHERE 1=1 AND gender = %s LIMIT %s"
+
+    assert log.observe(conn, query, [np.zeros(384), "Men", 5], duration_ms=250.0)
+
+    statements = [c[0][0] for c in cursor.execute.call_args_list]
+    assert statements[0] == "SAVEPOINT slow_query_explain"
+    assert statements[1].startswith("EXPLAIN (ANALYZE, BUFFERS) SELECT")
+    assert statements[2] == "RELEASE SAVEPOINT slow_query_explain"
+
+    (entry,) = read_entries(path)
+    assert entry["sql"] == "SELECT * FROM products WHERE 1=1 AND gender = %s LIMIT %s"
+    assert entry["shape"] == shape_id(query)
+    assert entry["params"] == ["vector(384)", "'Men'", "5"]
+    assert entry["flags"] == ["seq_scan", "disk_sort", "external_sort"]
+
+def test_failed_explain_rolls_back_to_savepoint(tmp_path):
+    path = str(tmp_path / "slow.jsonl")
+    log = SlowQueryLog(threshold_ms=1, explain_sample_rate=1.0, path=path)
+    conn, cursor = make_conn()
+    cursor.execute.side_effect = lambda sql, *args: (_ for _ in ()).throw(RuntimeError("canceled")) \
+        if sql.startswith("EXPLAIN") else None
+
+    log.observe(conn, "SELECT 1", [], duration_ms=10)
+
+    assert cursor.execute.call_args_list[-1][0][0] == "ROLLBACK TO SAVEPOINT slow_query_explain"
+    (entry,) = read_entries(path)
+    assert entry["plan"] is None and "canceled" in entry["explain_error"]
+
+def test_engine_reports_executed_queries():
+    slow_log = Mock()
+    db = Mock()
+    engine = ProductSearchEngine(db, Mock(), slow_query_log=slow_log)
+
+    engine._execute_query("SELECT %s", [1])
+
+    conn, query, params, duration_ms = slow_log.observe.call_args[0]
+    assert (conn, query, params) == (db, "SELECT %s", [1])
+    assert duration_ms >= 0
+    assert slow_log.observe.call_args[1]["explain_query"] == "SELECT %s"
+
+def test_prepared_queries_explain_the_execute_statement(tmp_path):
+    path = str(tmp_path / "slow.jsonl")
+    log = SlowQueryLog(threshold_ms=0, explain_sample_rate=1.0, path=path)
+    db, cursor = make_conn()
+    engine = ProductSearchEngine(db, Mock(), slow_query_log=log, prepare_statements=True)
+
+    engine._execute_query("SELECT %s::float8[]", [[1.0]])
+
+    explain = next(c[0] for c in cursor.execute.call_args_list if c[0][0].startswith("EXPLAIN"))
+    assert explain[0].startswith("EXPLAIN (ANALYZE, BUFFERS) EXECUTE search_")
+    assert explain[0].endswith(" (%s::float8[])")
+    assert explain[1] == [[1.0]]
+    (entry,) = read_entries(path)
+    assert entry["sql"] == "SELECT %s::float8[]"
+
+def test_report_aggregates_worst_shapes(tmp_path):
+    path = tmp_path / "slow.jsonl"
+    rows = [
+        {"shape": "a", "sql": "A", "params": [], "duration_ms": 150, "plan": None, "flags": []},
+        {"shape": "b", "sql": "B", "params": ["'Men'"], "duration_ms": 900, "plan": "Seq Scan", "flags": ["seq_scan"]},
+        {"shape": "a", "sql": "A", "params": [], "duration_ms": 250, "plan": None, "flags": []},
+    ]
+    path.write_text("\n".join(json.dumps(r) for r in rows) + "\n")
+    (tmp_path / "slow.jsonl.1").write_text(json.dumps(rows[0]) + "\n")
+
+    shapes = aggregate(read_entries(str(path)))
+
+    assert [s["shape"] for s in shapes] == ["b", "a"]
+    assert shapes[1]["count"] == 3
+    assert shapes[0]["latest_plan"] == "Seq Scan"
+    assert "seq_scan" in format_report(shapes).splitlines()[1]
+
+def test_summarize_param_batches():
+    assert summarize_param([np.zeros(3), np.zeros(3)]) == "vector[2](3)"
+    assert summarize_param("x" * 50) == repr("x" * 37 + "...")
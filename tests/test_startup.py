@@ -0,0 +1,48 @@
+import sys
+import os
+import time
+import pytest
+sys.path.append(os.path.abspath("src"))
+import startup
+from startup import StartupTimer, preload_encoder
+
+def test_startup_timer_reports_stages_and_total():
+    timer = StartupTimer(started_at=time.perf_counter() - 1.0)
+    timer.record("imports", 0.25)
+    with timer.stage("db connect"):
+        pass
+
+    stages = timer.as_dict()
+    assert list(stages) == ["imports", "db connect", "total"]
+    assert stages["total"] >= 1.0
+    assert timer.report().startswith("⏱️ Startup: imports 0.25s | db connect ")
+
+class RecordingEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(texts)
+        return [[0.0]]
+
+def test_preload_encoder_loads_and_warms_up(monkeypatch):
+    encoder = RecordingEncoder()
+    monkeypatch.setattr(startup, "import_backend", lambda backend: None)
+    monkeypatch.setattr(startup, "load_encoder", lambda backend: encoder)
+
+    preloader = preload_encoder(timer=StartupTimer())
+
+    assert preloader.get(timeout=5) is encoder
+    assert encoder.calls == [[startup.WARM_UP_TEXT]]
+    assert [name for name, _ in preloader.timer.stages] == ["model import", "model load", "warm-up"]
+
+def test_preload_errors_surface_in_get(monkeypatch):
+    def fail(backend):
+        raise OSError("snapshot missing")
+    monkeypatch.setattr(startup, "import_backend", lambda backend: None)
+    monkeypatch.setattr(startup, "load_encoder", fail)
+
+    preloader = preload_encoder(background=False)
+
+    with pytest.raises(OSError, match="snapshot missing"):
+        preloader.get()
@@ -0,0 +1,82 @@
+import sys
+import os
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.abspath("src"))
+from synthetic_catalog import CatalogProfile, SYNTHETIC_ID_OFFSET, generate_chunk
+from load_generator import build_workload, replay, format_report
+
+def make_profile():
+    products = pd.DataFrame({
+        "product_id": [1, 2, 3],
+        "product_name": ["Red Kurta", "Blue Jeans", "Black Tee"],
+        "product_brand": ["Biba", "Levis", "HRX"],
+        "gender": ["Women", "Men", "Men"],
+        "price_inr": [1200, 2500, None],
+        "num_images": [5, 4, 3],
+        "description": ["kurta", "jeans", "tee"],
+        "primary_color": ["Red", "Blue", "Black"],
+    })
+    embeddings = np.eye(3, 4, dtype=np.float32)
+    return CatalogProfile(products, embeddings, np.array(["Biba", "Levis", "HRX"]), np.array([0.5, 0.3, 0.2]))
+
+def test_generate_chunk_is_deterministic_and_realistic():
+    profile = make_profile()
+
+    frame, vectors = generate_chunk(profile, start=100, count=50, seed=7)
+    again, again_vectors = generate_chunk(profile, start=100, count=50, seed=7)
+
+    pd.testing.assert_frame_equal(frame, again)
+    np.testing.assert_array_equal(vectors, again_vectors)
+    assert frame["product_id"].tolist() == list(range(SYNTHETIC_ID_OFFSET + 100, SYNTHETIC_ID_OFFSET + 150))
+    assert set(frame["gender"]) <= {"Women", "Men"}
+    # NULL prices stay NULL, others are jittered around the source price
+    assert frame.loc[frame["description"] == "tee", "price_inr"].isna().all()
+    assert frame["price_inr"].dropna().between(500, 6000).all()
+    # Perturbed vectors stay unit length and close to a real vector
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-5)
+    assert (np.max(vectors @ profile.embeddings.T, axis=1) > 0.95).all()
+
+class FakePool:
+    @contextmanager
+    def connection(self):
+        yield object()
+
+class FakeEngine:
+    def __init__(self):
+        self.calls = []
+
+    def using(self, conn):
+        return self
+
+    def search(self, query, top_k, filters):
+        if query == "boom":
+            raise RuntimeError("statement timeout")
+        self.calls.append((query, top_k))
+        return []
+
+def test_replay_runs_requests_across_clients():
+    engine = FakeEngine()
+
+    result = replay(engine, FakePool(), [("blue jeans", None, 5), ("boom", None, 5)], clients=3,
+                    requests_per_client=20)
+
+    assert result["clients"] == 3
+    assert result["requests"] + result["errors"] == 60
+    assert result["errors"] > 0
+    assert result["latency_ms"]["n"] == result["requests"]
+    assert len(build_workload([5, 10])) % 2 == 0
+
+def test_format_report_builds_size_by_clients_grid():
+    rows = [
+        {"catalog_rows": 100_000, "clients": 1, "qps": 50.0, "latency_ms": {"p95": 20.0}},
+        {"catalog_rows": 100_000, "clients": 4, "qps": 150.0, "latency_ms": {"p95": 30.0}},
+        {"catalog_rows": 1_000_000, "clients": 1, "qps": 20.0, "latency_ms": {"p95": 60.0}},
+    ]
+
+    lines = format_report(rows).splitlines()
+
+    assert "1 clients" in lines[0] and "4 clients" in lines[0]
+    assert lines[2].split() == ["100,000", "20.0", "/", "50.0", "30.0", "/", "150.0"]
+    assert lines[3].split() == ["1,000,000", "60.0", "/", "20.0", "-"]
@@ -0,0 +1,104 @@
+import sys
+import os
+import pytest
+import psycopg2
+from psycopg2 import extensions
+sys.path.append(os.path.abspath("src"))
+import utils
+from utils import ConnectionPool, PoolTimeout
+
+class FakeInfo:
+    def __init__(self):
+        self.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        if self.conn.broken:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+class FakeConnection:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.closed = 0
+        self.broken = False
+        self.rollbacks = 0
+        self.info = FakeInfo()
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+@pytest.fixture
+def fake_connect(monkeypatch):
+    created = []
+
+    def connect(**kwargs):
+        conn = FakeConnection(**kwargs)
+        created.append(conn)
+        return conn
+
+    registered = []
+    monkeypatch.setattr(utils.psycopg2, "connect", connect)
+    monkeypatch.setattr(utils, "register_vector", lambda conn: registered.append(conn))
+    return created, registered
+
+def test_connections_are_reused_and_registered_once(fake_connect):
+    created, registered = fake_connect
+    pool = ConnectionPool(min_size=1, max_size=2)
+
+    for _ in range(3):
+        with pool.connection() as conn:
+            pass
+
+    assert len(created) == 1
+    assert registered == [created[0]]
+
+def test_statement_timeout_passed_as_connection_option(fake_connect):
+    created, _ = fake_connect
+    ConnectionPool(min_size=1, max_size=1, statement_timeout_ms=2500, dbname="db")
+
+    assert created[0].kwargs == {"dbname": "db", "options": "-c statement_timeout=2500"}
+
+def test_open_transaction_rolled_back_on_return(fake_connect):
+    pool = ConnectionPool(min_size=0, max_size=1)
+
+    with pool.connection() as conn:
+        conn.info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+        rollbacks_before = conn.rollbacks
+
+    assert conn.rollbacks == rollbacks_before + 1
+
+def test_unhealthy_idle_connection_is_replaced(fake_connect):
+    created, registered = fake_connect
+    pool = ConnectionPool(min_size=1, max_size=1, health_check_interval=0)
+    created[0].broken = True
+
+    with pool.connection() as conn:
+        assert conn is created[1]
+
+    assert created[0].closed
+    assert pool.discarded == 1
+    assert registered == [created[1]]
+
+def test_borrow_times_out_when_pool_exhausted(fake_connect):
+    pool = ConnectionPool(min_size=0, max_size=1, acquire_timeout=0.01)
+
+    with pool.connection():
+        with pytest.raises(PoolTimeout):
+            with pool.connection():
+                pass